@@ -1,11 +1,24 @@
 import ctypes
+import itertools
+import os
+import sys
+import tempfile
 import threading
 import mmap
 import struct
 import time
 from ctypes import Structure, c_int, c_char, c_char_p, c_uint64, c_ubyte
-from detectors import get_default_detector, BaseDetector
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from detectors import get_default_detector, BaseDetector, BatchingDetector, ROI_MODES, convert_threshold_to_confidence
+from event_filter import EventSuppressor
+from frame_notifier import BaseFrameNotifier, get_default_notifier
+from metrics import default_registry, set_thread_channel, stage_histograms
+from motion_gate import MotionGatedDetector
+from tracker import EngineDetector, TrackingDetector
+from yuv_converter import shared_rgb_cache
 from data_structures import SettingParameters, ROIGroup
+from roi_index import RoiSet
 
 
 # ---------- Struct definitions ----------
@@ -34,16 +47,63 @@ MMF_DATA_HEADER = 0x1234
 MMF_DATA_FOOTER = 0x4321
 MMF_DATA_SIZE = (8 + 4 + 4 + 4 + 4 + 8 + (1920 * 1080 * 3) + 8)
 
+# Optional ring layout, told apart from MMF_Data by its header magic:
+#   ring header  Q magic | I version | I slot_count | I slot_capacity | I reserved | Q producer_dropped
+#   N slots      Q seq | i status | I width | I height | I size | Q timestamp | slot_capacity image bytes
+#   footer       Q MMF_DATA_FOOTER
+# Each slot has the MMF_Data status handshake (1 = frame ready, 2 = handed
+# back), so the producer can fill free slots while the reader holds one.
+MMF_RING_HEADER = 0x2234
+MMF_RING_INIT = 0x2233  # Header while the producer lays the ring out; readers leave it alone
+MMF_RING_VERSION = 2
+RING_HEADER_SIZE = 32
+RING_SLOT_HEADER_SIZE = 32
+RING_MAX_SLOTS = 64
+
+# Which ready frame the reader takes from a ring: the newest (older ready
+# ones are skipped and handed back) or every frame in sequence order
+FRAME_POLICIES = ("newest", "every")
+
+
+def ring_slot_offset(index: int, slot_capacity: int) -> int:
+    return RING_HEADER_SIZE + index * (RING_SLOT_HEADER_SIZE + slot_capacity)
+
+
+def ring_region_size(slot_count: int, slot_capacity: int) -> int:
+    """Bytes used by a ring, footer included"""
+    return ring_slot_offset(slot_count, slot_capacity) + 8
+
+# Linux has no named file mappings: both sides map the same file instead,
+# on tmpfs when available so frames never touch a disk
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def shared_memory_path(name: str) -> str:
+    """File backing the ChannelFrame_<port> region outside Windows"""
+    return os.path.join(SHM_DIR, name)
+
+
+def open_shared_memory(name: str, size: int = MMF_DATA_SIZE) -> mmap.mmap:
+    """Map the named region, creating it if the other side has not yet.
+
+    Windows uses the named file mapping the C# producer creates; elsewhere
+    the region is the file shared_memory_path(name).
+    """
+    if sys.platform == "win32":
+        return mmap.mmap(-1, size, tagname=name, access=mmap.ACCESS_WRITE)
+    fd = os.open(shared_memory_path(name), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+    finally:
+        os.close(fd)  # The mapping keeps its own reference
+
 # ---------- Global variables ----------
+# Default engine and channel behind the DLL-style compatibility API below
+g_engine: "AnalyticsEngine" = None  # type: ignore
 g_portnum = 0
-g_running = True
-g_bgThread = None
-g_callbackFunction = None
-g_isSetting = False
-g_url = ""
 g_mtx = threading.Lock()
-g_detector: BaseDetector = None  # type: ignore
-g_roi_rects = []  # Store ROI rectangles for detection filtering
 
 # ---------- MMF reading ----------
 
@@ -66,224 +126,823 @@ class MMF_Data:
         self.footer, = struct.unpack_from("<q", raw_bytes, footer_offset)
 
 
-g_hMap = None  # Python doesn't need HANDLE, mmap object is sufficient
-
-def get_mmf(frame_holder, width_holder, height_holder, size_holder, timestamp_holder):
-    global g_hMap
-
-    mmf_name = f"ChannelFrame_{g_portnum}"
-    try:
-        if g_hMap is None:
-            # ACCESS_WRITE to be able to change image_status
-            g_hMap = mmap.mmap(-1, MMF_DATA_SIZE, tagname=mmf_name, access=mmap.ACCESS_WRITE)
-            print(f"Opened shared mem: {mmf_name}")
-    except Exception as e:
-        print("Open shared mem failed:", e)
-        return -1
-
-    # Read header/footer
-    g_hMap.seek(0)
-    header = struct.unpack_from("<Q", g_hMap, 0)[0]   # __int64
-    footer = struct.unpack_from("<Q", g_hMap, MMF_DATA_SIZE - 8)[0]
-
-    # If header/footer are incorrect, reset (simulate C++ behavior)
-    if header != MMF_DATA_HEADER or footer != MMF_DATA_FOOTER:
-        # Python can also write back directly
-        g_hMap.seek(0)
-        g_hMap.write(struct.pack("<Q", MMF_DATA_HEADER))  # header
-        g_hMap.seek(MMF_DATA_SIZE - 8)
-        g_hMap.write(struct.pack("<Q", MMF_DATA_FOOTER))  # footer
-        print("Reset shared mem header/footer")
-        return 0
-
-    # Read image_status
-    g_hMap.seek(8)
-    image_status = struct.unpack("<i", g_hMap.read(4))[0]
-
-    if image_status == 1:
-        # Read metadata
-        g_hMap.seek(12)
-        image_width, image_height, image_size = struct.unpack("<III", g_hMap.read(12))
-        timestamp = struct.unpack("<Q", g_hMap.read(8))[0]
-
-        # Read image_data
-        g_hMap.seek(32)
-        image_data = g_hMap.read(image_size)
-
+MMF_IMAGE_OFFSET = 32
+
+
+class FrameLease:
+    """Zero-copy lease on a frame held in shared memory.
+
+    ``data`` is a memoryview straight into the mapped region. The producer
+    keeps the slot untouched until ``release()`` writes image_status = 2,
+    so the view must not be used after the lease is released. ``sequence``
+    is the ring slot's frame number, None for the single-slot layout.
+    """
+
+    def __init__(self, hmap: mmap.mmap, width: int, height: int, size: int, timestamp: int,
+                 offset: int = MMF_IMAGE_OFFSET, status_offset: int = 8, sequence: int = None):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.timestamp = timestamp
+        self.sequence = sequence
+        self._map = hmap
+        self._status_offset = status_offset
+        self._root = memoryview(hmap)
+        self._view = self._root[offset:offset + size]
+
+    @property
+    def data(self) -> memoryview:
+        if self._view is None:
+            raise ValueError("Frame lease already released")
+        return self._view
+
+    def copy(self) -> bytes:
+        """Copy the frame out of shared memory (single copy)"""
+        return self.data.tobytes()
+
+    def release(self):
+        """Drop the view and hand the slot back to the producer"""
+        if self._view is None:
+            return
+        # Views must be released before the mmap can be closed or resized
+        self._view.release()
+        self._root.release()
+        self._view = None
+        self._root = None
         # Write back image_status = 2
-        g_hMap.seek(8)
-        g_hMap.write(struct.pack("<i", 2))
-
-        # Return values simulate C++ pointer/reference
-        frame_holder[:] = [bytes(image_data)]
-        width_holder[:] = [image_width]
-        height_holder[:] = [image_height]
-        size_holder[:] = [image_size]
-        timestamp_holder[:] = [timestamp]
-
-        return 1
-    return 0
-
-# ---------- Background Thread ----------
-
-def RecognizeTask():
-    print("start get shared mem thread")
-    count = 0
-
-    while True:
-        if not g_running:
-            break
-
-        frame = []
-        width = []
-        height = []
-        size = []
-        timestamp = []
-        if get_mmf(frame, width, height, size, timestamp) == 1:
-            if g_isSetting and size[0] > 0:                
-                # Use pluggable detector instead of simulation
-                detections = []
-                try:
-                    if g_detector is not None:
-                        # Pass ROI rectangles for filtering if available
-                        detections = g_detector.detect(frame[0], width[0], height[0], g_roi_rects if g_roi_rects else None)
-                except Exception as det_e:
-                    print(f"[Detector] error: {det_e}")
-                    detections = []
-
-                if detections and g_callbackFunction:
-                    # Build ROI groups from detections (single row of detections)
-                    roi_row = [ROI(int(x), int(y)) for (x, y, w, h) in detections]
-                    rois = [roi_row]
-                    rows = 1
-                    cols = len(roi_row)
-
-                    g_callbackFunction(
-                        g_portnum,
-                        width[0],
-                        height[0],
-                        frame[0],         # bytes
-                        size[0],
-                        timestamp[0],
-                        rois,             # grouped ROIs (1 x N)
-                        rows,
-                        cols,
-                        detections        # Pass full detections for drawing boxes
-                    )
-
-                count += 1
-
-        # sleep
-        time.sleep(0.005)
-
-    print("exit get shared mem thread")
-
-
-
-# ---------- API ----------
-def Initialize(PortNumber: int):
-    global g_portnum, g_bgThread, g_running, g_detector
-    g_portnum = PortNumber
-    g_running = True
-    g_detector = get_default_detector()
-    # Set default confidence threshold (will be overridden by SettingParameters if provided)
-    if g_detector:
-        g_detector.set_confidence_threshold(0.25)  # Default permissive confidence
-    print(f"DLL Initialized, Port ID = {g_portnum}")
-    g_bgThread = threading.Thread(target=RecognizeTask, daemon=True)
-    g_bgThread.start()
-
-
-def SettingParameters(parameters: SettingParameters):
-    print("analytics_engine SettingParameters")
-    global g_url, g_isSetting, g_detector, g_roi_rects
-    
-    g_url = parameters.analytics_event_api_url
-    print("Parameters set:")
-    print("version:", parameters.version)
-    print("analytics_event_api_url:", g_url)
-    print("image_width:", parameters.image_width)
-    print("image_height:", parameters.image_height)
-    print("jpg_compress:", parameters.jpg_compress)
-    
-    # Process ROI groups and extract threshold/sensitivity settings
-    g_roi_rects = []
+        struct.pack_into("<i", self._map, self._status_offset, 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class SharedFrameSource:
+    """Reader side of one ChannelFrame_<port> shared-memory region.
+
+    The layout is negotiated from the header on every read: MMF_Data
+    (0x1234) is a single slot, MMF_RING_HEADER a ring of slots read under
+    policy (see FRAME_POLICIES). The producer may switch layouts at any time.
+    """
+
+    def __init__(self, port: int, policy: str = "newest"):
+        if policy not in FRAME_POLICIES:
+            raise ValueError(f"Unknown frame policy '{policy}', expected one of {FRAME_POLICIES}")
+        self.port = port
+        self.name = f"ChannelFrame_{port}"
+        self.policy = policy
+        self.skipped = 0  # Ready ring frames passed over for a newer one ("newest" policy)
+        self.last_sequence = 0
+        self._hmap = None  # Python doesn't need HANDLE, mmap object is sufficient
+        self._ring = None  # (slot_count, slot_capacity) while the producer uses the ring layout
+        self._rejected = None  # Last unsupported ring header reported
+
+    def acquire(self, policy: str = None):
+        """Lease the pending frame without copying it.
+
+        Returns a FrameLease when a new frame is available, None when there is no
+        frame yet and -1 if the shared memory could not be opened. policy
+        overrides self.policy for this read; it only matters for the ring layout.
+        """
+        mmf_name = self.name
+        try:
+            if self._hmap is None:
+                # Writable to be able to change image_status
+                self._hmap = open_shared_memory(mmf_name)
+                print(f"Opened shared mem: {mmf_name}")
+        except Exception as e:
+            print("Open shared mem failed:", e)
+            return -1
+
+        hmap = self._hmap
+
+        # Read header/footer
+        header = struct.unpack_from("<Q", hmap, 0)[0]   # __int64
+        if header == MMF_RING_HEADER:
+            return self._acquire_ring(policy or self.policy)
+        self._ring = None
+        if header == MMF_RING_INIT:
+            return None  # Resetting it now could overwrite the ring magic stored next
+        footer = struct.unpack_from("<Q", hmap, MMF_DATA_SIZE - 8)[0]
+
+        # If header/footer are incorrect, reset (simulate C++ behavior)
+        if header != MMF_DATA_HEADER or footer != MMF_DATA_FOOTER:
+            # Python can also write back directly
+            struct.pack_into("<Q", hmap, 0, MMF_DATA_HEADER)  # header
+            struct.pack_into("<Q", hmap, MMF_DATA_SIZE - 8, MMF_DATA_FOOTER)  # footer
+            print("Reset shared mem header/footer")
+            return None
+
+        # Read image_status
+        image_status = struct.unpack_from("<i", hmap, 8)[0]
+
+        if image_status == 1:
+            # Read metadata
+            image_width, image_height, image_size, timestamp = struct.unpack_from("<IIIQ", hmap, 12)
+            image_size = min(image_size, MMF_DATA_SIZE - 8 - MMF_IMAGE_OFFSET)
+            return FrameLease(hmap, image_width, image_height, image_size, timestamp)
+        return None
+
+    def _map_ring(self):
+        """Validate the ring header and map the whole ring; False if it is not usable yet"""
+        version, slot_count, slot_capacity = struct.unpack_from("<III", self._hmap, 8)
+        if version != MMF_RING_VERSION or not 1 <= slot_count <= RING_MAX_SLOTS or slot_capacity == 0:
+            # Never reset a ring: the producer owns its header. Report each bad layout once
+            if self._rejected != (version, slot_count, slot_capacity):
+                self._rejected = (version, slot_count, slot_capacity)
+                print(f"Unsupported shared mem ring: version {version}, {slot_count} x {slot_capacity} bytes")
+            self._ring = None
+            return False
+        size = ring_region_size(slot_count, slot_capacity)
+        if len(self._hmap) < size:
+            # Ring bigger than the MMF_Data mapping: remap it at its full size
+            self._hmap.close()
+            self._hmap = None
+            try:
+                self._hmap = open_shared_memory(self.name, size)
+            except Exception as e:
+                print("Open shared mem failed:", e)
+                return False
+        if struct.unpack_from("<Q", self._hmap, size - 8)[0] != MMF_DATA_FOOTER:
+            return False  # Producer still laying out the ring
+        if self._ring != (slot_count, slot_capacity):
+            print(f"Shared mem ring: {slot_count} slots of {slot_capacity} bytes, policy {self.policy}")
+        self._ring = (slot_count, slot_capacity)
+        return True
+
+    def _acquire_ring(self, policy: str):
+        if not self._map_ring():
+            return None
+        hmap = self._hmap
+        slot_count, slot_capacity = self._ring
+        ready = []
+        for index in range(slot_count):
+            offset = ring_slot_offset(index, slot_capacity)
+            sequence, status = struct.unpack_from("<Qi", hmap, offset)
+            if status == 1:
+                ready.append((sequence, offset))
+        if not ready:
+            return None
+
+        if policy == "every":
+            sequence, offset = min(ready)
+        else:
+            sequence, offset = max(ready)
+            for _, stale in ready:
+                if stale != offset:
+                    struct.pack_into("<i", hmap, stale + 8, 2)  # Hand back unread
+                    self.skipped += 1
+        self.last_sequence = sequence
+        width, height, size, timestamp = struct.unpack_from("<IIIQ", hmap, offset + 12)
+        return FrameLease(hmap, width, height, min(size, slot_capacity), timestamp,
+                          offset + RING_SLOT_HEADER_SIZE, offset + 8, sequence)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Ring slot count, skipped frames and producer-side drops; zeros for MMF_Data"""
+        stats = {"slots": 1, "skipped": self.skipped, "producer_dropped": 0}
+        if self._ring is not None and self._hmap is not None:
+            stats["slots"] = self._ring[0]
+            stats["producer_dropped"] = struct.unpack_from("<Q", self._hmap, 24)[0]
+        return stats
+
+    def close(self):
+        if self._hmap is not None:
+            self._hmap.close()
+            self._hmap = None
+        self._ring = None
+
+
+def parse_roi_settings(parameters: SettingParameters):
+    """Turn SetParameters ROI groups into polygon ROIs plus the first threshold/sensitivity.
+
+    Returns (roi_rects, threshold, sensitivity). roi_rects is a RoiSet: the list
+    of ROI bounding rectangles that also keeps each group's polygon and its own
+    confidence. Groups without a valid threshold/sensitivity pair use the first
+    valid one; threshold and sensitivity are -1 when no group carries one.
+    """
+    polygons = []
+    pairs = []
     active_threshold = -1
     active_sensitivity = -1
-    
+
     print(f"Processing {len(parameters.rois)} ROI groups:")
     for i, roi_group in enumerate(parameters.rois):
         print(f"ROI Group {i}: sensitivity={roi_group.sensitivity}, threshold={roi_group.threshold}, {len(roi_group.rects)} points")
-        
-        # Use first valid threshold/sensitivity pair for detector
-        if active_threshold == -1 and roi_group.threshold > 0 and roi_group.sensitivity > 0:
+
+        valid = roi_group.threshold > 0 and roi_group.sensitivity > 0
+        if active_threshold == -1 and valid:
             active_threshold = roi_group.threshold
             active_sensitivity = roi_group.sensitivity
-            print(f"Using threshold={active_threshold}, sensitivity={active_sensitivity} for detector")
-        
-        # Convert 4 corner points to rectangle
-        if len(roi_group.rects) >= 4:
-            # Take first 4 points and find bounding rectangle
-            xs = [point.x for point in roi_group.rects[:4]]
-            ys = [point.y for point in roi_group.rects[:4]]
-            
-            x1, x2 = min(xs), max(xs)
-            y1, y2 = min(ys), max(ys)
-            
-            g_roi_rects.append((x1, y1, x2, y2))
-            print(f"  Created ROI rectangle from 4 points: ({x1}, {y1}, {x2}, {y2})")
-            
-            # Print all 4 corner points for debugging
-            for j, point in enumerate(roi_group.rects[:4]):
-                print(f"    Point {j}: ({point.x}, {point.y})")
-                
-        elif len(roi_group.rects) == 2:
+            print(f"Using threshold={active_threshold}, sensitivity={active_sensitivity} as default")
+
+        # (-1, -1) entries are unused slots
+        points = [(point.x, point.y) for point in roi_group.rects if point.x >= 0 and point.y >= 0]
+        if len(points) >= 3:
+            # Corner points in order, usually a trapezoid seen in perspective
+            polygons.append(points)
+            print(f"  Created ROI polygon from {len(points)} points: {points}")
+        elif len(points) == 2:
             # Fallback: 2 points define diagonal corners
-            x1, y1 = roi_group.rects[0].x, roi_group.rects[0].y
-            x2, y2 = roi_group.rects[1].x, roi_group.rects[1].y
-            # Ensure x1,y1 is top-left and x2,y2 is bottom-right
+            (x1, y1), (x2, y2) = points
             x1, x2 = min(x1, x2), max(x1, x2)
             y1, y2 = min(y1, y2), max(y1, y2)
-            g_roi_rects.append((x1, y1, x2, y2))
+            polygons.append([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])
             print(f"  Created ROI rectangle from 2 points: ({x1}, {y1}, {x2}, {y2})")
-        elif len(roi_group.rects) > 0:
-            print(f"  Warning: {len(roi_group.rects)} points provided for ROI group {i}, need 2 or 4 points to form rectangle")
-    
-    # Convert threshold and sensitivity to YOLO confidence if we have valid values
-    if active_threshold > 0 and active_sensitivity > 0 and g_detector:
-        from detectors import convert_threshold_to_confidence
-        confidence = convert_threshold_to_confidence(active_threshold, active_sensitivity)
-        g_detector.set_confidence_threshold(confidence)
-        print(f"Set detector confidence threshold: {confidence} (from threshold={active_threshold}, sensitivity={active_sensitivity})")
-    
-    if g_roi_rects:
-        print(f"Total ROI rectangles configured: {len(g_roi_rects)}")
-    else:
-        print("No ROI filtering configured - all detections will be reported")
-    
-    g_isSetting = True
+        else:
+            if points:
+                print(f"  Warning: {len(points)} points provided for ROI group {i}, need at least 2 points to form an ROI")
+            continue
+        pairs.append((roi_group.threshold, roi_group.sensitivity) if valid else None)
+
+    confidences = []
+    for pair in pairs:
+        if pair is None and active_threshold > 0:
+            pair = (active_threshold, active_sensitivity)
+        confidences.append(None if pair is None else convert_threshold_to_confidence(*pair))
+    return RoiSet(polygons, confidences), active_threshold, active_sensitivity
+
+
+_config_versions = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class ChannelConfig:
+    """Settings of one channel as of one SetParameters call.
+
+    Never modified once built: apply_parameters swaps the channel's reference
+    to a new ChannelConfig, and the recognize thread reads that reference once
+    per frame, so ROIs and confidence always come from the same call.
+    """
+    version: int
+    url: str
+    roi_rects: RoiSet  # ROI rectangles for detection filtering, empty = whole frame
+    confidence: Optional[float]  # None = detector default
+
+
+class AnalyticsChannel:
+    """One ChannelFrame_<port> shared-memory region with its own ROI/threshold settings"""
+
+    def __init__(self, engine: "AnalyticsEngine", port: int, notifier: BaseFrameNotifier):
+        self.engine = engine
+        self.port = port
+        self.notifier = notifier
+        self.config: Optional[ChannelConfig] = None  # None until the first SetParameters
+        self._applied_version = 0  # Config version the recognize thread last processed with
+        self.frame_count = 0
+        # Resolved once so the recognize loop only increments/observes
+        self._shm_read = stage_histograms(port)["shm_read"]
+        self._frames_seen = default_registry.counter(
+            "analytics_frames_seen_total", "Frames read from shared memory", channel=port)
+        self._frames_processed = default_registry.counter(
+            "analytics_frames_processed_total", "Frames run through the detection stages", channel=port)
+        self._frames_skipped = default_registry.counter(
+            "analytics_frames_skipped_total", "Frames read before SetParameters or without pixels", channel=port)
+        self._source = SharedFrameSource(port, engine.frame_policy)
+        self._retired_notifiers = []  # Replaced notifiers, closed once the thread has stopped
+        self.event_filter = engine.make_event_filter()  # None = every detection frame is reported
+        self.motion_gate = None  # MotionGatedDetector, None = no motion gating
+        self.tracker = None  # TrackingDetector, None = detector runs on every frame
+        engine.attach_stream_detectors(self)
+        self._running = False
+        self._thread = None
+
+    # ---------- MMF reading ----------
+
+    def acquire_frame(self, policy: str = None):
+        """Lease the pending frame without copying it (see SharedFrameSource.acquire)"""
+        return self._source.acquire(policy)
+
+    # ---------- Settings ----------
+
+    @property
+    def is_setting(self) -> bool:
+        return self.config is not None
+
+    @property
+    def url(self) -> str:
+        config = self.config
+        return config.url if config else ""
+
+    @property
+    def roi_rects(self) -> RoiSet:
+        config = self.config
+        return config.roi_rects if config else RoiSet([])
+
+    @property
+    def confidence(self) -> Optional[float]:
+        config = self.config
+        return config.confidence if config else None
+
+    def apply_parameters(self, parameters: SettingParameters) -> ChannelConfig:
+        """Build a new ChannelConfig and swap it in; the next frame uses it"""
+        print(f"analytics_engine SettingParameters (channel {self.port})")
+
+        url = parameters.analytics_event_api_url
+        print("Parameters set:")
+        print("version:", parameters.version)
+        print("analytics_event_api_url:", url)
+        print("image_width:", parameters.image_width)
+        print("image_height:", parameters.image_height)
+        print("jpg_compress:", parameters.jpg_compress)
+
+        # Process ROI groups and extract threshold/sensitivity settings
+        roi_rects, active_threshold, active_sensitivity = parse_roi_settings(parameters)
+
+        # The detector runs at the loosest ROI confidence; stricter ROIs are
+        # enforced per detection by the RoiSet
+        confidence = roi_rects.min_confidence()
+        if confidence is not None:
+            print(f"Set channel {self.port} confidence threshold: {confidence} "
+                  f"(per ROI: {roi_rects.confidences})")
+        elif self.config is not None:
+            confidence = self.config.confidence  # No threshold given, keep the current one
+
+        if roi_rects:
+            print(f"Total ROI rectangles configured: {len(roi_rects)}")
+        else:
+            print("No ROI filtering configured - all detections will be reported")
+
+        config = ChannelConfig(next(_config_versions), url, roi_rects, confidence)
+        self.config = config
+        print(f"Channel {self.port} config version {config.version}")
+        return config
+
+    # ---------- Background Thread ----------
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._recognize_task, name=f"RecognizeTask-{self.port}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for notifier in self._retired_notifiers + [self.notifier]:
+            notifier.close()
+        self._retired_notifiers = []
+        self._source.close()
+
+    def _recognize_task(self):
+        print(f"start get shared mem thread (channel {self.port})")
+        engine = self.engine
+        set_thread_channel(self.port)  # Detector stages timed on this thread count for this channel
+        perf_counter = time.perf_counter
+
+        while self._running:
+            start = perf_counter()
+            lease = self.acquire_frame()
+            got_frame = isinstance(lease, FrameLease)
+            self.notifier.on_poll(got_frame)
+            if not got_frame:
+                # Sleep until the producer signals or the adaptive backoff expires
+                self.notifier.wait()
+                continue
+
+            with lease:
+                if engine.zero_copy:
+                    # Detector and callback read straight from the mapped region
+                    frame = lease.data
+                else:
+                    frame = lease.copy()
+                    lease.release()
+                self._shm_read.observe(perf_counter() - start)
+                self._frames_seen.inc()
+
+                config = self.config  # One snapshot for the whole frame
+                if config is not None and lease.size > 0:
+                    try:
+                        self._process_frame(frame, lease, config)
+                    finally:
+                        # Recycle the RGB conversion shared by detector and encoder
+                        shared_rgb_cache.release(frame)
+                    self.frame_count += 1
+                    self._frames_processed.inc()
+                else:
+                    self._frames_skipped.inc()
+
+        print(f"exit get shared mem thread (channel {self.port})")
+
+    def _process_frame(self, frame, lease: FrameLease, config: ChannelConfig):
+        engine = self.engine
+        event_filter = self.event_filter
+        if config.version != self._applied_version:
+            if event_filter is not None and self._applied_version:
+                event_filter.reset()  # Scenes were tracked against the old ROIs
+            self._applied_version = config.version
+        roi_rects = config.roi_rects
+
+        # Use pluggable detector instead of simulation
+        detections = []
+        try:
+            # Pass ROI rectangles for filtering if available; with tracking the
+            # shared detector only runs on some frames
+            if self.tracker is not None:
+                detect = self.tracker.detect
+            elif self.motion_gate is not None:
+                detect = self.motion_gate.detect
+            else:
+                detect = engine.detect
+            detections = detect(frame, lease.width, lease.height,
+                                roi_rects if roi_rects else None, config.confidence)
+        except Exception as det_e:
+            print(f"[Detector] error: {det_e}")
+            detections = []
+
+        callback = engine.callback
+        if not (detections and callback):
+            return
+
+        # Duplicate scenes stop here, before the JPEG encode and the POST
+        if event_filter is not None and not event_filter.should_emit(detections, roi_rects):
+            return
+
+        # Build ROI groups from detections (single row of detections)
+        roi_row = [ROI(int(x), int(y)) for (x, y, w, h) in detections]
+        rois = [roi_row]
+        rows = 1
+        cols = len(roi_row)
+
+        # In zero-copy mode the frame is only valid until the callback returns
+        callback(
+            self.port,
+            lease.width,
+            lease.height,
+            frame,            # memoryview (zero-copy) or bytes
+            lease.size,
+            lease.timestamp,
+            rois,             # grouped ROIs (1 x N)
+            rows,
+            cols,
+            detections        # Pass full detections for drawing boxes
+        )
+
+
+class AnalyticsEngine:
+    """Watches N shared-memory channels in one process with a single shared detector.
+
+    Each channel has its own reader thread, ROI rectangles and confidence
+    threshold; the loaded model is shared so torch and the weights are only
+    loaded once per process.
+    """
+
+    def __init__(self, detector: BaseDetector = None, batch_size: int = 1, batch_wait: float = 0.010):
+        """batch_size > 1 batches frames from several channels into one forward
+        pass, waiting at most batch_wait seconds for a batch to fill up."""
+        if detector is None:
+            detector = get_default_detector()
+            # Set default confidence threshold (will be overridden by SettingParameters if provided)
+            detector.set_confidence_threshold(0.25)  # Default permissive confidence
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.detector = None
+        self.callback = None
+        self.zero_copy = True  # Hand detector/callback a view into shared memory instead of a copy
+        self.frame_policy = "newest"  # Ring layout only: newest ready frame or every frame in order
+        self.event_filter_options: Optional[Dict[str, Any]] = {}  # EventSuppressor kwargs, None = off
+        self.tracking_options: Optional[Dict[str, Any]] = None  # TrackingDetector kwargs, None = off
+        self.motion_gate_options: Optional[Dict[str, Any]] = None  # MotionGatedDetector kwargs, None = off
+        self._channels: Dict[int, AnalyticsChannel] = {}
+        self._detector_lock = threading.Lock()
+        self._install_detector(detector)
+        # Read when /Metrics is scraped; skipped inferences show up as *_skipped
+        self._metrics_handles = [
+            default_registry.add_stats("analytics_events", "Event filter counters per channel",
+                                       self.get_event_stats, "channel"),
+            default_registry.add_stats("analytics_motion_gate", "Motion gate counters per channel",
+                                       self.get_motion_stats, "channel"),
+            default_registry.add_stats("analytics_tracking", "Tracking counters per channel",
+                                       self.get_tracking_stats, "channel"),
+            default_registry.add_stats("analytics_batch", "Batched inference metrics", self.get_batch_stats),
+            default_registry.add_stats("analytics_shm", "Shared memory ring counters per channel",
+                                       self.get_frame_stats, "channel"),
+        ]
+
+    def _install_detector(self, detector: BaseDetector):
+        old = self.detector
+        if self.batch_size > 1 and not isinstance(detector, BatchingDetector):
+            detector = BatchingDetector(detector, self.batch_size, self.batch_wait,
+                                        expected_clients=len(self._channels))
+        with self._detector_lock:
+            self.detector = detector
+        if isinstance(old, BatchingDetector) and old is not detector:
+            old.close()
+
+    @property
+    def channels(self) -> Dict[int, AnalyticsChannel]:
+        return dict(self._channels)
+
+    def add_channel(self, port: int, notify_backend: str = None,
+                    notifier: BaseFrameNotifier = None) -> AnalyticsChannel:
+        """Start watching ChannelFrame_<port>"""
+        if port in self._channels:
+            return self._channels[port]
+        if notifier is None:
+            notifier = get_default_notifier(port, notify_backend)
+        channel = AnalyticsChannel(self, port, notifier)
+        self._channels[port] = channel
+        self._update_expected_clients()
+        channel.start()
+        print(f"Channel added, Port ID = {port}")
+        return channel
+
+    def remove_channel(self, port: int):
+        channel = self._channels.pop(port, None)
+        if channel:
+            channel.stop()
+            self._update_expected_clients()
+            print(f"Channel removed, Port ID = {port}")
+
+    def _update_expected_clients(self):
+        # A batch never needs more frames than there are channels feeding it
+        if isinstance(self.detector, BatchingDetector):
+            self.detector.expected_clients = len(self._channels)
+
+    def get_channel(self, port: int) -> AnalyticsChannel:
+        return self._channels.get(port)
+
+    def set_parameters(self, port: int, parameters: SettingParameters) -> Optional[ChannelConfig]:
+        channel = self._channels.get(port)
+        if channel is None:
+            print(f"[AnalyticsEngine] Unknown channel {port}, parameters ignored")
+            return
+        return channel.apply_parameters(parameters)
+
+    def detect(self, frame, width: int, height: int, roi_rects=None, confidence: float = None):
+        """Run the shared detector; the model is not thread-safe so calls are serialized"""
+        detector = self.detector
+        if isinstance(detector, BatchingDetector):
+            # The scheduler thread serializes model access and batches across channels
+            return detector.detect(frame, width, height, roi_rects, confidence)
+        with self._detector_lock:
+            detector = self.detector
+            if detector is None:
+                return []
+            return detector.detect(frame, width, height, roi_rects, confidence)
+
+    def register_callback(self, callback):
+        self.callback = callback
+
+    def unregister_callback(self):
+        self.callback = None
+
+    def set_detector(self, detector: BaseDetector):
+        self._install_detector(detector)
+        print(f"Detector set to: {type(detector).__name__}")
+
+    def set_roi_mode(self, mode: str, margin: float = None) -> bool:
+        """Choose full-frame, ROI-union or per-ROI-tile inference (YOLOHumanDetector only)"""
+        detector = self.detector
+        if isinstance(detector, BatchingDetector):
+            detector = detector.detector
+        if not hasattr(detector, "roi_mode"):
+            print(f"[AnalyticsEngine] {type(detector).__name__} does not support ROI cropping")
+            return False
+        if mode not in ROI_MODES:
+            print(f"[AnalyticsEngine] Unknown ROI mode '{mode}', expected one of {ROI_MODES}")
+            return False
+        detector.roi_mode = mode
+        if margin is not None:
+            detector.roi_margin = margin
+        return True
+
+    def set_frame_policy(self, policy: str) -> bool:
+        """Read the newest ready ring frame or every frame in order, on every channel"""
+        if policy not in FRAME_POLICIES:
+            print(f"[AnalyticsEngine] Unknown frame policy '{policy}', expected one of {FRAME_POLICIES}")
+            return False
+        self.frame_policy = policy
+        for channel in self._channels.values():
+            channel._source.policy = policy
+        return True
+
+    def make_event_filter(self) -> Optional[EventSuppressor]:
+        if self.event_filter_options is None:
+            return None
+        return EventSuppressor(**self.event_filter_options)
+
+    def set_event_filter(self, options: Optional[Dict[str, Any]]):
+        """Configure event suppression on every channel (EventSuppressor kwargs, None disables)"""
+        self.event_filter_options = None if options is None else dict(options)
+        for channel in self._channels.values():
+            channel.event_filter = self.make_event_filter()
+
+    def attach_stream_detectors(self, channel: AnalyticsChannel):
+        """Build the channel's per-stream stages around the shared detector:
+        tracker -> motion gate -> engine.detect"""
+        detector = EngineDetector(self.detect)
+        motion_gate = None
+        if self.motion_gate_options is not None:
+            motion_gate = detector = MotionGatedDetector(detector, **self.motion_gate_options)
+        tracker = None
+        if self.tracking_options is not None:
+            tracker = TrackingDetector(detector, **self.tracking_options)
+        channel.motion_gate, channel.tracker = motion_gate, tracker
+
+    def set_tracking(self, options: Optional[Dict[str, Any]]):
+        """Skip-frame inference with per-channel tracking (TrackingDetector kwargs, None disables)"""
+        self.tracking_options = None if options is None else dict(options)
+        for channel in self._channels.values():
+            self.attach_stream_detectors(channel)
+
+    def set_motion_gate(self, options: Optional[Dict[str, Any]]):
+        """Skip inference on static frames (MotionGatedDetector kwargs, None disables)"""
+        self.motion_gate_options = None if options is None else dict(options)
+        for channel in self._channels.values():
+            self.attach_stream_detectors(channel)
+
+    def get_motion_stats(self) -> Dict[int, Dict[str, float]]:
+        """Frames, detector passes and skipped inferences per channel"""
+        return {port: channel.motion_gate.get_stats()
+                for port, channel in self._channels.items() if channel.motion_gate is not None}
+
+    def get_tracking_stats(self) -> Dict[int, Dict[str, float]]:
+        """Frames, detector passes and skipped inferences per channel"""
+        return {port: channel.tracker.get_stats()
+                for port, channel in self._channels.items() if channel.tracker is not None}
+
+    def get_event_stats(self) -> Dict[int, Dict[str, int]]:
+        """Passed/suppressed event counts per channel"""
+        return {port: channel.event_filter.get_stats()
+                for port, channel in self._channels.items() if channel.event_filter is not None}
+
+    def get_frame_stats(self) -> Dict[int, Dict[str, int]]:
+        """Ring slots, skipped frames and producer drops per channel"""
+        return {port: channel._source.get_stats() for port, channel in self._channels.items()}
+
+    def get_batch_stats(self) -> Dict[str, float]:
+        """Batch latency/occupancy metrics, empty when batching is off"""
+        if isinstance(self.detector, BatchingDetector):
+            return self.detector.get_stats()
+        return {}
+
+    def stop(self):
+        for handle in self._metrics_handles:
+            default_registry.remove_stats(handle)
+        for port in list(self._channels):
+            self.remove_channel(port)
+        if isinstance(self.detector, BatchingDetector):
+            self.detector.close()
+
+
+# ---------- Compatibility API (single channel, DLL style) ----------
+
+def _default_channel() -> AnalyticsChannel:
+    if g_engine is None:
+        return None
+    return g_engine.get_channel(g_portnum)
+
+
+def acquire_frame(policy: str = None):
+    """Lease the pending frame of the default channel"""
+    channel = _default_channel()
+    if channel is None:
+        return -1
+    return channel.acquire_frame(policy)
+
+
+def get_mmf(frame_holder, width_holder, height_holder, size_holder, timestamp_holder, policy: str = None):
+    """Copying read of the pending frame, kept for callers that need owned bytes.
+
+    With the ring layout, policy ("newest" / "every", default: the engine's
+    frame policy) chooses which ready frame is read.
+    """
+    lease = acquire_frame(policy)
+    if not isinstance(lease, FrameLease):
+        return -1 if lease == -1 else 0
+
+    with lease:
+        # Return values simulate C++ pointer/reference
+        frame_holder[:] = [lease.copy()]
+        width_holder[:] = [lease.width]
+        height_holder[:] = [lease.height]
+        size_holder[:] = [lease.size]
+        timestamp_holder[:] = [lease.timestamp]
+
+    return 1
+
+
+def Initialize(PortNumber: int, notify_backend: str = None, batch_size: int = 1, batch_wait: float = 0.010):
+    """Create the engine (batch_size/batch_wait only apply then) and make PortNumber the default channel"""
+    global g_engine, g_portnum
+    with g_mtx:
+        if g_engine is None:
+            g_engine = AnalyticsEngine(batch_size=batch_size, batch_wait=batch_wait)
+        g_portnum = PortNumber
+        g_engine.add_channel(PortNumber, notify_backend)
+    print(f"DLL Initialized, Port ID = {g_portnum}")
+
+
+def add_channel(PortNumber: int, notify_backend: str = None):
+    """Watch another channel with the engine's shared detector; the default channel stays as is"""
+    with g_mtx:
+        if g_engine is None:
+            print("[ERROR] add_channel called before Initialize")
+            return
+        g_engine.add_channel(PortNumber, notify_backend)
+
+
+def SettingParameters(parameters: SettingParameters, PortNumber: int = None):
+    """Apply parameters to channel PortNumber, the default channel if None"""
+    if g_engine is None:
+        print("[ERROR] SettingParameters called before Initialize")
+        return
+    g_engine.set_parameters(g_portnum if PortNumber is None else PortNumber, parameters)
 
 
 def registerCallback(callback):
-    global g_callbackFunction
-    g_callbackFunction = callback
+    if g_engine:
+        g_engine.register_callback(callback)
 
 
 def unregisterCallback():
-    global g_callbackFunction
-    g_callbackFunction = None
+    if g_engine:
+        g_engine.unregister_callback()
 
 
 def Deinitialize():
-    global g_running, g_bgThread
+    global g_engine
     print("DLL Deinitialized")
-    g_running = False
-    if g_bgThread:
-        g_bgThread.join()
+    with g_mtx:
+        if g_engine:
+            g_engine.stop()
+            g_engine = None
 
 # Allow swapping detector at runtime
 
 def set_detector(detector: BaseDetector):
-    global g_detector
-    g_detector = detector
-    print(f"Detector set to: {type(detector).__name__}")
+    if g_engine:
+        g_engine.set_detector(detector)
+
+
+def set_frame_notifier(notifier: BaseFrameNotifier):
+    channel = _default_channel()
+    if channel:
+        # The reader thread may still be waiting on the old notifier
+        channel._retired_notifiers.append(channel.notifier)
+        channel.notifier = notifier
+        print(f"Frame notifier set to: {type(notifier).__name__}")
+
+
+def set_zero_copy(enabled: bool):
+    """Choose between zero-copy frame leases and copying frames out of shared memory"""
+    if g_engine:
+        g_engine.zero_copy = enabled
+        print(f"Zero-copy frame access: {'on' if enabled else 'off'}")
+
+
+def set_frame_policy(policy: str):
+    """Take the newest ready ring frame ("newest") or every frame in order ("every")"""
+    if g_engine and g_engine.set_frame_policy(policy):
+        print(f"Frame policy: {policy}")
+
+
+def set_roi_mode(mode: str, margin: float = None):
+    """Run inference on the whole frame ("full"), the ROI union ("union") or each ROI ("tiles")"""
+    if g_engine and g_engine.set_roi_mode(mode, margin):
+        print(f"ROI inference mode: {mode}")
+
+
+def set_event_filter(options: Optional[Dict[str, Any]] = None, **kwargs):
+    """Configure duplicate-event suppression, e.g. set_event_filter(min_interval=2.0).
+
+    set_event_filter(None) reports every frame with detections again.
+    """
+    if g_engine:
+        if options is None and not kwargs:
+            g_engine.set_event_filter(None)
+            print("Event suppression: off")
+        else:
+            g_engine.set_event_filter({**(options or {}), **kwargs})
+            print(f"Event suppression: {g_engine.event_filter_options or 'defaults'}")
+
+
+def set_tracking(options: Optional[Dict[str, Any]] = None, **kwargs):
+    """Enable skip-frame inference, e.g. set_tracking(detect_every=4).
+
+    set_tracking(None) runs the detector on every frame again.
+    """
+    if g_engine:
+        if options is None and not kwargs:
+            g_engine.set_tracking(None)
+            print("Tracking: off")
+        else:
+            g_engine.set_tracking({**(options or {}), **kwargs})
+            print(f"Tracking: {g_engine.tracking_options or 'defaults'}")
+
+
+def set_motion_gate(options: Optional[Dict[str, Any]] = None, **kwargs):
+    """Enable motion-gated inference, e.g. set_motion_gate(motion_fraction=0.005).
+
+    set_motion_gate(None) runs the detector on every frame again.
+    """
+    if g_engine:
+        if options is None and not kwargs:
+            g_engine.set_motion_gate(None)
+            print("Motion gate: off")
+        else:
+            g_engine.set_motion_gate({**(options or {}), **kwargs})
+            print(f"Motion gate: {g_engine.motion_gate_options or 'defaults'}")
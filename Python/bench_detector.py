@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Detector backend benchmark - Ultralytics/torch vs ONNX Runtime vs OpenVINO
+
+Reports the median time per detect_batch call and per frame for each
+backend that can be loaded, from the YUV420 frame to the final person
+boxes (letterbox, forward pass, decoding, NMS). Uses a synthetic frame
+unless --yuv points at a raw I420 frame; use a frame with people in it to
+compare the detections as well.
+
+    python bench_detector.py --onnx yolov8n.onnx
+    python bench_detector.py --yuv clip.yuv --width 1920 --height 1080 --batch 1 4 --threads 4
+"""
+import argparse
+import statistics
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_jpeg import load_frame, synthetic_frame
+from detectors import YOLOHumanDetector
+
+
+def build_detectors(args):
+    detectors = {}
+    if "ultralytics" in args.backends:
+        detectors["ultralytics"] = YOLOHumanDetector(args.model_size, args.confidence)
+    for backend in ("onnxruntime", "openvino"):
+        if backend in args.backends:
+            from onnx_detector import OnnxHumanDetector
+            detectors[backend] = OnnxHumanDetector(args.onnx, backend, args.confidence,
+                                                   intra_threads=args.threads, inter_threads=args.inter_threads)
+    return {name: d for name, d in detectors.items() if d._model is not None}
+
+
+def measure(detector, requests, runs: int):
+    results = detector.detect_batch(requests)  # Warm up allocations and kernels
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        detector.detect_batch(requests)
+        times.append(time.perf_counter() - start)
+    return len(results[0]), statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--yuv", help="raw I420 file, first frame is used")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--model-size", default="n")
+    parser.add_argument("--onnx", default="yolov8n.onnx")
+    parser.add_argument("--backends", nargs="+", default=["ultralytics", "onnxruntime", "openvino"])
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 = backend default")
+    parser.add_argument("--inter-threads", type=int, default=1)
+    parser.add_argument("--confidence", type=float, default=0.25)
+    args = parser.parse_args()
+
+    w, h = args.width, args.height
+    frame = load_frame(args.yuv, w, h) if args.yuv else synthetic_frame(w, h)
+    detectors = build_detectors(args)
+    if not detectors:
+        raise SystemExit("No detector backend could be loaded")
+
+    print(f"{w}x{h}, {args.runs} runs, median ms per batch / per frame (persons in frame 0)")
+    print(f"{'backend':>12} | " + " | ".join(f"{'batch ' + str(b):>22}" for b in args.batch))
+    for name, detector in detectors.items():
+        cells = []
+        for batch in args.batch:
+            requests = [(frame, w, h, None, None)] * batch
+            persons, ms = measure(detector, requests, args.runs)
+            cells.append(f"{ms:8.2f} / {ms / batch:6.2f} ({persons:>2})")
+        print(f"{name:>12} | " + " | ".join(f"{c:>22}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Control server load test - /Alive latency during SetParameters traffic
+
+Starts SimpleHttpServer in-process (asyncio mode on an event loop thread,
+like main.py runs it) and probes /Alive over one keep-alive connection
+while --posters clients send /SetParameters with --rois ROI groups each.
+Every --slow-th poster trickles its body over --drip seconds, the way a
+slow or congested client would. Reports /Alive p50/p99/max per mode.
+
+    python bench_http_server.py
+    python bench_http_server.py --modes asyncio --posters 16 --rois 200 --seconds 10
+"""
+import argparse
+import asyncio
+import contextlib
+import http.client
+import json
+import socket
+import statistics
+import sys
+import os
+import threading
+import time
+from typing import List
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from http_server import MODES, SimpleHttpServer
+
+
+def serve_in_thread(mode: str, **options) -> SimpleHttpServer:
+    """SimpleHttpServer on an ephemeral port; asyncio mode gets its own loop thread"""
+    server = SimpleHttpServer(["http://127.0.0.1:0/"], mode, **options)
+    if mode == "threaded":
+        asyncio.run(server.start_async())
+        return server
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run_loop():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start_async())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run_loop, daemon=True).start()
+    started.wait()
+    return server
+
+
+def parameters_body(rois: int) -> bytes:
+    groups = [{"sensitivity": 50, "threshold": 50,
+               "rects": [{"x": 10 * i, "y": 10}, {"x": 10 * i + 100, "y": 10},
+                         {"x": 10 * i + 100, "y": 200}, {"x": 10 * i, "y": 200}]}
+              for i in range(rois)]
+    return json.dumps({"version": "1.2", "analytics_event_api_url": "http://127.0.0.1:8080/api/events",
+                       "image_width": 1920, "image_height": 1080, "jpg_compress": 50,
+                       "rois": groups}).encode("utf-8")
+
+
+def post_parameters(port: int, body: bytes, drip: float, stop: threading.Event):
+    """POST /SetParameters in a loop, over drip seconds per body when drip > 0"""
+    head = (f"POST /SetParameters HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode("ascii")
+    chunks = 20 if drip > 0 else 1
+    step = -(-len(body) // chunks)
+    while not stop.is_set():
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+                while not stop.is_set():
+                    sock.sendall(head)
+                    for i in range(0, len(body), step):
+                        sock.sendall(body[i:i + step])
+                        if drip > 0:
+                            time.sleep(drip / chunks)
+                    # Responses are small; read until the JSON body arrives
+                    response = b""
+                    while not response.endswith(b"}"):
+                        data = sock.recv(4096)
+                        if not data:
+                            raise ConnectionError
+                        response += data
+        except OSError:
+            time.sleep(0.01)
+
+
+def probe_alive(port: int, seconds: float, interval: float) -> List[float]:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        connection.request("GET", "/Alive")
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(interval)
+    connection.close()
+    return latencies
+
+
+def run(mode: str, posters: int, slow_every: int, rois: int, drip: float, seconds: float,
+        interval: float) -> List[float]:
+    server = serve_in_thread(mode)
+    body = parameters_body(rois)
+    stop = threading.Event()
+    threads = [threading.Thread(target=post_parameters, daemon=True,
+                                args=(server.port, body, drip if slow_every and i % slow_every == 0 else 0, stop))
+               for i in range(posters)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        return probe_alive(server.port, seconds, interval)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=35)
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--posters", type=int, default=8, help="concurrent SetParameters clients")
+    parser.add_argument("--slow", type=int, default=2, help="every n-th poster drips its body, 0 = none")
+    parser.add_argument("--drip", type=float, default=1.0, help="seconds to send one slow body")
+    parser.add_argument("--rois", type=int, default=100, help="ROI groups per SetParameters body")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=0.005, help="pause between /Alive probes")
+    args = parser.parse_args()
+
+    print(f"{args.posters} posters ({args.slow and args.posters // args.slow or 0} slow), "
+          f"{len(parameters_body(args.rois))} byte bodies, {args.seconds:.0f} s")
+    print(f"{'mode':>9} | {'probes':>6} | {'p50 ms':>7} | {'p99 ms':>7} | {'max ms':>7}")
+    report = sys.stdout
+    # The SetParameters handler prints every body it parses
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for mode in args.modes:
+            latencies = sorted(run(mode, args.posters, args.slow, args.rois, args.drip, args.seconds,
+                                   args.interval))
+            p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000
+            print(f"{mode:>9} | {len(latencies):>6} | {statistics.median(latencies) * 1000:7.2f} | "
+                  f"{p99:7.2f} | {latencies[-1] * 1000:7.2f}", file=report, flush=True)
+
+
+if __name__ == "__main__":
+    main()
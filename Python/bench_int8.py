@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+INT8 evaluation - latency and recall/precision against the FP32 detector
+
+Runs the FP32 reference (Ultralytics YOLOHumanDetector, or the FP32 ONNX
+graph with --reference onnx) and the FP32 and INT8 ONNX models over frames
+captured with "quantize.py capture". The reference boxes count as ground
+truth: a candidate box matching a reference box with IoU >= --iou is a hit.
+Evaluate on frames not used for calibration to avoid a flattering result.
+
+    python bench_int8.py --dir eval --model yolov8n.onnx
+    python bench_int8.py --dir eval --reference onnx --backend openvino --threads 4
+"""
+import argparse
+import statistics
+import sys
+import os
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from detectors import YOLOHumanDetector
+from onnx_detector import OnnxHumanDetector
+from quantize import load_frames
+from tracker import greedy_match, iou_matrix
+
+Box = Tuple[int, int, int, int]
+
+
+def match_count(reference: Sequence[Box], candidate: Sequence[Box], iou_threshold: float = 0.5) -> int:
+    """Candidate boxes matched one-to-one with a reference box at IoU >= iou_threshold"""
+    if not reference or not candidate:
+        return 0
+
+    def xyxy(boxes):
+        b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        return np.concatenate([b[:, :2], b[:, :2] + b[:, 2:]], axis=1)
+
+    return len(greedy_match(iou_matrix(xyxy(reference), xyxy(candidate)), iou_threshold))
+
+
+def run(detector, frames) -> Tuple[List[List[Box]], List[float]]:
+    detector.detect(*frames[0])  # Warm up allocations and kernels
+    results, times = [], []
+    for frame, width, height in frames:
+        start = time.perf_counter()
+        results.append(detector.detect(frame, width, height))
+        times.append(time.perf_counter() - start)
+    return results, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default="calib", help="frames saved by quantize.py capture")
+    parser.add_argument("--max-frames", type=int, default=200)
+    parser.add_argument("--model", default="yolov8n.onnx", help="FP32 ONNX model; INT8 is <model>.int8.onnx")
+    parser.add_argument("--model-size", default="n", help="Ultralytics reference model size")
+    parser.add_argument("--reference", choices=("ultralytics", "onnx"), default="ultralytics")
+    parser.add_argument("--backend", choices=("onnxruntime", "openvino"), default="onnxruntime")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 = backend default")
+    parser.add_argument("--confidence", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.dir, args.max_frames)
+    if not frames:
+        raise SystemExit(f"No frames in {args.dir}; capture some with: python quantize.py capture")
+
+    def onnx(int8):
+        return OnnxHumanDetector(args.model, args.backend, args.confidence,
+                                 intra_threads=args.threads, int8=int8)
+
+    if args.reference == "ultralytics":
+        reference = YOLOHumanDetector(args.model_size, args.confidence)
+    else:
+        reference = onnx(False)
+    if reference._model is None:
+        raise SystemExit("FP32 reference detector could not be loaded")
+    detectors = {f"fp32 {args.reference}": reference}
+    if args.reference == "ultralytics":
+        detectors[f"fp32 {args.backend}"] = onnx(False)  # The ONNX reference already is this model
+    detectors[f"int8 {args.backend}"] = onnx(True)
+
+    truth, _ = run(reference, frames)
+    expected = sum(len(boxes) for boxes in truth)
+    print(f"{len(frames)} frames, {expected} reference persons, IoU >= {args.iou}")
+    print(f"{'model':>20} | {'median ms':>9} | {'p95 ms':>7} | {'persons':>7} | {'recall':>6} | {'precision':>9}")
+    for name, detector in detectors.items():
+        if detector._model is None:
+            print(f"{name:>20} | not available")
+            continue
+        results, times = run(detector, frames)
+        found = sum(len(boxes) for boxes in results)
+        hits = sum(match_count(t, r, args.iou) for t, r in zip(truth, results))
+        recall = hits / expected if expected else 1.0
+        precision = hits / found if found else 1.0
+        p95 = sorted(times)[int(0.95 * (len(times) - 1))] * 1000
+        print(f"{name:>20} | {statistics.median(times) * 1000:9.2f} | {p95:7.2f} | {found:>7} | "
+              f"{recall:6.3f} | {precision:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+JPEG keyframe benchmark - optimized (optimize=True) vs fast encoder path
+
+Reports the encoded size and the median time per keyframe for each
+jpg_compress value, from YUV420 to the base64 payload handed to the HTTP
+client. Uses a synthetic gradient frame unless --yuv points at a raw
+I420 frame (the first frame of the file is used).
+
+    python bench_jpeg.py
+    python bench_jpeg.py --yuv clip.yuv --width 1920 --height 1080 --runs 50
+"""
+import argparse
+import statistics
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from image_processor import ImageProcessor, FastJpegEncoder
+from yuv_converter import frame_size, shared_rgb_cache
+
+DETECTIONS = [(100, 120, 200, 360), (700, 300, 180, 320)]
+
+
+def synthetic_frame(width: int, height: int) -> bytes:
+    """Gradients with some texture, so the entropy coder has work to do"""
+    yy, xx = np.mgrid[0:height, 0:width]
+    y = (16 + (xx * 219 // max(1, width - 1)) ^ ((yy // 8) & 0x1f)).astype(np.uint8)
+    cy, cx = np.mgrid[0:height // 2, 0:width // 2]
+    u = (64 + (cx * 128 // max(1, width // 2 - 1))).astype(np.uint8)
+    v = (64 + (cy * 128 // max(1, height // 2 - 1))).astype(np.uint8)
+    return y.tobytes() + u.tobytes() + v.tobytes()
+
+
+def load_frame(path: str, width: int, height: int) -> bytes:
+    size = frame_size(width, height)
+    with open(path, "rb") as f:
+        data = f.read(size)
+    if len(data) != size:
+        raise SystemExit(f"{path}: expected at least {size} bytes for {width}x{height}, got {len(data)}")
+    return data
+
+
+def measure(encode, runs: int):
+    encode()  # Warm up scratch buffers
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        payload = encode()
+        times.append(time.perf_counter() - start)
+    return len(payload), statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--yuv", help="raw I420 file, first frame is used")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--quality", type=int, nargs="+", default=[20, 50, 75, 90])
+    args = parser.parse_args()
+
+    w, h = args.width, args.height
+    frame = load_frame(args.yuv, w, h) if args.yuv else synthetic_frame(w, h)
+    fast = FastJpegEncoder()
+
+    print(f"{w}x{h}, {args.runs} runs, median ms per keyframe (base64 bytes)")
+    print(f"{'quality':>7} | {'optimized':>18} | {'fast (yuv)':>18} | {'fast (cached rgb)':>18}")
+    for quality in args.quality:
+        optimized = measure(
+            lambda: ImageProcessor.yuv420_to_base64_jpeg(frame, w, h, quality, DETECTIONS), args.runs)
+        fast_yuv = measure(
+            lambda: fast.encode_base64(quality, DETECTIONS, frame, w, h), args.runs)
+        # Detector already converted the frame, as in the running pipeline
+        rgb = shared_rgb_cache.get(frame, w, h)
+        fast_rgb = measure(
+            lambda: fast.encode_base64(quality, DETECTIONS, rgb_array=rgb), args.runs)
+        shared_rgb_cache.release(frame)
+
+        cells = [f"{ms:7.2f} ({size:>8})" for size, ms in (optimized, fast_yuv, fast_rgb)]
+        print(f"{quality:>7} | {cells[0]:>18} | {cells[1]:>18} | {cells[2]:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark - shared memory frame to event POST
+
+Starts a mock receiver, one main.py wrapper per channel (or, with --shared,
+one wrapper for every channel via ports=, sharing one model) and shm_producer
+frame producers, configures every wrapper through /SetParameters and then
+steps the producer frame rate. For each step it reports the frames
+produced, processed and dropped, frame-to-POST latency percentiles (frame
+timestamp to arrival at the receiver) and processed frames per CPU core
+of the wrapper processes. The highest step dropping at most --max-drop of
+the frames is the sustainable rate. Linux only (shared memory files, /proc).
+
+Events are only posted for frames with detections: replay a clip with
+people in it, otherwise only throughput and CPU are measured.
+
+    python bench_pipeline.py --channels 2 --fps 5 10 15 --clip clip.yuv --width 1920 --height 1080
+    python bench_pipeline.py --channels 1 --fps 30 --wrapper-args backend=onnxruntime threads=4
+    python bench_pipeline.py --channels 1 --fps 30 --slots 4 --wrapper-args frame_policy=every
+    python bench_pipeline.py --channels 4 --fps 10 15 --shared --wrapper-args infer_batch=4
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_receiver import MockReceiver
+from shm_producer import open_clip, start_producers
+
+
+def request(port: int, method: str, path: str, body: dict = None, timeout: float = 5.0):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        connection.request(method, path, payload, {"Content-Type": "application/json"} if payload else {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def wait_alive(port: int, process: subprocess.Popen, timeout: float) -> bool:
+    """Poll /Alive until the wrapper (and its model) is up"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            if request(port, "GET", "/Alive", timeout=1.0)[0] == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def metric_total(port: int, name: str) -> float:
+    """Sum of one metric over the label sets of channel port, from the wrapper's /Metrics
+
+    A wrapper serving several channels reports all of them on every port.
+    """
+    _, body = request(port, "GET", "/Metrics")
+    label = f'channel="{port}"'
+    total = 0.0
+    for line in body.decode("utf-8").splitlines():
+        if line.startswith(name + "{") and label in line:
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: List[float], p: float) -> float:
+    return values[min(len(values) - 1, int(p * len(values)))] if values else float("nan")
+
+
+def run_step(args, ports: List[int], wrappers: List[subprocess.Popen], clip, receiver, fps: float) -> Dict:
+    producers = start_producers(ports, clip, fps, slots=args.slots)
+    try:
+        time.sleep(args.warmup)
+        produced = sum(p.produced for p in producers)
+        dropped = sum(p.dropped for p in producers)
+        processed = sum(metric_total(port, "analytics_frames_processed_total") for port in ports)
+        cpu = sum(cpu_seconds(w.pid) for w in wrappers)
+        arrivals = len(receiver.stats.arrivals)
+        start = time.monotonic()
+
+        time.sleep(args.seconds)
+
+        elapsed = time.monotonic() - start
+        produced = sum(p.produced for p in producers) - produced
+        dropped = sum(p.dropped for p in producers) - dropped
+        processed = sum(metric_total(port, "analytics_frames_processed_total") for port in ports) - processed
+        cpu = sum(cpu_seconds(w.pid) for w in wrappers) - cpu
+        window = receiver.stats.arrivals[arrivals:]
+    finally:
+        for producer in producers:
+            producer.close()
+
+    latencies = sorted(arrival * 1000 - timestamp for _, timestamp, arrival in window)
+    due = produced + dropped
+    return {
+        "fps": fps,
+        "produced_fps": produced / elapsed,
+        "processed_fps": processed / elapsed,
+        "drop": dropped / due if due else 0.0,
+        "events": len(window),
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "cores": cpu / elapsed,
+        "fps_per_core": processed / cpu if cpu else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--base-port", type=int, default=51000, help="channel ports are base, base+1, ...")
+    parser.add_argument("--fps", type=float, nargs="+", default=[5, 10, 15, 30], help="producer rates to step through")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--clip", help="raw I420 clip to replay (default: synthetic scene)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="measured time per step")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured time at the start of each step")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="dropped fraction still counted as sustained")
+    parser.add_argument("--receiver-delay-ms", type=float, default=0.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--slots", type=int, default=1, help="shared memory ring slots (1 = MMF_Data layout)")
+    parser.add_argument("--shared", action="store_true",
+                        help="one wrapper process for all channels (ports=) instead of one per channel")
+    parser.add_argument("--wrapper-args", nargs="*", default=[], help="extra main.py arguments")
+    args = parser.parse_args()
+
+    if not sys.platform.startswith("linux"):
+        raise SystemExit("bench_pipeline.py needs Linux (file-backed shared memory and /proc)")
+
+    clip = open_clip(args.clip, args.width, args.height)
+    receiver = MockReceiver(delay=args.receiver_delay_ms / 1000, keep_arrivals=True).start()
+    ports = [args.base_port + i for i in range(args.channels)]
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    wrappers = []
+    try:
+        # Wrapper process per port group: every channel together, or one each
+        groups = [ports] if args.shared else [[port] for port in ports]
+        for group in groups:
+            log = open(os.path.join(workdir, f"wrapper_{group[0]}.log"), "w")
+            wrappers.append(subprocess.Popen(
+                [sys.executable, main_py, f"ports={','.join(map(str, group))}", "spool=off", "dedup=off",
+                 *args.wrapper_args],
+                cwd=workdir, stdout=log, stderr=subprocess.STDOUT))
+        for port in ports:
+            wrapper = wrappers[0] if args.shared else wrappers[ports.index(port)]
+            if not wait_alive(port, wrapper, args.startup_timeout):
+                raise SystemExit(f"Wrapper on port {port} did not come up, see the logs in {workdir}")
+            status, body = request(port, "POST", "/SetParameters", {
+                "version": "1.2", "analytics_event_api_url": receiver.url,
+                "image_width": args.width, "image_height": args.height, "jpg_compress": 50, "rois": []})
+            if status != 200:
+                raise SystemExit(f"SetParameters on port {port} failed: {status} {body!r}")
+
+        print(f"{args.channels} channel(s) in {len(wrappers)} process(es), {args.width}x{args.height}, {len(clip)} frame "
+              f"{'clip' if args.clip else 'synthetic scene'}, {args.slots} slot(s), {args.seconds:g} s per step, "
+              f"logs in {workdir}")
+        print(f"{'fps':>5} | {'produced':>8} | {'processed':>9} | {'dropped':>7} | {'events':>6} | "
+              f"{'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'cores':>5} | {'fps/core':>8}")
+        sustained = None
+        for fps in args.fps:
+            r = run_step(args, ports, wrappers, clip, receiver, fps)
+            print(f"{r['fps']:5g} | {r['produced_fps']:8.1f} | {r['processed_fps']:9.1f} | {r['drop']:7.1%} | "
+                  f"{r['events']:6d} | {r['p50']:7.1f} | {r['p95']:7.1f} | {r['p99']:7.1f} | "
+                  f"{r['cores']:5.2f} | {r['fps_per_core']:8.1f}")
+            if r["drop"] <= args.max_drop:
+                sustained = fps
+        if sustained is None:
+            print(f"No step was sustained (more than {args.max_drop:.0%} dropped)")
+        else:
+            print(f"Sustained: {sustained:g} fps per channel, {sustained * args.channels:g} fps total")
+    finally:
+        for wrapper in wrappers:
+            wrapper.terminate()
+        for wrapper in wrappers:
+            try:
+                wrapper.wait(10)
+            except subprocess.TimeoutExpired:
+                wrapper.kill()
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 Data structure definitions - correspond to structs in C# and C++
 """
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import List, Optional, Union
 import struct
 
 @dataclass
@@ -88,6 +88,7 @@ class AnalyticsResult:
     """Analytics result structure"""
     version: str = "1.2"
     port_num: int = 0
-    keyframe: str = ""  # Base64 encoded JPEG image
+    keyframe: Union[str, bytes] = ""  # Base64 encoded JPEG image (ASCII bytes from the fast encoder)
     timestamp: int = 0
     rois_rects: List[List[dict]] = field(default_factory=list)  # Format: [[{"x":x1,"y":y1}, {"x":x2,"y":y2}], ...]
+    track_ids: List[int] = field(default_factory=list)  # Track ID per rois_rects entry, sent only when tracking is on
@@ -1,7 +1,18 @@
 """
 Detector module with a pluggable interface and a default human detector.
 """
-from typing import List, Tuple
+import math
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import default_registry, thread_stages
+from roi_index import filter_detections
+
+# (yuv420_frame, width, height, roi_rects, confidence) for one frame of a batch
+DetectionRequest = Tuple[Any, int, int, Optional[List[Tuple[int, int, int, int]]], Optional[float]]
 
 # Lazy import guards for optional dependencies
 _yolo = None
@@ -20,11 +31,21 @@ class BaseDetector:
     """Abstract detector interface.
 
     detect returns a list of bounding boxes (x, y, w, h) in pixel coordinates.
+    yuv420_frame may be a memoryview leased from shared memory; it is only
+    valid for the duration of the call, so detectors must not keep it.
+    confidence overrides the detector-wide threshold for this call, which
+    lets channels with different settings share one loaded model.
     """
     def detect(self, yuv420_frame: bytes, width: int, height: int, 
-               roi_rects: List[Tuple[int, int, int, int]] = None) -> List[Tuple[int, int, int, int]]:
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
         raise NotImplementedError
     
+    def detect_batch(self, requests: List[DetectionRequest]) -> List[List[Tuple[int, int, int, int]]]:
+        """Detect on several frames at once; the default runs them one by one"""
+        return [self.detect(frame, width, height, roi_rects, confidence)
+                for (frame, width, height, roi_rects, confidence) in requests]
+
     def set_confidence_threshold(self, threshold: float):
         """Set the confidence threshold for detection"""
         pass
@@ -32,27 +53,238 @@ class BaseDetector:
 class MockDetector(BaseDetector):
     """No-op detector used as fallback when dependencies are missing."""
     def detect(self, yuv420_frame: bytes, width: int, height: int, 
-               roi_rects: List[Tuple[int, int, int, int]] = None) -> List[Tuple[int, int, int, int]]:
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
         print("[MockDetector] No detection performed.")
         return []
 
 
+class YUVLetterbox:
+    """Letterbox a YUV420 frame straight from its planes into the model input.
+
+    Luma is resampled bilinearly and chroma by nearest neighbour, at the
+    model resolution only, then converted to a normalized (3, S, S) float32
+    tensor padded with gray like Ultralytics' LetterBox. A 1080p frame is
+    never converted to RGB at full resolution.
+    """
+
+    pad_value = 114
+
+    def __init__(self, input_size: int = 640, layout: str = None, full_range: bool = None,
+                 max_scale: float = 4.0):
+        self.input_size = input_size
+        self.layout = layout
+        self.full_range = full_range
+        self.max_scale = max_scale  # Upscaling limit for small crops
+        self._plans = {}
+
+    def _plan(self, width: int, height: int, crop=None):
+        key = (width, height, crop)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        import numpy as np
+
+        size = self.input_size
+        off_x, off_y = 0, 0
+        if crop is not None:
+            off_x, off_y = crop[0], crop[1]
+            width, height = crop[2] - crop[0], crop[3] - crop[1]
+        scale = min(size / width, size / height, self.max_scale)
+        new_w = max(1, int(round(width * scale)))
+        new_h = max(1, int(round(height * scale)))
+        pad_x = (size - new_w) // 2
+        pad_y = (size - new_h) // 2
+
+        def taps(out_len, src_len):
+            # Source sample positions at pixel centres, 8-bit fractional weights
+            pos = (np.arange(out_len, dtype=np.float64) + 0.5) * (src_len / out_len) - 0.5
+            pos = np.clip(pos, 0, src_len - 1)
+            i0 = np.floor(pos).astype(np.intp)
+            i1 = np.minimum(i0 + 1, src_len - 1)
+            w1 = np.round((pos - i0) * 256).astype(np.int32)
+            return i0, i1, w1, np.clip(np.round(pos).astype(np.intp) // 2, 0, src_len // 2 - 1)
+
+        y0, y1, wy, cy = taps(new_h, height)
+        x0, x1, wx, cx = taps(new_w, width)
+        # Crops start on even coordinates, so chroma indices shift by half the offset
+        plan = (scale, new_w, new_h, pad_x, pad_y, y0 + off_y, y1 + off_y, wy[:, None],
+                x0 + off_x, x1 + off_x, wx, cy + off_y // 2, cx + off_x // 2)
+        if len(self._plans) >= 32:
+            self._plans.clear()
+        self._plans[key] = plan
+        return plan
+
+    def __call__(self, yuv420_frame, width: int, height: int, out=None, crop=None):
+        """Return (tensor, transform) where transform = (scale, pad_x, pad_y, off_x, off_y).
+
+        crop = (x1, y1, x2, y2) with even coordinates letterboxes only that
+        region of the frame, upscaled by at most max_scale.
+        """
+        import numpy as np
+        from yuv_converter import split_planes, yuv444_to_rgb_chw
+
+        size = self.input_size
+        scale, new_w, new_h, pad_x, pad_y, y0, y1, wy, x0, x1, wx, cy, cx = self._plan(width, height, crop)
+        if out is None:
+            out = np.empty((3, size, size), dtype=np.float32)
+
+        y, u, v = split_planes(yuv420_frame, width, height, self.layout)
+
+        # Bilinear luma, kept in 1/256 units: rows first, then columns
+        rows = y[y0].astype(np.int32) * (256 - wy) + y[y1].astype(np.int32) * wy
+        luma = (rows[:, x0] * (256 - wx) + rows[:, x1] * wx) >> 8
+
+        # Nearest chroma at the model resolution
+        u_s = u[cy][:, cx]
+        v_s = v[cy][:, cx]
+
+        out.fill(self.pad_value / 255.0)
+        yuv444_to_rgb_chw(luma, u_s, v_s, out[:, pad_y:pad_y + new_h, pad_x:pad_x + new_w], self.full_range)
+        off_x, off_y = (crop[0], crop[1]) if crop is not None else (0, 0)
+        return out, (scale, pad_x, pad_y, off_x, off_y)
+
+    @staticmethod
+    def map_boxes(xyxy, transform, width: int, height: int):
+        """Map model-input xyxy boxes back to source frame coordinates"""
+        import numpy as np
+
+        scale, pad_x, pad_y = transform[:3]
+        off_x, off_y = transform[3:5] if len(transform) > 3 else (0, 0)
+        boxes = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).copy()
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / scale + off_x
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / scale + off_y
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+        return boxes
+
+
+ROI_MODES = ("full", "union", "tiles")
+PERSON_CLASS = 0  # COCO class index of "person"
+
+
+def _even_crop(x1: float, y1: float, x2: float, y2: float, width: int, height: int) -> Tuple[int, int, int, int]:
+    """Clamp a region to the frame, widened to even coordinates for the chroma planes"""
+    x1 = max(0, math.floor(x1)) & ~1
+    y1 = max(0, math.floor(y1)) & ~1
+    x2 = min(width, (math.ceil(x2) + 1) & ~1)
+    y2 = min(height, (math.ceil(y2) + 1) & ~1)
+    return x1, y1, max(x2, x1 + 2), max(y2, y1 + 2)
+
+
+def plan_roi_crops(roi_rects: Optional[List[Tuple[int, int, int, int]]], width: int, height: int,
+                   mode: str = "union", margin: float = 0.1,
+                   max_coverage: float = 0.6) -> List[Optional[Tuple[int, int, int, int]]]:
+    """Regions to run inference on for a frame with these ROIs.
+
+    Returns [None] for a full-frame pass. "union" crops the bounding box of
+    all ROIs, "tiles" crops each ROI separately. Every region is padded by
+    ``margin`` of its size so people standing on an ROI edge are fully
+    visible. When the regions would cover more than max_coverage of the
+    frame, cropping gains little and a full-frame pass is used instead.
+    """
+    if mode == "full" or not roi_rects:
+        return [None]
+
+    rects = []
+    for roi in roi_rects:
+        x1, x2 = sorted((roi[0], roi[2]))
+        y1, y2 = sorted((roi[1], roi[3]))
+        rects.append((x1, y1, x2, y2))
+    if mode == "union":
+        rects = [(min(r[0] for r in rects), min(r[1] for r in rects),
+                  max(r[2] for r in rects), max(r[3] for r in rects))]
+
+    crops = []
+    for x1, y1, x2, y2 in rects:
+        mx, my = (x2 - x1) * margin, (y2 - y1) * margin
+        crops.append(_even_crop(x1 - mx, y1 - my, x2 + mx, y2 + my, width, height))
+    covered = sum((c[2] - c[0]) * (c[3] - c[1]) for c in crops)
+    if covered > max_coverage * width * height:
+        return [None]
+    return crops
+
+
+def nms_indices(xyxy, scores, iou_threshold: float = 0.5):
+    """Greedy non-maximum suppression; indices of the kept (N, 4) xyxy boxes, best first"""
+    import numpy as np
+
+    boxes = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        ih = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = iw * ih
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou < iou_threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+
+def nms_xywh(detections: List[Tuple[int, int, int, int]], scores: List[float],
+             iou_threshold: float = 0.5) -> List[Tuple[int, int, int, int]]:
+    """Greedy non-maximum suppression over (x, y, w, h) boxes"""
+    import numpy as np
+
+    if len(detections) < 2:
+        return list(detections)
+    boxes = np.asarray(detections, dtype=np.float32)
+    boxes[:, 2:] += boxes[:, :2]
+    keep = nms_indices(boxes, scores, iou_threshold)
+    return [detections[i] for i in sorted(keep)]
+
+
 class YOLOHumanDetector(BaseDetector):
     """Modern YOLO-based human detector using Ultralytics YOLOv8.
     
     This is much faster and more accurate than traditional methods.
     Requires: pip install ultralytics
+
+    With direct_yuv (default) frames are letterboxed straight from the YUV
+    planes to an input_size x input_size tensor and boxes are mapped back to
+    frame coordinates; otherwise the full-resolution RGB image is handed to
+    Ultralytics, which resizes it itself.
+
+    roi_mode chooses what is fed to the model when ROIs are set:
+        full  - the whole frame, boxes outside the ROIs are dropped (default)
+        union - only the bounding box of all ROIs
+        tiles - each ROI as its own batch item, boxes merged with NMS
+    Crops are padded by roi_margin and upscaled (up to 4x) to the model
+    input, so small distant ROIs get more pixels per person. See
+    plan_roi_crops for when a full-frame pass is used anyway.
     """
-    def __init__(self, model_size='n', confidence_threshold=0.3):  # n=tiny, s=small, m=medium, l=large, x=xlarge
+    def __init__(self, model_size='n', confidence_threshold=0.3,  # n=tiny, s=small, m=medium, l=large, x=xlarge
+                 input_size=640, direct_yuv=True, roi_mode="full", roi_margin=0.1):
+        if roi_mode not in ROI_MODES:
+            raise ValueError(f"Unknown roi_mode '{roi_mode}', expected one of {ROI_MODES}")
+        self.input_size = input_size
+        self.direct_yuv = direct_yuv
+        self.roi_mode = roi_mode
+        self.roi_margin = roi_margin
+        self._letterbox = YUVLetterbox(input_size)
+        self._input_batch = None  # Preallocated (N, 3, S, S) model input, grown on demand
+        self.confidence_threshold = confidence_threshold
+        self._delegate = MockDetector()
+        start = time.perf_counter()
+        self._model = self._load_model(model_size)
+        self.load_seconds = time.perf_counter() - start
+        if self._model is not None:
+            default_registry.gauge("analytics_model_load_seconds", "Time to load the detection model",
+                                   detector=type(self).__name__, model=model_size).set(self.load_seconds)
+
+    def _load_model(self, model_size):
+        """Load the Ultralytics model, None if it is unavailable"""
         YOLO = _ensure_yolo()
         if YOLO is None:
-            self._delegate = MockDetector()
-            self._model = None
             print("[YOLOHumanDetector] Ultralytics YOLO not available. Install with: pip install ultralytics")
-            return
-        
-        self.confidence_threshold = confidence_threshold
-        
+            return None
+
         try:
             # Load YOLOv8 model (will download automatically if not present)
             model_name = f'yolov8{model_size}.pt'
@@ -60,7 +292,7 @@ class YOLOHumanDetector(BaseDetector):
             
             # Try loading with default settings first
             try:
-                self._model = YOLO(model_name)
+                model = YOLO(model_name)
             except Exception as load_error:
                 if "weights_only" in str(load_error) or "WeightsUnpickler" in str(load_error):
                     print(f"[YOLOHumanDetector] Secure loading failed, using trusted fallback...")
@@ -73,17 +305,17 @@ class YOLOHumanDetector(BaseDetector):
                         return original_load(*args, **kwargs)
                     torch.load = patched_load
                     try:
-                        self._model = YOLO(model_name)
+                        model = YOLO(model_name)
                     finally:
                         torch.load = original_load
                 else:
                     raise load_error
             
             print(f"[YOLOHumanDetector] YOLOv8-{model_size} model loaded successfully")
+            return model
         except Exception as e:
             print(f"[YOLOHumanDetector] Failed to load YOLO model: {e}")
-            self._delegate = MockDetector()
-            self._model = None
+            return None
 
     def set_confidence_threshold(self, threshold: float):
         """Set the confidence threshold for detection"""
@@ -91,139 +323,333 @@ class YOLOHumanDetector(BaseDetector):
         print(f"[YOLOHumanDetector] Confidence threshold set to {threshold}")
 
     def detect(self, yuv420_frame: bytes, width: int, height: int, 
-               roi_rects: List[Tuple[int, int, int, int]] = None) -> List[Tuple[int, int, int, int]]:
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
+        return self.detect_batch([(yuv420_frame, width, height, roi_rects, confidence)])[0]
+
+    def detect_batch(self, requests: List[DetectionRequest]) -> List[List[Tuple[int, int, int, int]]]:
+        """Run one batched forward pass over frames from several channels"""
         # Delegate if YOLO isn't available
         if self._model is None:
-            return self._delegate.detect(yuv420_frame, width, height)
+            return [self._delegate.detect(frame, width, height) for (frame, width, height, _, _) in requests]
 
-        import numpy as np
+        stages = thread_stages()
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        batch_results = [[] for _ in requests]
+        # One view per model input: (request index, transform); a request has
+        # several views when its ROIs are tiled
+        images = []
+        views = []
+        confidences = []
+        crops = [plan_roi_crops(roi_rects, width, height, self.roi_mode, self.roi_margin)
+                 for (_, width, height, roi_rects, _) in requests]
+        if self.direct_yuv:
+            inputs = self._batch_input(sum(len(c) for c in crops))
 
-        y_size = width * height
-        uv_size = (width * height) // 4  # U and V planes are quarter size
-        total_size = y_size + 2 * uv_size
+        for i, (yuv420_frame, width, height, roi_rects, confidence) in enumerate(requests):
+            for crop in crops[i]:
+                try:
+                    if self.direct_yuv:
+                        if len(yuv420_frame) < width * height * 3 // 2:
+                            print(f"[YOLOHumanDetector] Not enough data: got {len(yuv420_frame)} bytes")
+                            break
+                        _, transform = self._letterbox(yuv420_frame, width, height, out=inputs[len(images)], crop=crop)
+                        image = inputs[len(images)]
+                    else:
+                        image = self._yuv420_to_rgb(yuv420_frame, width, height)
+                        transform = None
+                        if image is not None and crop is not None:
+                            # Ultralytics letterboxes the crop itself; only the offset is ours
+                            image = image[crop[1]:crop[3], crop[0]:crop[2]]
+                            transform = (1.0, 0, 0, crop[0], crop[1])
+                except Exception as e:
+                    print(f"[YOLOHumanDetector] Conversion error: {e}")
+                    image = None
+                if image is None:
+                    break
+                images.append(image)
+                views.append((i, transform))
+                confidences.append(self.confidence_threshold if confidence is None else confidence)
 
-        if len(yuv420_frame) < total_size:
-            print(f"[YOLOHumanDetector] Not enough data: got {len(yuv420_frame)} bytes, need at least {total_size}")
-            return []
+        if not images:
+            return batch_results
+        converted = perf_counter()
+        stages["yuv_conversion"].observe(converted - start)
 
         try:
-            # Parse YUV420 data
-            y = np.frombuffer(yuv420_frame, dtype=np.uint8, count=y_size).reshape((height, width))
-            
-            # U and V planes are interleaved and subsampled
-            uv_start = y_size
-            uv_data = np.frombuffer(yuv420_frame, dtype=np.uint8, offset=uv_start, count=2*uv_size)
-            
-            # Reshape UV data (NV12 format: UVUVUV...)
-            uv_plane = uv_data.reshape((height//2, width//2, 2))
-            u = uv_plane[:, :, 0]  # U plane
-            v = uv_plane[:, :, 1]  # V plane
-            
-            # Upsample U and V to full resolution
-            u_upsampled = np.kron(u, np.ones((2, 2), dtype=np.uint8))
-            v_upsampled = np.kron(v, np.ones((2, 2), dtype=np.uint8))
-            
-            # Convert YUV to RGB
-            # YUV to RGB conversion formulas
-            y_float = y.astype(np.float32)
-            u_float = u_upsampled.astype(np.float32) - 128
-            v_float = v_upsampled.astype(np.float32) - 128
-            
-            r = y_float + 1.402 * v_float
-            g = y_float - 0.344136 * u_float - 0.714136 * v_float
-            b = y_float + 1.772 * u_float
-            
-            # Clip to valid range and convert to uint8
-            rgb = np.stack([r, g, b], axis=-1)
-            rgb = np.clip(rgb, 0, 255).astype(np.uint8)
-            
-            # Debug: Save converted image for inspection only when persons are detected
-            #import datetime
-            #now = datetime.datetime.now()
-            #debug_filename = f"debug_yuv2rgb_{now.strftime('%Y%m%d_%H%M%S_%f')[:-3]}.jpg"
-            #from PIL import Image
-            
-            # Run YOLO inference with configurable confidence threshold
-            results = self._model(rgb, conf=self.confidence_threshold, verbose=False)
+            # The batch runs at the loosest threshold and each frame is filtered with its own
+            results = self._infer(inputs[:len(images)] if self.direct_yuv else images, min(confidences))
+            inferred = perf_counter()
+            stages["inference"].observe(inferred - converted)
             
             #print(f"[YOLOHumanDetector] Running detection with confidence threshold: {self.confidence_threshold}")
             
-            detections = []
-            if results and len(results) > 0:
-                result = results[0]
-                
-                total_objects = len(result.boxes) if result.boxes is not None else 0
-                #print(f"[YOLOHumanDetector] YOLO found {total_objects} total objects")
-                
-                # Filter for person class (class 0 in COCO dataset)
-                if result.boxes is not None:
-                    person_count = 0
-                    for i, box in enumerate(result.boxes):
-                        class_id = int(box.cls.item())
-                        confidence = box.conf.item()
-                        
-                        # Check if it's a person (class 0)
-                        if class_id == 0:  # person class
-                            person_count += 1
-                            #print(f"[YOLOHumanDetector] Person {person_count}: conf={confidence:.3f}, threshold={self.confidence_threshold}")
-                            
-                            if confidence > self.confidence_threshold:
-                                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                
-                                # Convert to (x, y, w, h) format
-                                x, y = int(x1), int(y1)
-                                w, h = int(x2 - x1), int(y2 - y1)
-                                
-                                # Check if detection is within any ROI (if ROI filtering is enabled)
-                                if roi_rects is None or self._is_detection_in_roi(x, y, w, h, roi_rects):
-                                    detections.append((x, y, w, h))
-                                    #print(f"[YOLOHumanDetector] ✓ Person accepted: ({x},{y},{w},{h}) conf={confidence:.3f}")
-                                #else:
-                                #    print(f"[YOLOHumanDetector] ✗ Person outside ROI: ({x},{y},{w},{h}) conf={confidence:.3f}")
-                            #else:
-                            #    print(f"[YOLOHumanDetector] ✗ Person below threshold: conf={confidence:.3f} < {self.confidence_threshold}")
-                    
-                    #if person_count == 0:
-                    #    print(f"[YOLOHumanDetector] No persons detected in {total_objects} objects")
-            #else:
-            #    print(f"[YOLOHumanDetector] No objects detected by YOLO")
-
-            if len(detections) > 0:
-                print(f"[YOLOHumanDetector] ✓ Final result: {len(detections)} persons detected and accepted")
-            #else:
-            #    print(f"[YOLOHumanDetector] ✗ Final result: No persons met all criteria")
-            return detections
+            scores = [[] for _ in requests]
+            for (i, transform), result, confidence in zip(views, results, confidences):
+                _, width, height, roi_rects, _ = requests[i]
+                batch_results[i].extend(self._postprocess(result, roi_rects, confidence, transform,
+                                                          width, height, scores[i]))
+            for i, frame_crops in enumerate(crops):
+                if len(frame_crops) > 1:
+                    # Overlapping tiles see the same person more than once
+                    batch_results[i] = nms_xywh(batch_results[i], scores[i])
+            stages["postprocess"].observe(perf_counter() - inferred)
+            return batch_results
             
         except Exception as e:
             print(f"[YOLOHumanDetector] Detection error: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            return batch_results
+
+    def _infer(self, source, confidence: float):
+        """Forward pass over letterboxed inputs (direct_yuv) or RGB images; one result per input"""
+        if self.direct_yuv:
+            import torch
+            # Already letterboxed and normalized: Ultralytics skips its own preprocessing
+            source = torch.from_numpy(source)
+
+        # Run YOLO inference with configurable confidence threshold; NMS only
+        # considers persons, so other classes never cost NMS time or a transfer
+        return self._model(source, conf=confidence, classes=[PERSON_CLASS], verbose=False)
+
+    def _batch_input(self, count: int):
+        """Reusable model input buffer with room for count frames"""
+        import numpy as np
+
+        if self._input_batch is None or len(self._input_batch) < count:
+            size = self.input_size
+            self._input_batch = np.empty((count, 3, size, size), dtype=np.float32)
+        return self._input_batch
+
+    def _yuv420_to_rgb(self, yuv420_frame: bytes, width: int, height: int):
+        """Convert a YUV420 frame to an RGB array, None if the frame is too short.
+
+        The conversion is cached per frame so the JPEG path can reuse it.
+        """
+        from yuv_converter import frame_size, shared_rgb_cache
+
+        total_size = frame_size(width, height)
+        if len(yuv420_frame) < total_size:
+            print(f"[YOLOHumanDetector] Not enough data: got {len(yuv420_frame)} bytes, need at least {total_size}")
+            return None
 
-    def _is_detection_in_roi(self, det_x: int, det_y: int, det_w: int, det_h: int, 
-                           roi_rects: List[Tuple[int, int, int, int]]) -> bool:
+        return shared_rgb_cache.get(yuv420_frame, width, height)
+
+    def _boxes_to_detections(self, xyxy, box_scores, roi_rects, transform=None, width: int = 0,
+                             height: int = 0, scores: List[float] = None) -> List[Tuple[int, int, int, int]]:
+        """Map (N, 4) model-input xyxy boxes to (x, y, w, h) frame boxes inside the ROIs.
+
+        box_scores are the boxes' confidences; those of the kept boxes are
+        appended to scores when given.
         """
-        Check if a detection overlaps with any ROI rectangle
-        Detection: (x, y, w, h) - top-left corner and size
-        ROI: List of (x1, y1, x2, y2) rectangles where (x1,y1) and (x2,y2) are two corner points
+        import numpy as np
+
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        box_scores = np.asarray(box_scores, dtype=np.float32).reshape(-1)
+        if transform is not None:
+            xyxy = YUVLetterbox.map_boxes(xyxy, transform, width, height)
+        xywh = np.empty((len(xyxy), 4), dtype=np.int64)
+        xywh[:, :2] = xyxy[:, :2]
+        xywh[:, 2:] = xyxy[:, 2:] - xyxy[:, :2]
+        if roi_rects is not None and len(xywh):
+            keep = filter_detections(xywh, box_scores, roi_rects)
+            xywh, box_scores = xywh[keep], box_scores[keep]
+        if scores is not None:
+            scores.extend(box_scores.tolist())
+
+        detections = [tuple(box) for box in xywh.tolist()]
+        if detections:
+            print(f"[{type(self).__name__}] ✓ Final result: {len(detections)} persons detected and accepted")
+        return detections
+
+    def _postprocess(self, result, roi_rects: List[Tuple[int, int, int, int]],
+                     confidence: float, transform=None, width: int = 0,
+                     height: int = 0, scores: List[float] = None) -> List[Tuple[int, int, int, int]]:
+        """Keep person boxes above the confidence threshold that fall inside an ROI.
+
+        transform maps letterboxed model-input boxes back to the frame. The
+        confidence of each kept box is appended to scores when given.
         """
-        det_x1, det_y1 = det_x, det_y
-        det_x2, det_y2 = det_x + det_w, det_y + det_h
-        
-        for roi in roi_rects:
-            if len(roi) >= 4:
-                roi_x1, roi_y1, roi_x2, roi_y2 = roi[:4]
-                
-                # Ensure roi coordinates are in correct order (top-left, bottom-right)
-                roi_x1, roi_x2 = min(roi_x1, roi_x2), max(roi_x1, roi_x2)
-                roi_y1, roi_y2 = min(roi_y1, roi_y2), max(roi_y1, roi_y2)
-                
-                # Check if detection overlaps with ROI (intersection test)
-                if (det_x1 < roi_x2 and det_x2 > roi_x1 and 
-                    det_y1 < roi_y2 and det_y2 > roi_y1):
-                    return True
-        
-        return False
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return []
+
+        # One device-to-host transfer: rows of x1, y1, x2, y2, [track id,] conf, class
+        data = boxes.data.cpu().numpy()
+        # Person class (class 0 in COCO dataset) above this frame's threshold;
+        # the batch ran at the loosest threshold of its frames
+        data = data[(data[:, -1] == PERSON_CLASS) & (data[:, -2] > confidence)]
+        return self._boxes_to_detections(data[:, :4], data[:, -2], roi_rects, transform, width, height, scores)
+
+
+class _PendingDetection:
+    """One frame waiting in the batching queue"""
+    __slots__ = ("request", "enqueued", "done", "result", "error")
+
+    def __init__(self, request: DetectionRequest):
+        self.request = request
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = []
+        self.error = None
+
+
+class BatchStats:
+    """Rolling batch latency and occupancy metrics"""
+
+    def __init__(self, max_batch_size: int, window: int = 256):
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.frames = 0
+        self._sizes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._waits = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, batch_size: int, latency: float, max_wait: float):
+        with self._lock:
+            self.batches += 1
+            self.frames += batch_size
+            self._sizes.append(batch_size)
+            self._latencies.append(latency)
+            self._waits.append(max_wait)
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, float]:
+        """Metrics over the recent window (latencies in milliseconds)"""
+        with self._lock:
+            sizes = list(self._sizes)
+            latencies = list(self._latencies)
+            waits = list(self._waits)
+            batches, frames = self.batches, self.frames
+        avg_size = sum(sizes) / len(sizes) if sizes else 0.0
+        return {
+            "batches": batches,
+            "frames": frames,
+            "avg_batch_size": round(avg_size, 2),
+            "occupancy": round(avg_size / self.max_batch_size, 3) if self.max_batch_size else 0.0,
+            "latency_p50_ms": round(self._percentile(latencies, 50) * 1000, 2),
+            "latency_p95_ms": round(self._percentile(latencies, 95) * 1000, 2),
+            "queue_wait_p95_ms": round(self._percentile(waits, 95) * 1000, 2),
+        }
+
+
+class BatchingDetector(BaseDetector):
+    """Batching inference scheduler shared by many channels.
+
+    Channel threads call detect() as usual and block until their result is
+    ready. A scheduler thread collects pending frames until max_batch_size is
+    reached, max_wait expires or every expected channel has submitted, then
+    runs a single detect_batch() on the wrapped detector and hands each
+    channel its own detections.
+    """
+
+    def __init__(self, detector: BaseDetector, max_batch_size: int = 8, max_wait: float = 0.010,
+                 expected_clients: int = 0, report_interval: int = 0):
+        self.detector = detector
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        # Dispatch as soon as this many frames are queued (0 = only size/time limits)
+        self.expected_clients = expected_clients
+        # Print the metrics every N batches (0 = never)
+        self.report_interval = report_interval
+        self.stats = BatchStats(self.max_batch_size)
+        self._queue = queue.Queue()
+        self._running = True
+        self._lock = threading.Lock()  # Orders enqueues against the stop marker put by close()
+        self._thread = threading.Thread(target=self._run, name="BatchingDetector", daemon=True)
+        self._thread.start()
+
+    def detect(self, yuv420_frame: bytes, width: int, height: int, 
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
+        pending = _PendingDetection((yuv420_frame, width, height, roi_rects, confidence))
+        with self._lock:
+            running = self._running
+            if running:
+                # Queued ahead of close()'s stop marker, so the scheduler still answers it
+                self._queue.put(pending)
+        if not running:
+            return self.detector.detect(yuv420_frame, width, height, roi_rects, confidence)
+        # The frame (possibly a shared-memory view) stays valid while we block here
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def set_confidence_threshold(self, threshold: float):
+        self.detector.set_confidence_threshold(threshold)
+
+    def get_stats(self) -> Dict[str, float]:
+        return self.stats.snapshot()
+
+    def close(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first: _PendingDetection) -> List[_PendingDetection]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        target = self.max_batch_size
+        if self.expected_clients > 0:
+            target = min(target, self.expected_clients)
+        while len(batch) < target:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Re-queue the stop marker for the main loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+
+            start = time.perf_counter()
+            oldest_wait = start - min(item.enqueued for item in batch)
+            try:
+                results = self.detector.detect_batch([item.request for item in batch])
+                for item, result in zip(batch, results):
+                    item.result = result
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            latency = time.perf_counter() - start
+            for item in batch:
+                item.done.set()
+
+            self.stats.record(len(batch), latency, oldest_wait)
+            if self.report_interval and self.stats.batches % self.report_interval == 0:
+                print(f"[BatchingDetector] {self.stats.snapshot()}")
+
+        # Release anyone still waiting after shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item.result = []
+                item.done.set()
 
 
 def convert_threshold_to_confidence(threshold: int, sensitivity: int) -> float:
@@ -263,14 +689,44 @@ def convert_threshold_to_confidence(threshold: int, sensitivity: int) -> float:
     return round(confidence, 3)
 
 
-def get_default_detector() -> BaseDetector:
+DETECTOR_BACKENDS = ("ultralytics", "onnxruntime", "openvino")
+DEFAULT_BACKEND = "ultralytics"
+DEFAULT_BACKEND_OPTIONS: Dict[str, Any] = {}
+
+
+def set_default_backend(backend: str, **options):
+    """Choose the backend get_default_detector builds, e.g.
+    set_default_backend("onnxruntime", model_path="yolov8n.onnx", intra_threads=4)"""
+    global DEFAULT_BACKEND, DEFAULT_BACKEND_OPTIONS
+    backend = backend.lower()
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {DETECTOR_BACKENDS}")
+    DEFAULT_BACKEND = backend
+    DEFAULT_BACKEND_OPTIONS = dict(options)
+
+
+def get_default_detector(backend: str = None, **options) -> BaseDetector:
     """Get the default human detector.
     
-    Uses YOLO for best accuracy and performance.
-    Falls back to Mock detector if YOLO is unavailable.
+    Uses YOLO for best accuracy and performance: the ONNX Runtime / OpenVINO
+    backend when selected (see set_default_backend), else Ultralytics.
+    Falls back to Ultralytics if the ONNX backend cannot be loaded and to
+    the Mock detector if YOLO is unavailable.
     """
+    if backend is None:
+        backend, options = DEFAULT_BACKEND, {**DEFAULT_BACKEND_OPTIONS, **options}
+    if backend != "ultralytics":
+        try:
+            from onnx_detector import OnnxHumanDetector
+            detector = OnnxHumanDetector(backend=backend, **options)
+            if detector._model is not None:
+                return detector
+            print(f"[get_default_detector] {backend} not available, falling back to Ultralytics")
+        except Exception as e:
+            print(f"[get_default_detector] {backend} failed: {e}, falling back to Ultralytics")
+
     try:
-        # Try YOLO first (modern, fast, accurate)
+        # Ultralytics YOLO (modern, fast, accurate)
         detector = YOLOHumanDetector()
         if detector._model is not None:
             return detector
@@ -0,0 +1,174 @@
+"""
+Event suppression - decides which detection frames become analytics events
+
+Sits between the detector and the registered callback. A person standing
+still in an ROI is detected on every frame; without suppression each of
+those frames costs a JPEG encode and a POST. Frames that only repeat the
+last reported scene are dropped before the callback, so they never reach
+the encoder or the network.
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Box = Tuple[int, int, int, int]  # (x, y, w, h)
+
+# Key used when the channel has no ROI rectangles
+NO_ROI = -1
+
+
+def box_iou(a: Box, b: Box) -> float:
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = min(ax2, bx2) - max(a[0], b[0])
+    ih = min(ay2, by2) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def same_scene(previous: Sequence[Box], current: Sequence[Box], iou_threshold: float) -> bool:
+    """True when every current box matches a distinct previous box and the counts agree"""
+    if len(previous) != len(current):
+        return False
+    unmatched = list(previous)
+    for box in current:
+        best, best_iou = -1, iou_threshold
+        for index, candidate in enumerate(unmatched):
+            iou = box_iou(box, candidate)
+            if iou >= best_iou:
+                best, best_iou = index, iou
+        if best < 0:
+            return False
+        unmatched.pop(best)
+    return True
+
+
+class _RoiState:
+    __slots__ = ("boxes", "last_event", "last_seen")
+
+    def __init__(self):
+        self.boxes: List[Box] = []
+        self.last_event = 0.0
+        self.last_seen = 0.0
+
+
+class EventSuppressor:
+    """Per-channel event deduplication and rate limiting.
+
+    Detections are grouped by the ROI rectangle they overlap. A frame
+    becomes an event when, for at least one ROI,
+
+    - the scene changed: a different number of people, or a box with no
+      IoU >= iou_threshold match in the last reported scene, and at least
+      min_interval seconds passed since that ROI's last event, or
+    - the same scene has been present for repeat_interval seconds since it
+      was last reported (0 disables repeats).
+
+    An ROI forgets its scene after clear_after seconds without detections,
+    so one missed frame does not re-trigger an event. On top of that a
+    token bucket caps the channel at max_events_per_sec.
+    """
+
+    def __init__(self, iou_threshold: float = 0.5, min_interval: float = 1.0,
+                 max_events_per_sec: float = 2.0, repeat_interval: float = 30.0,
+                 clear_after: float = 2.0):
+        self.iou_threshold = iou_threshold
+        self.min_interval = min_interval
+        self.max_events_per_sec = max_events_per_sec
+        self.repeat_interval = repeat_interval
+        self.clear_after = clear_after
+        self.passed = 0
+        self.suppressed_duplicate = 0
+        self.suppressed_rate = 0
+        self._rois: Dict[int, _RoiState] = {}
+        self._burst = max(1.0, max_events_per_sec)
+        self._tokens = self._burst
+        self._refilled: Optional[float] = None
+
+    def reset(self):
+        """Forget every ROI scene, e.g. after the ROIs changed"""
+        self._rois.clear()
+
+    @staticmethod
+    def group_by_roi(detections: Sequence[Box],
+                     roi_rects: Optional[Sequence[Tuple[int, int, int, int]]]) -> Dict[int, List[Box]]:
+        """Detections per ROI index (a detection may overlap several ROIs)"""
+        if not roi_rects:
+            return {NO_ROI: list(detections)} if detections else {}
+        if hasattr(roi_rects, "group"):
+            # roi_index.RoiSet: match against the ROI polygons, not their bounding boxes
+            return roi_rects.group(detections)
+        groups: Dict[int, List[Box]] = {}
+        for box in detections:
+            x, y, w, h = box
+            for index, roi in enumerate(roi_rects):
+                x1, x2 = min(roi[0], roi[2]), max(roi[0], roi[2])
+                y1, y2 = min(roi[1], roi[3]), max(roi[1], roi[3])
+                if x < x2 and x + w > x1 and y < y2 and y + h > y1:
+                    groups.setdefault(index, []).append(box)
+        return groups
+
+    def _take_token(self, now: float) -> bool:
+        if self.max_events_per_sec <= 0:
+            return True
+        if self._refilled is not None:
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled) * self.max_events_per_sec)
+        self._refilled = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def should_emit(self, detections: Sequence[Box],
+                    roi_rects: Optional[Sequence[Tuple[int, int, int, int]]] = None,
+                    now: float = None) -> bool:
+        """Decide whether this frame's detections are reported"""
+        if now is None:
+            now = time.monotonic()
+        groups = self.group_by_roi(detections, roi_rects)
+
+        # Scenes of ROIs that have been empty long enough are forgotten
+        for key in [key for key, state in self._rois.items()
+                    if key not in groups and now - state.last_seen >= self.clear_after]:
+            del self._rois[key]
+
+        changed = []
+        for key, boxes in groups.items():
+            state = self._rois.get(key)
+            if state is None:
+                changed.append(key)
+                continue
+            state.last_seen = now
+            since = now - state.last_event
+            if same_scene(state.boxes, boxes, self.iou_threshold):
+                if self.repeat_interval > 0 and since >= self.repeat_interval:
+                    changed.append(key)
+            elif since >= self.min_interval:
+                changed.append(key)
+
+        if not changed:
+            self.suppressed_duplicate += 1
+            return False
+        if not self._take_token(now):
+            self.suppressed_rate += 1
+            return False
+
+        for key in changed:
+            state = self._rois.get(key)
+            if state is None:
+                state = self._rois[key] = _RoiState()
+            state.boxes = list(groups[key])
+            state.last_event = now
+            state.last_seen = now
+        self.passed += 1
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "passed": self.passed,
+            "suppressed_duplicate": self.suppressed_duplicate,
+            "suppressed_rate": self.suppressed_rate,
+        }
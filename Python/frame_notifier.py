@@ -0,0 +1,256 @@
+"""
+Frame notification backends - wake the recognize thread when a new frame is published
+
+The producer (Spark_Test_Prog.exe / ARGO) writes image_status = 1 into the
+ChannelFrame_<port> region. A backend that the producer can signal lets the
+reader sleep until that happens; every backend also falls back to adaptive
+polling so producers that never signal keep working.
+"""
+import os
+import sys
+import time
+import select
+from typing import Optional
+
+
+class AdaptiveBackoff:
+    """Poll interval that grows while idle and tracks the frame cadence.
+
+    After a frame arrives the interval drops back to ``min_interval``. Once a
+    steady frame period is known the reader sleeps until just before the next
+    expected frame and then polls finely, so pickup latency stays low without
+    waking hundreds of times per second.
+    """
+
+    def __init__(self, min_interval: float = 0.0002, max_interval: float = 0.02,
+                 growth: float = 2.0, smoothing: float = 0.2, overdue: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.growth = growth
+        self.smoothing = smoothing
+        self.overdue = overdue
+        self._interval = min_interval
+        self._period = 0.0
+        self._last_frame = 0.0
+
+    def next_timeout(self) -> float:
+        """Seconds to wait before the next poll"""
+        if self._period > 0.0:
+            # Sleep through most of the gap until the next expected frame
+            margin = min(0.002, self._period * 0.1)
+            early = self._last_frame + self._period - margin - time.monotonic()
+            if early > self._interval:
+                return min(early, self.max_interval)
+        return self._interval
+
+    def on_poll(self, got_frame: bool):
+        """Update the interval after a poll of the shared memory"""
+        now = time.monotonic()
+        if not got_frame:
+            # Keep polling finely while the next frame is due, back off only
+            # without a cadence or once the frame is well overdue
+            if not self._period or now - self._last_frame > self._period * self.overdue:
+                self._interval = min(self._interval * self.growth, self.max_interval)
+            return
+
+        gap = now - self._last_frame
+        if self._last_frame and gap < 1.0:
+            if self._period:
+                self._period += self.smoothing * (gap - self._period)
+            else:
+                self._period = gap
+        else:
+            # First frame or the stream stalled: forget the old cadence
+            self._period = 0.0
+        self._last_frame = now
+        self._interval = self.min_interval
+
+
+class BaseFrameNotifier:
+    """Frame notification interface.
+
+    wait() blocks until the producer signals a new frame or the backoff
+    timeout expires and returns True only when a signal was received.
+    signal() is the producer side, used by in-process or local stand-ins.
+    """
+
+    # Safety-net timeout once the producer has proven that it signals
+    signalled_timeout = 0.5
+
+    def __init__(self, backoff: Optional[AdaptiveBackoff] = None):
+        self.backoff = backoff or AdaptiveBackoff()
+        self._producer_signals = False
+        self._timed_out = False
+
+    def wait(self) -> bool:
+        if self._producer_signals:
+            timeout = self.signalled_timeout
+        else:
+            timeout = self.backoff.next_timeout()
+        signalled = self._wait_signal(timeout)
+        if signalled:
+            self._producer_signals = True
+        self._timed_out = not signalled
+        return signalled
+
+    def on_poll(self, got_frame: bool):
+        if got_frame and self._timed_out:
+            # A frame arrived without a signal (producer restarted, FIFO
+            # writer gone): go back to backoff polling until it signals again
+            self._producer_signals = False
+        self._timed_out = False
+        self.backoff.on_poll(got_frame)
+
+    def _wait_signal(self, timeout: float) -> bool:
+        raise NotImplementedError
+
+    def signal(self):
+        """Signal that a new frame is ready (producer side)"""
+        pass
+
+    def close(self):
+        pass
+
+
+class PollingNotifier(BaseFrameNotifier):
+    """Adaptive backoff only, for producers that cannot signal"""
+
+    def _wait_signal(self, timeout: float) -> bool:
+        time.sleep(timeout)
+        return False
+
+
+class NamedEventNotifier(BaseFrameNotifier):
+    """Windows named auto-reset event ChannelFrameEvent_<port>.
+
+    The producer calls SetEvent after writing image_status = 1.
+    """
+
+    WAIT_OBJECT_0 = 0
+
+    def __init__(self, port: int, backoff: Optional[AdaptiveBackoff] = None):
+        super().__init__(backoff)
+        import ctypes
+        from ctypes import wintypes
+        self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._kernel32.CreateEventW.restype = wintypes.HANDLE
+        self._kernel32.CreateEventW.argtypes = [wintypes.LPVOID, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+        self._kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+        self._kernel32.SetEvent.argtypes = [wintypes.HANDLE]
+        self._kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self.name = f"ChannelFrameEvent_{port}"
+        # Opens the event if the producer already created it
+        self._handle = self._kernel32.CreateEventW(None, False, False, self.name)
+        if not self._handle:
+            raise OSError(ctypes.get_last_error(), f"CreateEventW failed for {self.name}")
+
+    def _wait_signal(self, timeout: float) -> bool:
+        if not self._producer_signals:
+            # Timed waits are rounded to the system timer tick, so poll with the
+            # high-resolution sleep until the producer is known to set the event
+            if self._kernel32.WaitForSingleObject(self._handle, 0) == self.WAIT_OBJECT_0:
+                return True
+            time.sleep(timeout)
+            return self._kernel32.WaitForSingleObject(self._handle, 0) == self.WAIT_OBJECT_0
+        ms = max(1, int(timeout * 1000))
+        return self._kernel32.WaitForSingleObject(self._handle, ms) == self.WAIT_OBJECT_0
+
+    def signal(self):
+        self._kernel32.SetEvent(self._handle)
+
+    def close(self):
+        if self._handle:
+            self._kernel32.CloseHandle(self._handle)
+            self._handle = None
+
+
+class PipeNotifier(BaseFrameNotifier):
+    """Named FIFO stand-in for the Windows event on Linux.
+
+    The producer writes one byte to /tmp/ChannelFrame_<port>.fifo per frame.
+    """
+
+    def __init__(self, port: int, directory: str = "/tmp", backoff: Optional[AdaptiveBackoff] = None):
+        super().__init__(backoff)
+        self.path = os.path.join(directory, f"ChannelFrame_{port}.fifo")
+        if not os.path.exists(self.path):
+            os.mkfifo(self.path, 0o600)
+        self._read_fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        # Keep a writer open so the FIFO never reports EOF between producers
+        self._write_fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def _wait_signal(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._read_fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            # Coalesce every pending notification into one wake-up
+            os.read(self._read_fd, 4096)
+        except BlockingIOError:
+            return False
+        return True
+
+    def signal(self):
+        try:
+            os.write(self._write_fd, b"\x01")
+        except BlockingIOError:
+            pass  # Pipe full, the reader is already due to wake up
+
+    def close(self):
+        for fd in (self._read_fd, self._write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._read_fd = self._write_fd = -1
+
+
+class EventFdNotifier(BaseFrameNotifier):
+    """Linux eventfd for producers running in the same process"""
+
+    def __init__(self, backoff: Optional[AdaptiveBackoff] = None):
+        super().__init__(backoff)
+        self._fd = os.eventfd(0, os.EFD_NONBLOCK)
+
+    def _wait_signal(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            os.eventfd_read(self._fd)
+        except BlockingIOError:
+            return False
+        return True
+
+    def signal(self):
+        os.eventfd_write(self._fd, 1)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def get_default_notifier(port: int, backend: str = None) -> BaseFrameNotifier:
+    """Get a frame notifier for the given channel.
+
+    backend is one of "event", "pipe", "eventfd" or "poll". By default the
+    Windows named event is used on Windows and the FIFO stand-in elsewhere.
+    Falls back to adaptive polling if the backend cannot be created.
+    """
+    if backend is None:
+        backend = "event" if sys.platform == "win32" else "pipe"
+
+    try:
+        if backend == "event":
+            return NamedEventNotifier(port)
+        if backend == "pipe":
+            return PipeNotifier(port)
+        if backend == "eventfd":
+            return EventFdNotifier()
+        if backend != "poll":
+            print(f"[get_default_notifier] Unknown backend '{backend}', using polling")
+    except Exception as e:
+        print(f"[get_default_notifier] {backend} notifier failed: {e}, falling back to polling")
+
+    return PollingNotifier()
@@ -1,20 +1,176 @@
 """
 HTTP client module - corresponds to SimpleHttpClient in C# (lightweight version)
 """
-import urllib.request
 import urllib.parse
 import urllib.error
+import http.client
 import asyncio
+import base64
+import binascii
+import gzip
 import json
+import os
+import select
+import struct
 import threading
-from typing import Dict, Any
+import time
+import zlib
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
 from data_structures import AnalyticsResult, ROI
+from metrics import stage_histograms
+
+# 4xx statuses that are worth retrying; any other 4xx rejects the event for good
+RETRYABLE_STATUS = (408, 429)
+
+
+def is_rejected(error: Exception) -> bool:
+    """True when the receiver refused the event itself, so resending cannot help"""
+    return (isinstance(error, urllib.error.HTTPError) and 400 <= error.code < 500
+            and error.code not in RETRYABLE_STATUS)
+
+
+class HttpConnectionPool:
+    """Keep-alive HTTP/1.1 connections, pooled per (scheme, host, port).
+
+    Up to ``pool_size`` idle connections are kept per host. Requests beyond
+    that still go out on extra connections, which are closed afterwards
+    instead of being pooled. Idle connections that the server has closed, or
+    that have been idle for longer than ``idle_timeout``, are discarded
+    before reuse, and a request that fails on a reused connection is retried
+    once on a fresh one.
+    """
+
+    # Errors that mean a reused keep-alive socket was already dead
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                    ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+    def __init__(self, pool_size: int = 4, connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0, idle_timeout: float = 30.0):
+        self.pool_size = max(1, pool_size)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self.reconnects = 0
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(parts: urllib.parse.SplitResult) -> Tuple[str, str, int]:
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"unsupported URL scheme '{parts.scheme}'")
+        port = parts.port or (443 if scheme == "https" else 80)
+        return scheme, parts.hostname or "", port
+
+    def _connect(self, key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        conn_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = conn_class(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        with self._lock:
+            self.created += 1
+        return conn
+
+    @staticmethod
+    def _is_dead(conn: http.client.HTTPConnection) -> bool:
+        """An idle keep-alive socket is readable only if the peer closed it"""
+        if conn.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _checkout(self, key: Tuple[str, str, int]) -> Optional[http.client.HTTPConnection]:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                conn, since = idle.pop()  # Most recently used first
+            if now - since > self.idle_timeout or self._is_dead(conn):
+                conn.close()
+                continue
+            with self._lock:
+                self.reused += 1
+            return conn
+
+    def _checkin(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, body: bytes = None,
+                headers: Dict[str, str] = None) -> Tuple[int, str, bytes]:
+        """Send one request and return (status, reason, body)"""
+        parts = urllib.parse.urlsplit(url)
+        key = self._key(parts)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        conn = self._checkout(key)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._connect(key)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()  # Drain fully so the socket can be reused
+            except self.STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # Server dropped the idle connection under us, try once on a fresh one
+                with self._lock:
+                    self.reconnects += 1
+                conn, reused = None, False
+                continue
+            except BaseException:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return response.status, response.reason, data
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "reconnects": self.reconnects,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+            }
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                conn.close()
+
 
 class SimpleHttpClient:
-    """Lightweight HTTP client"""
+    """Lightweight HTTP client on a keep-alive connection pool"""
     
-    def __init__(self):
-        self.timeout = 30  # 30 second timeout
+    def __init__(self, pool_size: int = 4, connect_timeout: float = 3.0, read_timeout: float = 10.0):
+        """pool_size idle keep-alive connections are kept per host. The
+        connect timeout bounds the TCP (and TLS) handshake, the read timeout
+        each wait for the server's response."""
+        self.pool = HttpConnectionPool(pool_size, connect_timeout, read_timeout)
     
     async def __aenter__(self):
         return self
@@ -26,27 +182,85 @@ class SimpleHttpClient:
         """
         Synchronously send analytics result to specified URL
         """
+        json_data = self._encode_analytics_result(analytics_result)
+        return self._post(url, json_data, {'Content-Type': 'application/json'})
+
+    def post_analytics_batch_sync(self, url: str, results: List[AnalyticsResult],
+                                  compression: str = None, multipart: bool = False) -> str:
+        """
+        Send several analytics results in one request.
+
+        JSON layout: {"events": [<AnalyticsResult>, ...]}.
+        Multipart layout (multipart/form-data): an "events" part holding the
+        same JSON with each keyframe replaced by "keyframe_part": "keyframe<i>",
+        followed by one image/jpeg part per keyframe with the raw JPEG bytes,
+        which avoids the base64 overhead.
+        compression is None, "gzip" or "deflate" (sent as Content-Encoding).
+        """
+        if multipart:
+            body, content_type = self._encode_multipart_batch(results)
+        else:
+            body = b"".join((b'{"events": [',
+                             b", ".join(self._encode_analytics_result(r) for r in results),
+                             b']}'))
+            content_type = 'application/json'
+
+        headers = {'Content-Type': content_type}
+        if compression == "gzip":
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        elif compression == "deflate":
+            body = zlib.compress(body, 5)
+            headers['Content-Encoding'] = 'deflate'
+        elif compression:
+            raise ValueError(f"Unknown compression '{compression}', expected gzip or deflate")
+        return self._post(url, body, headers)
+
+    def _encode_multipart_batch(self, results: List[AnalyticsResult]) -> Tuple[bytes, str]:
+        boundary = f"----AnalyticsBatch{os.urandom(8).hex()}"
+        events = []
+        images = []
+        for index, result in enumerate(results):
+            event = self._analytics_result_to_dict(result)
+            keyframe = event.pop("keyframe")
+            if keyframe:
+                name = f"keyframe{index}"
+                event["keyframe_part"] = name
+                images.append((name, base64.b64decode(keyframe)))
+            events.append(event)
+
+        parts = [self._multipart_part(boundary, "events", 'application/json',
+                                      json.dumps({"events": events}).encode('utf-8'))]
+        for name, jpeg in images:
+            parts.append(self._multipart_part(boundary, name, 'image/jpeg', jpeg, f"{name}.jpg"))
+        parts.append(f"--{boundary}--\r\n".encode('ascii'))
+        return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+    @staticmethod
+    def _multipart_part(boundary: str, name: str, content_type: str, data: bytes,
+                        filename: str = None) -> bytes:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        head = (f"--{boundary}\r\nContent-Disposition: {disposition}\r\n"
+                f"Content-Type: {content_type}\r\n\r\n").encode('ascii')
+        return head + data + b"\r\n"
+
+    def _post(self, url: str, data: bytes, headers: Dict[str, str]) -> str:
         try:
-            # Convert AnalyticsResult to dictionary format
-            data = self._analytics_result_to_dict(analytics_result)
-            
-            # Convert to JSON string
-            json_data = json.dumps(data).encode('utf-8')
-            
-            # Create request
-            req = urllib.request.Request(
-                url,
-                data=json_data,
-                headers={'Content-Type': 'application/json'}
-            )
-            
-            # Send request
-            with urllib.request.urlopen(req, timeout=self.timeout) as response:
-                return response.read().decode('utf-8')
+            # Send request on a pooled connection
+            status, reason, body = self.pool.request("POST", url, data, headers)
+            if status >= 400:
+                raise urllib.error.HTTPError(url, status, reason, None, None)
+            return body.decode('utf-8')
                 
         except urllib.error.URLError as e:
             print(f"URL error: {e}")
             raise
+        except OSError as e:
+            # Connection refused, timeouts, DNS failures
+            print(f"URL error: {e}")
+            raise
         except Exception as e:
             print(f"HTTP request error: {e}")
             raise
@@ -62,73 +276,554 @@ class SimpleHttpClient:
             url, 
             analytics_result
         )
+
+    async def post_analytics_batch_async(self, url: str, results: List[AnalyticsResult],
+                                         compression: str = None, multipart: bool = False) -> str:
+        """Batch variant of post_analytics_result_async"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, self.post_analytics_batch_sync, url, results, compression, multipart)
     
     def _analytics_result_to_dict(self, result: AnalyticsResult) -> Dict[str, Any]:
         """Convert AnalyticsResult to dictionary"""
-        return {
+        data = {
             "version": result.version,
             "port_num": result.port_num,
             "keyframe": result.keyframe,
             "timestamp": result.timestamp,
             "rois_rects": result.rois_rects  # Already in [[x1,y1,x2,y2], ...] format
         }
+        if result.track_ids:
+            data["track_ids"] = result.track_ids
+        return data
     
+    def _encode_analytics_result(self, result: AnalyticsResult) -> bytes:
+        """JSON request body for an AnalyticsResult.
+
+        A bytes keyframe is already base64 ASCII, which needs no JSON escaping,
+        so it is spliced into the body instead of being decoded to str and
+        re-encoded by json.dumps.
+        """
+        data = self._analytics_result_to_dict(result)
+        keyframe = data["keyframe"]
+        if not isinstance(keyframe, (bytes, bytearray, memoryview)):
+            return json.dumps(data).encode('utf-8')
+
+        data["keyframe"] = ""
+        head, tail = json.dumps(data).encode('utf-8').split(b'"keyframe": ""', 1)
+        return b"".join((head, b'"keyframe": "', keyframe, b'"', tail))
+
     async def close(self):
-        """Close client (lightweight version requires no special cleanup)"""
-        pass
+        """Close client and its pooled connections"""
+        self.pool.close()
+
+class EventSpool:
+    """Write-ahead spool for analytics events that could not be delivered.
+
+    Events are appended to segment files (spool-<seq>.seg) in the spool
+    directory. Each record is
+
+        magic "EVT1" | header length | payload length | crc32    ('<4sIII')
+        header: JSON of url, version, port_num, timestamp, rois_rects, track_ids
+        payload: the keyframe as raw JPEG bytes (base64 decoded)
+
+    Records are replayed oldest first. The replay position of the oldest
+    segment is kept in spool-<seq>.pos, so after a restart delivery resumes
+    where it stopped (at-least-once: a record sent right before a crash may
+    be sent again). Fully replayed segments are deleted, and when the spool
+    exceeds max_bytes the oldest segments are evicted. A torn or corrupt
+    record ends its segment. Records the receiver rejects are skipped with
+    discard() instead of ack().
+    """
+
+    RECORD = struct.Struct('<4sIII')
+    MAGIC = b'EVT1'
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024,
+                 segment_bytes: int = 4 * 1024 * 1024, fsync: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.spooled = 0
+        self.replayed = 0
+        self.discarded = 0
+        self.evicted_segments = 0
+        self.corrupt = 0
+        self._lock = threading.Lock()
+        self._writer = None
+        self._write_seq = -1
+        self._reader = None
+        self._read_seq = -1
+        self._read_pos = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Never append to a segment left by a previous run, its tail may be torn
+        self._segments = self._scan()
+        self._next_seq = self._segments[-1] + 1 if self._segments else 0
+
+    def _path(self, seq: int, ext: str = "seg") -> str:
+        return os.path.join(self.directory, f"spool-{seq:08d}.{ext}")
+
+    def _scan(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("spool-") and name.endswith(".seg"):
+                try:
+                    segments.append(int(name[6:-4]))
+                except ValueError:
+                    pass
+        return sorted(segments)
+
+    def _size(self, seq: int) -> int:
+        try:
+            return os.path.getsize(self._path(seq))
+        except OSError:
+            return 0
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._size(seq) for seq in self._segments)
+
+    def append(self, url: str, result: AnalyticsResult) -> bool:
+        """Spool one event; False if it could not be written"""
+        header = json.dumps({
+            "url": url,
+            "version": result.version,
+            "port_num": result.port_num,
+            "timestamp": result.timestamp,
+            "rois_rects": result.rois_rects,
+            "track_ids": result.track_ids,
+        }).encode('utf-8')
+        try:
+            payload = base64.b64decode(result.keyframe) if result.keyframe else b''
+        except (binascii.Error, ValueError):
+            payload = b''
+        crc = zlib.crc32(payload, zlib.crc32(header))
+        record = self.RECORD.pack(self.MAGIC, len(header), len(payload), crc) + header + payload
+
+        with self._lock:
+            try:
+                if self._writer is None or (self._writer.tell() and
+                                            self._writer.tell() + len(record) > self.segment_bytes):
+                    self._rotate()
+                self._writer.write(record)
+                self._writer.flush()
+                if self.fsync:
+                    os.fsync(self._writer.fileno())
+            except OSError as e:
+                print(f"[EventSpool] Write failed: {e}")
+                return False
+            self.spooled += 1
+            self._evict()
+        return True
+
+    def _rotate(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._write_seq = self._next_seq
+        self._next_seq += 1
+        self._writer = open(self._path(self._write_seq), "ab")
+        self._segments.append(self._write_seq)
+
+    def _evict(self):
+        """Drop the oldest segments until the spool fits in max_bytes"""
+        total = sum(self._size(seq) for seq in self._segments)
+        while total > self.max_bytes and len(self._segments) > 1:
+            seq = self._segments[0]
+            total -= self._size(seq)
+            self._remove(seq)
+            self.evicted_segments += 1
+            print(f"[EventSpool] Spool over {self.max_bytes} bytes, evicted segment {seq}")
+
+    def _remove(self, seq: int):
+        if seq == self._read_seq:
+            self._reader.close()
+            self._reader, self._read_seq, self._read_pos = None, -1, 0
+        if seq == self._write_seq:
+            self._writer.close()
+            self._writer, self._write_seq = None, -1
+        self._segments.remove(seq)
+        for ext in ("seg", "pos"):
+            try:
+                os.remove(self._path(seq, ext))
+            except FileNotFoundError:
+                pass
+
+    def _open_oldest(self) -> bool:
+        if self._reader is not None:
+            return True
+        if not self._segments:
+            return False
+        seq = self._segments[0]
+        self._reader = open(self._path(seq), "rb")
+        self._read_seq = seq
+        try:
+            with open(self._path(seq, "pos")) as f:
+                self._read_pos = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            self._read_pos = 0
+        return True
+
+    def peek(self) -> Optional[Tuple[Tuple[int, int, int], str, AnalyticsResult]]:
+        """Oldest undelivered event as (token, url, result), or None.
+
+        The event stays in the spool until ack(token).
+        """
+        with self._lock:
+            while self._open_oldest():
+                self._reader.seek(self._read_pos)
+                prefix = self._reader.read(self.RECORD.size)
+                record = None
+                if len(prefix) == self.RECORD.size:
+                    magic, header_len, payload_len, crc = self.RECORD.unpack(prefix)
+                    body = self._reader.read(header_len + payload_len) if magic == self.MAGIC else b''
+                    if magic == self.MAGIC and len(body) == header_len + payload_len:
+                        record = (header_len, body, crc)
+
+                if record is None:
+                    if self._read_seq == self._write_seq:
+                        return None  # Caught up with the writer
+                    if prefix:
+                        self.corrupt += 1
+                        print(f"[EventSpool] Torn record in segment {self._read_seq}, skipping the rest")
+                    self._remove(self._read_seq)
+                    continue
+
+                header_len, body, crc = record
+                if zlib.crc32(body) != crc:
+                    self.corrupt += 1
+                    print(f"[EventSpool] Corrupt record in segment {self._read_seq}, skipping the rest")
+                    self._remove(self._read_seq)
+                    continue
+
+                token = (self._read_seq, self._read_pos, self.RECORD.size + len(body))
+                try:
+                    header = json.loads(body[:header_len].decode('utf-8'))
+                except ValueError:
+                    # Well-formed record with a bad header: skip just this one
+                    self.corrupt += 1
+                    self._advance(token)
+                    continue
+                payload = body[header_len:]
+                result = AnalyticsResult(
+                    version=header.get("version", "1.2"),
+                    port_num=header.get("port_num", 0),
+                    keyframe=binascii.b2a_base64(payload, newline=False) if payload else "",
+                    timestamp=header.get("timestamp", 0),
+                    rois_rects=header.get("rois_rects", []),
+                    track_ids=header.get("track_ids", []),
+                )
+                return token, header.get("url", ""), result
+            return None
+
+    def ack(self, token: Tuple[int, int, int]):
+        """Mark the event returned by peek() as delivered"""
+        with self._lock:
+            if token[0] == self._read_seq and token[1] == self._read_pos:
+                self.replayed += 1
+                self._advance(token)
+
+    def discard(self, token: Tuple[int, int, int]):
+        """Drop the event returned by peek() without delivering it"""
+        with self._lock:
+            if token[0] == self._read_seq and token[1] == self._read_pos:
+                self.discarded += 1
+                self._advance(token)
+
+    def _advance(self, token: Tuple[int, int, int]):
+        seq, pos, length = token
+        self._read_pos = pos + length
+        if self._read_pos >= self._size(seq):
+            # Segment fully replayed (the writer moves to a new one next time)
+            self._remove(seq)
+            return
+        tmp = self._path(seq, "pos.tmp")
+        with open(tmp, "w") as f:
+            f.write(str(self._read_pos))
+        os.replace(tmp, self._path(seq, "pos"))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "bytes": sum(self._size(seq) for seq in self._segments),
+                "spooled": self.spooled,
+                "replayed": self.replayed,
+                "discarded": self.discarded,
+                "evicted_segments": self.evicted_segments,
+                "corrupt": self.corrupt,
+            }
+
+    def close(self):
+        with self._lock:
+            for handle in (self._writer, self._reader):
+                if handle is not None:
+                    handle.close()
+            self._writer = self._reader = None
+            self._write_seq = self._read_seq = -1
+
 
 class HttpRequestQueue:
-    """HTTP request queue manager"""
-    
-    def __init__(self):
-        self.queue = asyncio.Queue()
-        self.client = SimpleHttpClient()
+    """HTTP request queue manager
+
+    A bounded queue drained by ``workers`` concurrent senders, with at most
+    ``per_url_limit`` requests in flight to any one URL so a slow receiver
+    cannot occupy every sender. Workers pick the oldest queued event whose
+    URL has a free slot.
+
+    Overflow policies when ``max_queue`` events are waiting:
+        drop_oldest - discard the oldest queued event (default)
+        drop_newest - discard the event being enqueued
+        coalesce    - replace the queued event of the same channel and URL
+                      with the new one, else drop the oldest
+
+    With batch_size > 1 a sender that picks up an event keeps collecting
+    queued events for the same URL, across channels, until batch_size
+    events or batch_bytes of keyframes are gathered or batch_wait seconds
+    have passed, and sends them in one request (see
+    SimpleHttpClient.post_analytics_batch_sync for the body layouts).
+
+    With a spool, events whose POST fails are written to it and replayed by
+    a separate task at up to replay_rate events per second, backing off
+    exponentially while the receiver keeps failing. Replay yields to live
+    events: it only sends while the live queue is empty. Events the receiver
+    rejects (4xx other than RETRYABLE_STATUS) are never spooled, and a
+    spooled event that is rejected, or answered with an error status
+    replay_max_attempts times, is discarded so it cannot hold up the events
+    behind it.
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    COALESCE = "coalesce"
+    POLICIES = (DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+    def __init__(self, client: SimpleHttpClient = None, workers: int = 4, max_queue: int = 64,
+                 overflow: str = DROP_OLDEST, per_url_limit: int = 2,
+                 spool: EventSpool = None, replay_rate: float = 5.0,
+                 replay_backoff: Tuple[float, float] = (1.0, 60.0), replay_max_attempts: int = 10,
+                 batch_size: int = 1, batch_wait: float = 0.05, batch_bytes: int = 4 * 1024 * 1024,
+                 compression: str = None, multipart: bool = False):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {self.POLICIES}")
+        self.client = client or SimpleHttpClient()
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.overflow = overflow
+        self.per_url_limit = max(1, per_url_limit)
         self.running = False
-        self.worker_task = None
+        self.worker_tasks: List[asyncio.Task] = []
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.rejected = 0
+        self._pending: deque = deque()  # (url, AnalyticsResult, enqueue time)
+        self._in_flight: Dict[str, int] = {}
+        self._cond: Optional[asyncio.Condition] = None
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self.replay_backoff = replay_backoff
+        self.replay_max_attempts = max(1, replay_max_attempts)
+        self.replay_task: Optional[asyncio.Task] = None
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.batch_bytes = batch_bytes
+        self.compression = compression
+        self.multipart = multipart
+        self.batches = 0
     
     async def start(self):
-        """Start queue processor"""
+        """Start queue processors"""
         self.running = True
+        self._cond = asyncio.Condition()
         await self.client.__aenter__()
-        self.worker_task = asyncio.create_task(self._process_queue())
+        self.worker_tasks = [asyncio.create_task(self._process_queue()) for _ in range(self.workers)]
+        if self.spool is not None:
+            self.replay_task = asyncio.create_task(self._replay_spool())
     
     async def stop(self):
-        """Stop queue processor"""
+        """Stop queue processors"""
         self.running = False
-        if self.worker_task:
-            self.worker_task.cancel()
+        tasks = self.worker_tasks + ([self.replay_task] if self.replay_task else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
             try:
-                await self.worker_task
+                await task
             except asyncio.CancelledError:
                 pass
+        self.worker_tasks = []
+        self.replay_task = None
         await self.client.close()
+        if self.spool is not None:
+            self.spool.close()
     
-    async def enqueue(self, url: str, analytics_result: AnalyticsResult):
-        """Add analytics result to queue"""
-        await self.queue.put((url, analytics_result))
+    async def enqueue(self, url: str, analytics_result: AnalyticsResult) -> bool:
+        """Add analytics result to queue; False if it was dropped"""
+        async with self._cond:
+            self.enqueued += 1
+            if len(self._pending) >= self.max_queue:
+                if self.overflow == self.COALESCE and self._coalesce(url, analytics_result):
+                    return True
+                if self.overflow == self.DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append((url, analytics_result, time.perf_counter()))
+            self._cond.notify_all()  # A batching worker may take the wake-up without the item
+        return True
+
+    def _coalesce(self, url: str, analytics_result: AnalyticsResult) -> bool:
+        """Replace the newest queued event of the same channel in place"""
+        for index in range(len(self._pending) - 1, -1, -1):
+            queued_url, queued, enqueued = self._pending[index]
+            if queued_url == url and queued.port_num == analytics_result.port_num:
+                self._pending[index] = (url, analytics_result, enqueued)
+                self.dropped += 1
+                self.coalesced += 1
+                return True
+        return False
+
+    def _take_ready(self) -> Optional[Tuple[str, AnalyticsResult]]:
+        """Oldest queued event whose URL is below its in-flight limit"""
+        for index, (url, result, enqueued) in enumerate(self._pending):
+            if self._in_flight.get(url, 0) < self.per_url_limit:
+                del self._pending[index]
+                stage_histograms(result.port_num)["http_queue_wait"].observe(time.perf_counter() - enqueued)
+                self._in_flight[url] = self._in_flight.get(url, 0) + 1
+                return url, result
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Queue counters"""
+        stats = {
+            "queue_depth": len(self._pending),
+            "in_flight": sum(self._in_flight.values()),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+        }
+        if self.spool is not None:
+            stats.update({f"spool_{key}": value for key, value in self.spool.get_stats().items()})
+        return stats
     
     async def _process_queue(self):
         """Process requests in queue"""
         while self.running:
             try:
-                # Wait for items in queue, but set timeout to avoid infinite waiting
-                url, result = await asyncio.wait_for(
-                    self.queue.get(), timeout=0.5
-                )
+                async with self._cond:
+                    item = self._take_ready()
+                    while item is None:
+                        await self._cond.wait()
+                        item = self._take_ready()
+                url, result = item
+                results = [result]
                 
                 # Send HTTP request
                 try:
-                    response = await self.client.post_analytics_result_async(url, result)
+                    if self.batch_size > 1:
+                        await self._fill_batch(url, results)
+                        start = time.perf_counter()
+                        response = await self.client.post_analytics_batch_async(
+                            url, results, self.compression, self.multipart)
+                    else:
+                        start = time.perf_counter()
+                        response = await self.client.post_analytics_result_async(url, result)
+                    elapsed = time.perf_counter() - start
+                    for sent in results:
+                        # Every event of a batch waited for the whole request
+                        stage_histograms(sent.port_num)["http_post"].observe(elapsed)
+                    self.sent += len(results)
+                    if len(results) > 1:
+                        self.batches += 1
                     if response == "":  # Usually no response content, only status code 200
                         print("Detected!! send analytics result to server!!")
                 except Exception as e:
+                    self.failed += len(results)
                     print(f"Response error: {e}")
+                    if is_rejected(e):
+                        self.rejected += len(results)  # Sending them again would be refused too
+                    elif self.spool is not None:
+                        # Keep them for replay once the receiver is back
+                        loop = asyncio.get_running_loop()
+                        for failed in results:
+                            await loop.run_in_executor(None, self.spool.append, url, failed)
+                finally:
+                    async with self._cond:
+                        self._in_flight[url] -= 1
+                        self._cond.notify_all()  # A slot for this URL is free again
                 
-                self.queue.task_done()
-                
-            except asyncio.TimeoutError:
-                # Timeout is normal, continue loop
-                continue
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 print(f"Queue processing error: {e}")
                 await asyncio.sleep(0.1)
+
+    async def _fill_batch(self, url: str, results: List[AnalyticsResult]):
+        """Add queued events for url until batch_size / batch_bytes or batch_wait runs out"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        size = len(results[0].keyframe)
+        async with self._cond:
+            while len(results) < self.batch_size and size < self.batch_bytes:
+                index = next((i for i, (queued_url, _, _) in enumerate(self._pending) if queued_url == url), None)
+                if index is not None:
+                    _, result, enqueued = self._pending[index]
+                    del self._pending[index]
+                    stage_histograms(result.port_num)["http_queue_wait"].observe(time.perf_counter() - enqueued)
+                    results.append(result)
+                    size += len(result.keyframe)
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+    async def _replay_spool(self):
+        """Replay spooled events, rate limited, backing off while the receiver fails"""
+        loop = asyncio.get_running_loop()
+        min_delay, max_delay = self.replay_backoff
+        delay = min_delay
+        attempts = 0
+        while self.running:
+            if self._pending:
+                await asyncio.sleep(0.1)  # Live events first
+                continue
+            item = await loop.run_in_executor(None, self.spool.peek)
+            if item is None:
+                await asyncio.sleep(1.0)
+                continue
+
+            token, url, result = item
+            try:
+                await self.client.post_analytics_result_async(url, result)
+            except Exception as e:
+                if isinstance(e, urllib.error.HTTPError):
+                    attempts += 1  # Only answered failures count: an unreachable receiver is not this event's fault
+                if is_rejected(e) or attempts >= self.replay_max_attempts:
+                    # Skip it, or it would block every event spooled after it
+                    print(f"[EventSpool] Discarding event after {attempts} attempt(s): {e}")
+                    await loop.run_in_executor(None, self.spool.discard, token)
+                    attempts = 0
+                    continue
+                print(f"[EventSpool] Replay failed, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+                continue
+
+            await loop.run_in_executor(None, self.spool.ack, token)
+            attempts = 0
+            delay = min_delay
+            if self.replay_rate > 0:
+                await asyncio.sleep(1.0 / self.replay_rate)
@@ -1,214 +1,411 @@
 """
 HTTP server module - corresponds to SimpleHttpServer in C#
 Fully implements the logic of the C# version
+
+The control server runs on the asyncio loop main.py already drives: every
+connection is a coroutine, so a client trickling a large /SetParameters
+body never holds up /Alive health probes. Connections are kept alive
+(HTTP/1.1), headers and bodies are size-limited and idle or stalled
+connections are closed. mode="threaded" serves the same routes from a
+ThreadingHTTPServer instead, one thread per connection.
+
+Every accepted /SetParameters becomes a (version, parameters) snapshot that
+replaces the previous one in a single reference assignment; readers never
+lock and never see half an update. wait_for_parameters() wakes the main
+loop as soon as a newer version is published.
 """
+import asyncio
+import itertools
 import json
+import re
 import threading
-import socket
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
-from typing import Dict, Any, List
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+
 from data_structures import SettingParameters, ROI, ROIGroup
-import asyncio
+from metrics import default_registry
+
+# (status, content type, body) returned by a route handler
+Response = Tuple[int, str, bytes]
+RouteHandler = Callable[[bytes], Response]
+
+MODES = ("asyncio", "threaded")
+
+
+def parse_setting_parameters(json_data: Dict[str, Any]) -> SettingParameters:
+    """Build SettingParameters from a /SetParameters JSON body - corresponds to C# JsonConvert.DeserializeObject"""
+    # Initialize SettingParameters structure - corresponds to C# SettingParameters settings
+    settings = SettingParameters()
+    settings.version = json_data.get("version", "1.2")
+    settings.analytics_event_api_url = json_data.get("analytics_event_api_url", "")
+    settings.image_width = int(json_data.get("image_width", 0))
+    settings.image_height = int(json_data.get("image_height", 0))
+    settings.jpg_compress = int(json_data.get("jpg_compress", 50))
+
+    # Parse rois array
+    settings.rois = []
+    for roi_group_data in json_data.get("rois", []):
+        roi_group = ROIGroup()
+        roi_group.sensitivity = int(roi_group_data.get("sensitivity", 50))
+        roi_group.threshold = int(roi_group_data.get("threshold", 50))
+
+        # Parse rects array (should have 4 corner points)
+        roi_group.rects = [ROI(x=int(point.get("x", -1)), y=int(point.get("y", -1)))
+                           for point in roi_group_data.get("rects", [])]
+        settings.rois.append(roi_group)
+    return settings
+
 
 class SimpleHttpHandler(BaseHTTPRequestHandler):
-    """HTTP request handler - corresponds to C# HttpListener"""
-    
-    server_instance = None  # Class variable to store server instance
-    
+    """Threaded-mode request handler; routing lives in SimpleHttpServer"""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive; every response carries Content-Length
+
     def log_message(self, format, *args):
         """Disable log output"""
         pass
-    
+
     def do_POST(self):
         """Handle POST requests"""
-        if self.path == "/SetParameters":
-            self._handle_set_parameters()
-        else:
-            self._send_not_found()
-    
+        self._dispatch("POST")
+
     def do_GET(self):
         """Handle GET requests"""
-        if self.path == "/Alive":
-            self._handle_alive()
-        elif self.path == "/GetLicense":
-            self._handle_get_license()
+        self._dispatch("GET")
+
+    def _dispatch(self, method: str):
+        owner: "SimpleHttpServer" = self.server.owner
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > owner.max_body_bytes:
+            self.close_connection = True
+            status, content_type, body = owner.error_response(
+                HTTPStatus.BAD_REQUEST if length < 0 else HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        else:
+            status, content_type, body = owner.handle(method, self.path, self.rfile.read(length))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SimpleHttpServer:
+    """HTTP server - corresponds to C# SimpleHttpServer"""
+
+    def __init__(self, prefixes: List[str], mode: str = "asyncio", max_body_bytes: int = 1 << 20,
+                 max_header_bytes: int = 16 << 10, idle_timeout: float = 30.0, request_timeout: float = 10.0):
+        """Initialize server - corresponds to C# constructor
+
+        max_body_bytes / max_header_bytes bound what one request may send
+        (413 / 431 beyond that), idle_timeout closes kept-alive connections
+        without a new request, request_timeout bounds reading one request.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown server mode '{mode}', expected one of {MODES}")
+        self.prefixes = prefixes
+        self.mode = mode
+        self.max_body_bytes = max_body_bytes
+        self.max_header_bytes = max_header_bytes
+        self.idle_timeout = idle_timeout
+        self.request_timeout = request_timeout
+        # (version, parameters), replaced as a whole; version 0 = nothing received yet
+        self._snapshot: Tuple[int, SettingParameters] = (0, None)
+        self._versions = itertools.count(1)
+        self._publish_lock = threading.Lock()  # Keeps versions increasing across publishers
+        self._consumed_version = 0  # Last version returned by get_parameters
+        self._waiters = set()  # (loop, asyncio.Event) of pending wait_for_parameters calls
+        self.server = None
+        self.server_thread = None
+        self._loop = None
+        self._routes: Dict[Tuple[str, str], Tuple[RouteHandler, bool]] = {}
+        self.add_route("POST", "/SetParameters", self._handle_set_parameters, blocking=True)
+        self.add_route("GET", "/Alive", self._handle_alive)
+        self.add_route("GET", "/GetLicense", self._handle_get_license)
+        self.add_route("GET", "/Metrics", self._handle_metrics, blocking=True)
+
+        # Parse first prefix to get port
+        if prefixes:
+            # Assume prefix format is "http://127.0.0.1:port/"
+            match = re.search(r':(\d+)/', prefixes[0])
+            self.port = int(match.group(1)) if match else 51000
         else:
-            self._send_not_found()
-    
-    def _initialize_rois_array(self, size: int) -> List[ROI]:
-        """Initialize ROI array - corresponds to C# InitializeRoisArray"""
-        rois = []
-        for i in range(size):
-            rois.append(ROI(x=-1, y=-1))  # Default values
-        return rois
-    
-    def _handle_set_parameters(self):
+            self.port = 51000
+
+    # ---------- Routing ----------
+
+    def add_route(self, method: str, path: str, handler: RouteHandler, blocking: bool = False):
+        """Serve method + path with handler(body) -> (status, content type, body).
+
+        blocking handlers (parsing, logging) run in a worker thread in asyncio
+        mode so they cannot stall the loop.
+        """
+        self._routes[(method, path)] = (handler, blocking)
+
+    def _route(self, method: str, target: str):
+        return self._routes.get((method, target.split("?", 1)[0]))
+
+    def handle(self, method: str, target: str, body: bytes) -> Response:
+        """Run the route for method + target, 404 if there is none"""
+        route = self._route(method, target)
+        if route is None:
+            return self._send_not_found()
+        return route[0](body)
+
+    @staticmethod
+    def error_response(status: int) -> Response:
+        return status, "text/plain", HTTPStatus(status).phrase.encode("ascii")
+
+    def _handle_set_parameters(self, body: bytes) -> Response:
         """Handle set parameters request - corresponds to C# SetParameters logic"""
         try:
-            # Read request body - corresponds to C# StreamReader
-            content_length = int(self.headers.get('Content-Length', 0))
-            request_body = self.rfile.read(content_length).decode('utf-8')
-            
+            request_body = body.decode('utf-8')
             print(f"Received SetParameters request: {request_body}")
-            
-            # Parse JSON - corresponds to C# JsonConvert.DeserializeObject
-            json_data = json.loads(request_body)
-            
-            # Initialize SettingParameters structure - corresponds to C# SettingParameters settings
-            settings = SettingParameters()
-            settings.version = json_data.get("version", "1.2")
-            settings.analytics_event_api_url = json_data.get("analytics_event_api_url", "")
-            settings.image_width = int(json_data.get("image_width", 0))
-            settings.image_height = int(json_data.get("image_height", 0))
-            settings.jpg_compress = int(json_data.get("jpg_compress", 50))
-            
-            # Parse rois array
-            json_rois = json_data.get("rois", [])
-            settings.rois = []
-            
-            for roi_group_data in json_rois:
-                roi_group = ROIGroup()
-                roi_group.sensitivity = int(roi_group_data.get("sensitivity", 50))
-                roi_group.threshold = int(roi_group_data.get("threshold", 50))
-                
-                # Parse rects array (should have 4 corner points)
-                rects_data = roi_group_data.get("rects", [])
-                roi_group.rects = []
-                for rect_point in rects_data:
-                    roi_point = ROI(
-                        x=int(rect_point.get("x", -1)),
-                        y=int(rect_point.get("y", -1))
-                    )
-                    roi_group.rects.append(roi_point)
-                
-                settings.rois.append(roi_group)
-            
+
+            settings = parse_setting_parameters(json.loads(request_body))
+
             print(f"Parsed {len(settings.rois)} ROI groups:")
             for i, roi_group in enumerate(settings.rois):
                 print(f"  ROI Group {i}: sensitivity={roi_group.sensitivity}, threshold={roi_group.threshold}, {len(roi_group.rects)} points")
                 for j, point in enumerate(roi_group.rects):
                     print(f"    Point {j}: x={point.x}, y={point.y}")
-            
-            # Set to server instance - corresponds to C# _parameters = settings
-            # Ensure _updateparams is set to True
-            if self.server_instance:
-                self.server_instance._parameters = settings
-                self.server_instance._updateparams = True
-            else:
-                print("[ERROR] Server instance is not set. Unable to update parameters.")
-            
-            # Send response - corresponds to C# response logic
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            
-            response_data = {"message": "Parameters set successfully"}
-            response_string = json.dumps(response_data)
-            self.wfile.write(response_string.encode('utf-8'))
-            
+
+            # Corresponds to C# _parameters = settings
+            self.publish_parameters(settings)
+
+            return 200, "application/json", json.dumps({"message": "Parameters set successfully"}).encode('utf-8')
         except Exception as e:
             print(f"Error setting parameters: {e}")
             import traceback
             traceback.print_exc()
-            self.send_response(400)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error_response = {"error": str(e)}
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
-    
-    def _handle_alive(self):
+            return 400, "application/json", json.dumps({"error": str(e)}).encode('utf-8')
+
+    def _handle_alive(self, body: bytes) -> Response:
         """Handle alive check request - corresponds to C# /Alive"""
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/plain')
-        self.end_headers()
-        self.wfile.write(b"")
-    
-    def _handle_get_license(self):
+        return 200, "text/plain", b""
+
+    def _handle_get_license(self, body: bytes) -> Response:
         """Handle license check request - corresponds to C# /GetLicense"""
         # should add code to check license is exist.
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/plain')
-        self.end_headers()
-        self.wfile.write(b"")
-    
-    def _send_not_found(self):
+        return 200, "text/plain", b""
+
+    def _handle_metrics(self, body: bytes) -> Response:
+        """Pipeline metrics in the Prometheus text format"""
+        return 200, "text/plain; version=0.0.4; charset=utf-8", default_registry.render().encode("utf-8")
+
+    def _send_not_found(self) -> Response:
         """Send 404 error - corresponds to C# 404 logic"""
-        self.send_response(404)
-        self.send_header('Content-Type', 'text/plain')
-        self.end_headers()
-        self.wfile.write(b"Not Found")
+        return 404, "text/plain", b"Not Found"
 
+    # ---------- asyncio server ----------
+
+    async def _read_request(self, reader: asyncio.StreamReader, idle: bool):
+        """(method, target, version, headers, body) of the next request, None when the client is done.
+
+        Raises HTTPStatus-carrying ValueError for requests that are answered
+        with an error and closed.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                          self.idle_timeout if idle else self.request_timeout)
+        except asyncio.LimitOverrunError:
+            raise ValueError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise ValueError(HTTPStatus.BAD_REQUEST)
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise ValueError(HTTPStatus.LENGTH_REQUIRED)
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ValueError(HTTPStatus.BAD_REQUEST)
+        if length < 0:
+            raise ValueError(HTTPStatus.BAD_REQUEST)
+        if length > self.max_body_bytes:
+            raise ValueError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.request_timeout) if length else b""
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        return parts[0], parts[1], parts[2], headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, version: str, response: Response, keep_alive: bool):
+        status, content_type, body = response
+        head = (f"{version} {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        idle = False  # The first request is expected promptly
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, idle)
+                except ValueError as e:
+                    self._write_response(writer, "HTTP/1.1", self.error_response(e.args[0]), False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+                route = self._route(method, target)
+                if route is None:
+                    response = self._send_not_found()
+                elif route[1]:
+                    response = await loop.run_in_executor(None, route[0], body)
+                else:
+                    response = route[0](body)
+                self._write_response(writer, version, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+                idle = True
+        except ConnectionError:
+            pass
+        except Exception as e:
+            print(f"Server error: {e}")
+        finally:
+            writer.close()
+
+    # ---------- Lifecycle ----------
 
-class SimpleHttpServer:
-    """HTTP server - corresponds to C# SimpleHttpServer"""
-    
-    def __init__(self, prefixes: List[str]):
-        """Initialize server - corresponds to C# constructor"""
-        self.prefixes = prefixes
-        self._parameters: SettingParameters = None
-        self._updateparams = False
-        self.server = None
-        self.server_thread = None
-        
-        # Parse first prefix to get port
-        if prefixes:
-            # Assume prefix format is "http://127.0.0.1:port/"
-            import re
-            match = re.search(r':(\d+)/', prefixes[0])
-            self.port = int(match.group(1)) if match else 51000
-        else:
-            self.port = 51000
-    
     async def start_async(self):
         """Async start server - corresponds to C# StartAsync"""
+        if self.mode == "threaded":
+            self._start_threaded()
+            return
+        self._loop = asyncio.get_running_loop()
+        # limit bounds the request head: readuntil fails beyond max_header_bytes
+        self.server = await asyncio.start_server(self._serve_connection, '127.0.0.1', self.port,
+                                                 limit=self.max_header_bytes)
+        self.port = self.server.sockets[0].getsockname()[1]  # Resolves port 0
+        print("HTTP Server started.")
+
+    def _start_threaded(self):
         def run_server():
             try:
                 # Create HTTP server - corresponds to C# HttpListener
-                self.server = HTTPServer(('127.0.0.1', self.port), SimpleHttpHandler)
-                
-                # Pass server instance reference to handler class
-                SimpleHttpHandler.server_instance = self
-                
-                print("HTTP Server started.")
+                # timeout closes kept-alive connections that stay idle
+                handler = type("SimpleHttpHandler", (SimpleHttpHandler,), {"timeout": self.idle_timeout})
+                self.server = ThreadingHTTPServer(('127.0.0.1', self.port), handler)
+                self.server.daemon_threads = True
+                self.server.owner = self
+                self.port = self.server.server_address[1]
+
+                print("HTTP Server started (threaded).")
+                started.set()
                 self.server.serve_forever()
-                
+
             except Exception as e:
                 print(f"Server error: {e}")
                 import traceback
                 traceback.print_exc()
-        
+                started.set()
+
+        started = threading.Event()
         self.server_thread = threading.Thread(target=run_server, daemon=True)
         self.server_thread.start()
-    
+        started.wait()
+
+    def is_running(self) -> bool:
+        if self.mode == "threaded":
+            return bool(self.server_thread and self.server_thread.is_alive())
+        return self.server is not None and self.server.is_serving()
+
+    # ---------- Parameter snapshots ----------
+
+    def publish_parameters(self, parameters: SettingParameters) -> int:
+        """Make parameters the current snapshot and wake waiters; returns its version.
+
+        The published object must not be modified afterwards.
+        """
+        with self._publish_lock:
+            version = next(self._versions)
+            self._snapshot = (version, parameters)
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # Loop already closed
+        return version
+
+    def snapshot(self) -> Tuple[int, SettingParameters]:
+        """Current (version, parameters); (0, None) before the first SetParameters"""
+        return self._snapshot
+
+    async def wait_for_parameters(self, after_version: int = 0) -> Tuple[int, SettingParameters]:
+        """Wait until a snapshot newer than after_version is published and return it"""
+        snapshot = self._snapshot
+        if snapshot[0] > after_version:
+            return snapshot
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._publish_lock:
+            self._waiters.add(waiter)
+        try:
+            while True:
+                # Checked after registering, so a publish in between is not missed
+                snapshot = self._snapshot
+                if snapshot[0] > after_version:
+                    return snapshot
+                await waiter[1].wait()
+                waiter[1].clear()
+        finally:
+            with self._publish_lock:
+                self._waiters.discard(waiter)
+
     def is_update_param(self) -> bool:
         """Check if parameters are updated - corresponds to C# IsUpdateParam"""
-        return self._updateparams
-    
+        return self._snapshot[0] > self._consumed_version
+
     def get_parameters(self) -> SettingParameters:
         """Get parameters and reset update flag - corresponds to C# GetParameters"""
-        self._updateparams = False
-        return self._parameters
-    
+        version, parameters = self._snapshot
+        self._consumed_version = version
+        return parameters
+
     def stop(self):
         """Stop server - corresponds to C# Stop"""
-        if self.server:
-            self.server.shutdown()
-            self.server.server_close()
+        if self.server is not None:
+            if self.mode == "threaded":
+                self.server.shutdown()
+                self.server.server_close()
+            elif self._loop is not None and not self._loop.is_closed():
+                # asyncio.Server must be closed from its own loop
+                self._loop.call_soon_threadsafe(self.server.close)
+            self.server = None
         print("HTTP Server stopped.")
 
 # Test standalone start function
-def start_test_server(port: int = 51000):
+def start_test_server(port: int = 51000, mode: str = "asyncio"):
     """Start test server"""
     prefixes = [f"http://127.0.0.1:{port}/"]
-    server = SimpleHttpServer(prefixes)
+    server = SimpleHttpServer(prefixes, mode)
     return server
 
 if __name__ == "__main__":
     # Standalone test run
-    import time
-    import asyncio
-    
     async def main():
         server = start_test_server(51000)
         await server.start_async()
@@ -219,5 +416,5 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             print("\nShutting down server...")
             server.stop()
-    
+
     asyncio.run(main())
@@ -4,9 +4,15 @@ Image processing module - corresponds to image conversion functionality in C#
 import numpy as np
 from PIL import Image, ImageDraw
 import base64
+import binascii
 import io
 import time
-from typing import Tuple, List
+import threading
+from collections import deque
+from typing import Callable, Dict, Tuple, List, Union
+from metrics import SHARED_CHANNEL, stage_histograms
+import yuv_converter
+from yuv_converter import yuv420_to_rgb, split_planes, shared_rgb_cache
 
 class ImageProcessor:
     """Image processing class"""
@@ -16,41 +22,17 @@ class ImageProcessor:
         """
         Convert YUV420 format to RGB
         Corresponds to ConvertYUV420ToBitmap method in C#
+        Reuses the detector's conversion of the same frame when there is one
         """
-        yuv_array = np.frombuffer(yuv_data, dtype=np.uint8)
-        
         frame_size = width * height
         chroma_size = frame_size // 4
         
-        if len(yuv_array) != frame_size + 2 * chroma_size:
-            raise ValueError(f"Invalid YUV420 data size. Expected {frame_size + 2 * chroma_size}, got {len(yuv_array)}")
-        
-        # Separate Y, U, V components
-        y = yuv_array[:frame_size].reshape((height, width))
-        u = yuv_array[frame_size:frame_size + chroma_size].reshape((height//2, width//2))
-        v = yuv_array[frame_size + chroma_size:].reshape((height//2, width//2))
-        
-        # Upsample U and V components
-        u_upsampled = np.repeat(np.repeat(u, 2, axis=0), 2, axis=1)
-        v_upsampled = np.repeat(np.repeat(v, 2, axis=0), 2, axis=1)
-        
-        # Convert to RGB
-        rgb_array = np.zeros((height, width, 3), dtype=np.uint8)
-        
-        # YUV to RGB conversion formula
-        C = y.astype(np.float32) - 16
-        D = u_upsampled.astype(np.float32) - 128
-        E = v_upsampled.astype(np.float32) - 128
-        
-        R = (298 * C + 409 * E + 128) / 256
-        G = (298 * C - 100 * D - 208 * E + 128) / 256
-        B = (298 * C + 516 * D + 128) / 256
-        
-        # Clip to 0-255 range
-        rgb_array[:, :, 0] = np.clip(R, 0, 255)
-        rgb_array[:, :, 1] = np.clip(G, 0, 255)
-        rgb_array[:, :, 2] = np.clip(B, 0, 255)
+        if len(yuv_data) != frame_size + 2 * chroma_size:
+            raise ValueError(f"Invalid YUV420 data size. Expected {frame_size + 2 * chroma_size}, got {len(yuv_data)}")
         
+        rgb_array = shared_rgb_cache.lookup(yuv_data, width, height)
+        if rgb_array is None:
+            rgb_array = yuv420_to_rgb(yuv_data, width, height)
         return rgb_array
     
     @staticmethod
@@ -64,7 +46,14 @@ class ImageProcessor:
         """
         # Convert to RGB
         rgb_array = ImageProcessor.yuv420_to_rgb(yuv_data, width, height)
-        
+        return ImageProcessor.rgb_to_base64_jpeg(rgb_array, quality, detections, debug_mode)
+    
+    @staticmethod
+    def rgb_to_base64_jpeg(rgb_array: np.ndarray, quality: int = 50, 
+                           detections: List[Tuple[int, int, int, int]] = None, debug_mode: bool = False) -> str:
+        """
+        Draw detection boxes on an RGB array and encode it as Base64 JPEG
+        """
         # Create PIL image
         image = Image.fromarray(rgb_array, 'RGB')
         
@@ -146,3 +135,276 @@ class ImageProcessor:
         jpeg_bytes = buffer.getvalue()
         
         return base64.b64encode(jpeg_bytes).decode('utf-8')
+
+
+class FastJpegEncoder:
+    """Speed-oriented JPEG path.
+
+    - No optimize=True: libjpeg's standard Huffman tables, no extra pass
+    - 4:2:0 encoding straight from the YUV planes when no RGB conversion of
+      the frame exists: Y/U/V are wrapped as PIL planes (range-expanded to
+      JFIF if needed), chroma is upsampled in C and merged as YCbCr, so
+      libjpeg skips its color conversion
+    - The JPEG is written into a reusable per-thread buffer and base64 is
+      returned as ASCII bytes, which the HTTP client splices into the JSON
+      body without another str round-trip
+    """
+
+    # Red box in JFIF YCbCr
+    BOX_COLOR_YCBCR = (76, 85, 255)
+
+    def __init__(self, layout: str = None, full_range: bool = None):
+        self.layout = layout
+        self.full_range = full_range
+        self._local = threading.local()
+        # Studio swing (16-235 / 16-240) to JFIF full range
+        self._y_lut = [min(255, max(0, round((i - 16) * 255 / 219))) for i in range(256)]
+        self._c_lut = [min(255, max(0, round((i - 128) * 255 / 224 + 128))) for i in range(256)]
+
+    def _buffer(self) -> io.BytesIO:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+        return buffer
+
+    def yuv420_to_image(self, yuv_data, width: int, height: int) -> Image.Image:
+        """Wrap the YUV420 planes as a YCbCr image without an RGB intermediate"""
+        y, u, v = split_planes(yuv_data, width, height, self.layout)
+        full_range = yuv_converter.DEFAULT_FULL_RANGE if self.full_range is None else self.full_range
+        cw, ch = width // 2, height // 2
+
+        planes = []
+        for plane, size, lut in ((y, (width, height), self._y_lut),
+                                 (u, (cw, ch), self._c_lut),
+                                 (v, (cw, ch), self._c_lut)):
+            image = Image.frombuffer('L', size, np.ascontiguousarray(plane), 'raw', 'L', 0, 1)
+            if not full_range:
+                image = image.point(lut)
+            if size != (width, height):
+                image = image.resize((width, height), Image.NEAREST)
+            planes.append(image)
+        return Image.merge('YCbCr', planes)
+
+    def _encode_jpeg(self, quality: int, detections: List[Tuple[int, int, int, int]] = None,
+                     yuv_data=None, width: int = 0, height: int = 0,
+                     rgb_array: np.ndarray = None) -> memoryview:
+        """Encode from rgb_array when given, else from the YUV planes.
+
+        The returned view points into the per-thread buffer and must be
+        released before the next encode on this thread can resize it.
+        """
+        if rgb_array is not None:
+            image = Image.fromarray(rgb_array, 'RGB')
+            box_color = (255, 0, 0)
+        else:
+            image = self.yuv420_to_image(yuv_data, width, height)
+            box_color = self.BOX_COLOR_YCBCR
+
+        if detections:
+            draw = ImageDraw.Draw(image)
+            for detection in detections:
+                if len(detection) == 4:  # (x, y, w, h) format
+                    x, y, w, h = detection
+                    draw.rectangle([x, y, x + w, y + h], outline=box_color, width=2)
+
+        buffer = self._buffer()
+        image.save(buffer, format='JPEG', quality=quality, subsampling=2)
+        return buffer.getbuffer()[:buffer.tell()]
+
+    def encode_base64(self, quality: int, detections: List[Tuple[int, int, int, int]] = None,
+                      yuv_data=None, width: int = 0, height: int = 0,
+                      rgb_array: np.ndarray = None) -> bytes:
+        """Base64 JPEG as ASCII bytes"""
+        jpeg = self._encode_jpeg(quality, detections, yuv_data, width, height, rgb_array)
+        try:
+            return binascii.b2a_base64(jpeg, newline=False)
+        finally:
+            jpeg.release()  # Let the buffer be resized by the next encode
+
+
+class _EncodeJob:
+    """One keyframe waiting for the encoder, holding its own copy of the pixels"""
+    __slots__ = ("rgb", "yuv", "width", "height", "quality", "detections", "debug_mode",
+                 "on_done", "stages", "enqueued")
+
+    def __init__(self, rgb, yuv, width, height, quality, detections, debug_mode, on_done, stages):
+        self.rgb = rgb
+        self.yuv = yuv
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.detections = detections
+        self.debug_mode = debug_mode
+        self.on_done = on_done
+        self.stages = stages  # Stage histograms of the keyframe's channel
+        self.enqueued = time.perf_counter()
+
+
+class JpegEncoderPool:
+    """Bounded JPEG encoding stage running off the recognize thread.
+
+    submit() snapshots the frame (the shared-memory view is only valid during
+    the detection callback) and returns immediately; worker threads draw the
+    boxes, encode and call on_done(base64_jpeg). PIL releases the GIL while
+    encoding, so detection and encoding overlap.
+
+    Drop policies when the queue is full:
+        drop_oldest - discard the oldest queued keyframe (default, keeps events fresh)
+        drop_newest - discard the keyframe being submitted
+        block       - wait for room, back-pressuring the recognize thread
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    BLOCK = "block"
+    POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+    def __init__(self, workers: int = 2, max_queue: int = 8, drop_policy: str = DROP_OLDEST,
+                 fast: bool = True):
+        """fast selects FastJpegEncoder (base64 delivered as ASCII bytes) over
+        the optimize=True path of yuv420_to_base64_jpeg (delivered as str)."""
+        if drop_policy not in self.POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {self.POLICIES}")
+        self.fast_encoder = FastJpegEncoder() if fast else None
+        self.max_queue = max(1, max_queue)
+        self.drop_policy = drop_policy
+        self.submitted = 0
+        self.encoded = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = deque()
+        self._reserved = 0  # Slots claimed by submitters still snapshotting their frame
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=256)  # (queue wait, encode time) in seconds
+        self._running = True
+        self._workers = [threading.Thread(target=self._run, name=f"JpegEncoder-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, yuv_data, width: int, height: int, quality: int,
+               detections: List[Tuple[int, int, int, int]], on_done: Callable[[Union[str, bytes]], None],
+               debug_mode: bool = False, channel=SHARED_CHANNEL) -> bool:
+        """Queue a keyframe for encoding; False if it was dropped. channel labels its metrics"""
+        reserve = self.drop_policy != self.DROP_OLDEST
+        with self._cond:
+            if not self._running:
+                return False
+            if reserve:
+                # Claim the slot now: other channels may submit while this one snapshots
+                if len(self._queue) + self._reserved >= self.max_queue:
+                    if self.drop_policy == self.DROP_NEWEST:
+                        self.dropped += 1
+                        return False
+                    while len(self._queue) + self._reserved >= self.max_queue and self._running:
+                        self._cond.wait()
+                    if not self._running:
+                        return False
+                self._reserved += 1
+
+        job = None
+        queued = False
+        try:
+            # Snapshot outside the lock: reuse the detector's RGB if it made one,
+            # otherwise copy the (half as large) YUV frame
+            rgb = shared_rgb_cache.lookup(yuv_data, width, height)
+            stages = stage_histograms(channel)
+            if rgb is not None:
+                job = _EncodeJob(rgb.copy(), None, width, height, quality, list(detections or []), debug_mode,
+                                 on_done, stages)
+            else:
+                job = _EncodeJob(None, bytes(yuv_data), width, height, quality, list(detections or []),
+                                 debug_mode, on_done, stages)
+        finally:
+            with self._cond:
+                if reserve:
+                    self._reserved -= 1
+                if job is not None and self._running:
+                    # drop_oldest makes room here; reserved slots are already accounted for
+                    while len(self._queue) + self._reserved >= self.max_queue:
+                        self._queue.popleft()
+                        self.dropped += 1
+                    self._queue.append(job)
+                    self.submitted += 1
+                    queued = True
+                self._cond.notify_all()
+        return queued
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Encoder counters and recent latency percentiles (milliseconds)"""
+        with self._cond:
+            samples = list(self._latencies)
+            stats = {
+                "queue_depth": len(self._queue),
+                "submitted": self.submitted,
+                "encoded": self.encoded,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+        waits = sorted(w for w, _ in samples)
+        encodes = sorted(e for _, e in samples)
+
+        def pct(values, p):
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2) if values else 0.0
+
+        stats.update({
+            "queue_wait_p50_ms": pct(waits, 0.5),
+            "queue_wait_p95_ms": pct(waits, 0.95),
+            "encode_p50_ms": pct(encodes, 0.5),
+            "encode_p95_ms": pct(encodes, 0.95),
+        })
+        return stats
+
+    def close(self, wait: bool = True):
+        """Stop the workers; queued keyframes are still encoded when wait is True"""
+        with self._cond:
+            self._running = False
+            if not wait:
+                self.dropped += len(self._queue)
+                self._queue.clear()
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._running:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                self._cond.notify_all()  # Wake submitters blocked on a full queue
+
+            start = time.perf_counter()
+            try:
+                if self.fast_encoder is not None and not job.debug_mode:
+                    base64_jpeg = self.fast_encoder.encode_base64(
+                        job.quality, job.detections, job.yuv, job.width, job.height, job.rgb)
+                else:
+                    rgb = job.rgb
+                    if rgb is None:
+                        rgb = yuv420_to_rgb(job.yuv, job.width, job.height)
+                    base64_jpeg = ImageProcessor.rgb_to_base64_jpeg(rgb, job.quality, job.detections, job.debug_mode)
+            except Exception as e:
+                print(f"[JpegEncoderPool] Encode error: {e}")
+                with self._cond:
+                    self.failed += 1
+                continue
+            finished = time.perf_counter()
+
+            with self._cond:
+                self.encoded += 1
+                self._latencies.append((start - job.enqueued, finished - start))
+            job.stages["encode_queue_wait"].observe(start - job.enqueued)
+            job.stages["jpeg_encode"].observe(finished - start)
+
+            try:
+                job.on_done(base64_jpeg)
+            except Exception as e:
+                print(f"[JpegEncoderPool] Completion callback error: {e}")
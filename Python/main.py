@@ -6,12 +6,13 @@ import sys
 import time
 import copy
 import os
-from typing import List, Tuple
+from typing import Dict, List, Tuple, Union
 from data_structures import AnalyticsResult, ROI, SettingParameters
-from analytics_engine import Initialize, SettingParameters, registerCallback, unregisterCallback, Deinitialize
+from analytics_engine import Initialize, SettingParameters, registerCallback, unregisterCallback, Deinitialize, set_event_filter, set_tracking, set_motion_gate, set_roi_mode, set_frame_policy, add_channel
 from http_server import SimpleHttpServer
-from http_client import HttpRequestQueue
-from image_processor import ImageProcessor
+from http_client import HttpRequestQueue, SimpleHttpClient, EventSpool
+from image_processor import ImageProcessor, JpegEncoderPool
+from metrics import default_registry
 
 class SampleWrapperMain:
     """Main program class"""
@@ -19,12 +20,44 @@ class SampleWrapperMain:
     def __init__(self):
         # Use hardcoded default values instead of config
         self.port_num = 51000  # Default port
-        self.url = ""
-        self.jpg_compress = 50  # Default JPG compression quality
+        self.ports: List[int] = []  # ports=a,b,c: one engine (and model) for every channel, [] = port_num only
+        self.infer_batch = 1  # Frames from different channels per forward pass, 1 = no batching
+        self.infer_batch_wait = 0.010
+        # Per channel: (analytics_event_api_url, JPG compression quality), replaced as one
+        self.event_settings: Dict[int, Tuple[str, int]] = {}
         self.http_request_queue = HttpRequestQueue()
-        self.http_server: SimpleHttpServer = None
+        self.jpeg_encoder: JpegEncoderPool = None
+        self.encode_workers = 2
+        self.encode_queue = 8
+        self.encode_drop = JpegEncoderPool.DROP_OLDEST
+        self.jpeg_fast = True  # jpeg_mode=fast|optimized
+        self.http_pool_size = 4  # Keep-alive connections per event API host
+        self.connect_timeout = 3.0
+        self.read_timeout = 10.0
+        self.http_workers = 4  # Concurrent event senders
+        self.http_queue = 64
+        self.http_overflow = HttpRequestQueue.DROP_OLDEST
+        self.http_per_url = 2  # Requests in flight per event API URL
+        self.spool_dir = "event_spool"  # Undelivered events, replayed later ("off" disables)
+        self.spool_max_mb = 256
+        self.replay_rate = 5.0  # Replayed events per second
+        self.http_batch = 1  # Events per request, 1 = one request per event
+        self.http_batch_wait = 0.05
+        self.http_compress = None  # gzip / deflate
+        self.http_multipart = False  # Binary JPEG parts instead of base64
+        self.event_filter = {}  # EventSuppressor options, None = report every detection frame
+        self.tracking = None  # TrackingDetector options, None = detector on every frame
+        self.motion_gate = None  # MotionGatedDetector options, None = no motion gating
+        self.roi_mode = None  # full / union / tiles, None = detector default (full frame)
+        self.roi_margin = None
+        self.frame_policy = None  # newest / every, ring shared memory only; None = newest
+        self.detector_backend = None  # ultralytics / onnxruntime / openvino, None = ultralytics
+        self.backend_options = {}  # OnnxHumanDetector options (model_path, intra_threads, inter_threads)
+        self.http_servers: Dict[int, SimpleHttpServer] = {}  # Control server per channel port
+        self.http_server_mode = "asyncio"  # Control server: asyncio (main loop) / threaded
         self.running = True
         self.debug_mode = False
+        self.notify_backend = None  # Frame notification backend (event/pipe/eventfd/poll)
         
         # Store the main event loop during initialization
         self.main_event_loop = asyncio.get_event_loop()
@@ -36,6 +69,8 @@ class SampleWrapperMain:
         """
         Python version of C++ event callback function
         Send image frame when analysis detects something
+        image_frame may be a zero-copy view into shared memory that is only
+        valid until this function returns
         """
         try:
             if self.debug_mode:
@@ -57,16 +92,10 @@ class SampleWrapperMain:
                         for j, roi in enumerate(roi_group[:2]):  # Print first 2 per group
                             print(f"    ROI[{j}]: x={roi.x}, y={roi.y}")
             
-            # Convert YUV420 to JPEG then to Base64
-            base64_jpeg_string = ImageProcessor.yuv420_to_base64_jpeg(
-                image_frame, width, height, self.jpg_compress, detections, self.debug_mode
-            )
-            
-            if self.debug_mode:
-                print(f"  - Base64 JPEG length: {len(base64_jpeg_string)} characters")
-            
             # Convert detections to rois_rects format: [[{"x":x1,"y":y1}, {"x":x2,"y":y2}], ...]
             detection_rects = []
+            # Tracked boxes (tracking=on) carry a stable ID per person
+            track_ids = [det.track_id for det in detections or [] if hasattr(det, "track_id")]
             if detections:
                 for x, y, w, h in detections:
                     # Convert (x, y, w, h) to ROI point format
@@ -83,26 +112,17 @@ class SampleWrapperMain:
                 if self.debug_mode:
                     print(f"  - Formatted detection rects: {detection_rects}")
             
-            # Print the final rois_rects being sent
-            print(f"[DEBUG] Sending rois_rects: {detection_rects}")
-            
-            # Create analytics result
-            analytics_result = AnalyticsResult(
-                version="1.2",
-                port_num=self.port_num,
-                keyframe=base64_jpeg_string,
-                timestamp=timestamp,
-                rois_rects=detection_rects
+            # Convert YUV420 to JPEG then to Base64 on the encoder pool; the
+            # recognize thread goes back to shared memory right away
+            url, jpg_compress = self.event_settings.get(channel_id, ("", 50))
+            accepted = self.jpeg_encoder.submit(
+                image_frame, width, height, jpg_compress, detections,
+                lambda base64_jpeg_string: self._send_analytics_result(
+                    url, channel_id, timestamp, detection_rects, base64_jpeg_string, track_ids),
+                self.debug_mode, channel_id
             )
-            
-            # Add analytics result to queue for processing
-            asyncio.run_coroutine_threadsafe(
-                self.http_request_queue.enqueue(self.url, analytics_result), self.main_event_loop
-            )
-            
-            if self.debug_mode:
-                print(f"  - Added to send queue, target URL: {self.url}")
-                print("Detected!! send analytics result to server!!")
+            if not accepted and self.debug_mode:
+                print("  - JPEG encoder busy, keyframe dropped")
             
         except Exception as e:
             print(f"Callback error: {e}")
@@ -111,6 +131,35 @@ class SampleWrapperMain:
                 print(f"[DEBUG] Detailed error information:")
                 traceback.print_exc()
     
+    def _send_analytics_result(self, url: str, channel_id: int, timestamp: int,
+                               detection_rects: List[List[dict]], base64_jpeg_string: Union[str, bytes],
+                               track_ids: List[int] = None):
+        """Queue the encoded keyframe for sending (runs on an encoder thread)"""
+        if self.debug_mode:
+            print(f"  - Base64 JPEG length: {len(base64_jpeg_string)} characters")
+        
+        # Print the final rois_rects being sent
+        print(f"[DEBUG] Sending rois_rects: {detection_rects}")
+        
+        # Create analytics result
+        analytics_result = AnalyticsResult(
+            version="1.2",
+            port_num=channel_id,
+            keyframe=base64_jpeg_string,
+            timestamp=timestamp,
+            rois_rects=detection_rects,
+            track_ids=track_ids or []
+        )
+        
+        # Add analytics result to queue for processing
+        asyncio.run_coroutine_threadsafe(
+            self.http_request_queue.enqueue(url, analytics_result), self.main_event_loop
+        )
+        
+        if self.debug_mode:
+            print(f"  - Added to send queue, target URL: {url}")
+            print("Detected!! send analytics result to server!!")
+    
     async def start_server_tasks(self):
         """Start server-related tasks"""
         try:
@@ -118,65 +167,68 @@ class SampleWrapperMain:
             await self.http_request_queue.start()
             print("HTTP request queue started")
             
-            # Start HTTP server - corresponds to C# StartAsync
-            await self.http_server.start_async()
+            # Start HTTP servers - corresponds to C# StartAsync
+            for http_server in self.http_servers.values():
+                await http_server.start_async()
             
             # Wait for server to start and check status
             await asyncio.sleep(2)
             
-            # Check if server started successfully
-            if self.http_server.server_thread and self.http_server.server_thread.is_alive():
-                print("HTTP server started successfully")
-            else:
-                print("Failed to start HTTP server")
-                raise RuntimeError("HTTP server failed to start")
+            # Check if servers started successfully
+            for port, http_server in self.http_servers.items():
+                if http_server.is_running():
+                    print(f"HTTP server started successfully (port {port})")
+                else:
+                    print(f"Failed to start HTTP server (port {port})")
+                    raise RuntimeError("HTTP server failed to start")
                 
         except Exception as e:
             print(f"Error starting server tasks: {e}")
             raise
     
-    async def parameter_monitoring_task(self):
-        """Parameter monitoring task - wait for valid parameter settings before initializing analytics engine"""
-        print("[LOG] Waiting for valid parameter settings...")
+    async def parameter_monitoring_task(self, port: int):
+        """Parameter monitoring task - apply every valid SetParameters of one channel; the first one starts it"""
+        print(f"[LOG] Waiting for valid parameter settings (port {port})...")
         
+        http_server = self.http_servers[port]
+        version = 0
+        ready = False
         while self.running:
-            if self.http_server.is_update_param():
-                parameters = self.http_server.get_parameters()
+            # Wakes as soon as the HTTP server publishes a newer snapshot
+            version, parameters = await http_server.wait_for_parameters(version)
+            
+            # Check if parameters are valid and complete
+            if (parameters and 
+                parameters.analytics_event_api_url and 
+                parameters.image_width > 0 and 
+                parameters.image_height > 0):
                 
-                # Check if parameters are valid and complete
-                if (parameters and 
-                    parameters.analytics_event_api_url and 
-                    parameters.image_width > 0 and 
-                    parameters.image_height > 0):
-                    
-                    print(f"[LOG] Received valid parameter settings!")
-                    print(f"  - API URL: {parameters.analytics_event_api_url}")
-                    print(f"  - Image size: {parameters.image_width}x{parameters.image_height}")
-                    
-                    # Set JPEG compression quality
-                    if parameters.jpg_compress > 0:
-                        self.jpg_compress = parameters.jpg_compress
-                    
-                    self.url = parameters.analytics_event_api_url
-                    
+                print(f"[LOG] Received valid parameter settings (port {port}, version {version})!")
+                print(f"  - API URL: {parameters.analytics_event_api_url}")
+                print(f"  - Image size: {parameters.image_width}x{parameters.image_height}")
+                
+                # URL and JPEG quality are swapped together for the callback
+                jpg_compress = parameters.jpg_compress if parameters.jpg_compress > 0 else self.event_settings.get(port, ("", 50))[1]
+                self.event_settings[port] = (parameters.analytics_event_api_url, jpg_compress)
+                
+                if not ready:
                     # Register callback function
                     registerCallback(self.callback_function)
                     print("[LOG] Callback function registered")                   
-                    
-                    # Set parameters
-                    print("[LOG] Setting parameters")
-                    SettingParameters(parameters)
-                                      
+                
+                # Set parameters; the recognize thread picks them up on its next frame
+                print("[LOG] Setting parameters")
+                SettingParameters(parameters, port)
+                
+                if not ready:
+                    ready = True
                     print("[LOG] System is fully ready!")
-                    return  # Parameter setting complete, end monitoring task
-                    
-                else:
-                    print(f"[WARNING] Received parameters but incomplete, continue waiting...")
-                    if parameters:
-                        print(f"  - API URL: {parameters.analytics_event_api_url or 'not set'}")
-                        print(f"  - Image size: {parameters.image_width}x{parameters.image_height}")
-            
-            await asyncio.sleep(1)  # Check every second
+                
+            else:
+                print(f"[WARNING] Received parameters but incomplete, continue waiting...")
+                if parameters:
+                    print(f"  - API URL: {parameters.analytics_event_api_url or 'not set'}")
+                    print(f"  - Image size: {parameters.image_width}x{parameters.image_height}")
     
     async def run(self, args: List[str]):
         """Main run method"""
@@ -198,6 +250,25 @@ class SampleWrapperMain:
                         except ValueError:
                             print("Invalid Input. Use default port")
                             self.port_num = 51000  # Use hardcoded default
+                    elif arg.startswith("ports="):
+                        # Several channels in one process, sharing one loaded model
+                        try:
+                            self.ports = list(dict.fromkeys(int(p) for p in arg.split("=")[1].split(",") if p))
+                            self.port_num = self.ports[0]
+                            print(f"Ports: {', '.join(map(str, self.ports))}")
+                        except (ValueError, IndexError):
+                            print("Invalid ports. Use ports=<port>,<port>,...")
+                            self.ports = []
+                    elif arg.startswith("infer_batch="):
+                        try:
+                            self.infer_batch = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid infer_batch. Using default")
+                    elif arg.startswith("infer_batch_wait_ms="):
+                        try:
+                            self.infer_batch_wait = max(0.0, float(arg.split("=")[1]) / 1000)
+                        except ValueError:
+                            print("Invalid infer_batch_wait_ms. Using default")
                     elif arg.startswith("shm_port="):  # New: specify shared memory port
                         try:
                             shared_memory_port = int(arg.split("=")[1])
@@ -205,6 +276,177 @@ class SampleWrapperMain:
                         except ValueError:
                             print("Invalid shared memory port. Using HTTP port")
                             shared_memory_port = self.port_num
+                    elif arg.startswith("notify="):
+                        self.notify_backend = arg.split("=")[1].lower()
+                        print(f"Frame notification backend: {self.notify_backend}")
+                    elif arg.startswith("encode_workers="):
+                        try:
+                            self.encode_workers = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid encode_workers. Using default")
+                    elif arg.startswith("encode_queue="):
+                        try:
+                            self.encode_queue = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid encode_queue. Using default")
+                    elif arg.startswith("encode_drop="):
+                        policy = arg.split("=")[1].lower()
+                        if policy in JpegEncoderPool.POLICIES:
+                            self.encode_drop = policy
+                        else:
+                            print(f"Invalid encode_drop. Use one of {', '.join(JpegEncoderPool.POLICIES)}")
+                    elif arg.startswith("jpeg_mode="):
+                        mode = arg.split("=")[1].lower()
+                        if mode in ("fast", "optimized"):
+                            self.jpeg_fast = mode == "fast"
+                        else:
+                            print("Invalid jpeg_mode. Use fast or optimized")
+                    elif arg.startswith("http_pool="):
+                        try:
+                            self.http_pool_size = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid http_pool. Using default")
+                    elif arg.startswith("connect_timeout="):
+                        try:
+                            self.connect_timeout = float(arg.split("=")[1])
+                        except ValueError:
+                            print("Invalid connect_timeout. Using default")
+                    elif arg.startswith("read_timeout="):
+                        try:
+                            self.read_timeout = float(arg.split("=")[1])
+                        except ValueError:
+                            print("Invalid read_timeout. Using default")
+                    elif arg.startswith("http_workers="):
+                        try:
+                            self.http_workers = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid http_workers. Using default")
+                    elif arg.startswith("http_queue="):
+                        try:
+                            self.http_queue = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid http_queue. Using default")
+                    elif arg.startswith("http_overflow="):
+                        policy = arg.split("=")[1].lower()
+                        if policy in HttpRequestQueue.POLICIES:
+                            self.http_overflow = policy
+                        else:
+                            print(f"Invalid http_overflow. Use one of {', '.join(HttpRequestQueue.POLICIES)}")
+                    elif arg.startswith("http_per_url="):
+                        try:
+                            self.http_per_url = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid http_per_url. Using default")
+                    elif arg.startswith("spool="):
+                        self.spool_dir = arg.split("=", 1)[1]
+                    elif arg.startswith("spool_max_mb="):
+                        try:
+                            self.spool_max_mb = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid spool_max_mb. Using default")
+                    elif arg.startswith("replay_rate="):
+                        try:
+                            self.replay_rate = float(arg.split("=")[1])
+                        except ValueError:
+                            print("Invalid replay_rate. Using default")
+                    elif arg.startswith("batch="):
+                        try:
+                            self.http_batch = max(1, int(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid batch. Using default")
+                    elif arg.startswith("batch_wait_ms="):
+                        try:
+                            self.http_batch_wait = max(0.0, float(arg.split("=")[1]) / 1000)
+                        except ValueError:
+                            print("Invalid batch_wait_ms. Using default")
+                    elif arg.startswith("http_compress="):
+                        encoding = arg.split("=")[1].lower()
+                        if encoding in ("gzip", "deflate", "none"):
+                            self.http_compress = None if encoding == "none" else encoding
+                        else:
+                            print("Invalid http_compress. Use gzip, deflate or none")
+                    elif arg == "multipart":
+                        self.http_multipart = True
+                    elif arg in ("dedup=off", "dedup=false", "dedup=0"):
+                        self.event_filter = None
+                    elif arg.split("=")[0] in ("event_iou", "event_interval", "event_rate", "event_repeat"):
+                        option = {"event_iou": "iou_threshold", "event_interval": "min_interval",
+                                  "event_rate": "max_events_per_sec", "event_repeat": "repeat_interval"}
+                        try:
+                            if self.event_filter is not None:
+                                self.event_filter[option[arg.split("=")[0]]] = float(arg.split("=")[1])
+                        except ValueError:
+                            print(f"Invalid {arg.split('=')[0]}. Using default")
+                    elif arg.startswith("track_every="):
+                        # Run the detector every Nth frame and track in between
+                        try:
+                            self.tracking = dict(self.tracking or {}, detect_every=max(1, int(arg.split("=")[1])))
+                        except ValueError:
+                            print("Invalid track_every. Tracking disabled")
+                    elif arg.startswith("track_motion="):
+                        try:
+                            self.tracking = dict(self.tracking or {}, motion_fraction=float(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid track_motion. Using default")
+                    elif arg in ("motion", "motion=on"):
+                        self.motion_gate = self.motion_gate or {}
+                    elif arg.startswith("motion_fraction="):
+                        try:
+                            self.motion_gate = dict(self.motion_gate or {}, motion_fraction=float(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid motion_fraction. Motion gate disabled")
+                    elif arg.startswith("backend="):
+                        from detectors import DETECTOR_BACKENDS
+                        backend = arg.split("=")[1].lower()
+                        if backend in DETECTOR_BACKENDS:
+                            self.detector_backend = backend
+                        else:
+                            print(f"Invalid backend. Use one of {', '.join(DETECTOR_BACKENDS)}")
+                    elif arg == "int8":
+                        # Quantized model written by quantize.py; needs an ONNX backend
+                        self.backend_options["int8"] = True
+                        self.detector_backend = self.detector_backend or "onnxruntime"
+                    elif arg.startswith("onnx_model="):
+                        self.backend_options["model_path"] = arg.split("=", 1)[1]
+                    elif arg.split("=")[0] in ("threads", "inter_threads"):
+                        option = {"threads": "intra_threads", "inter_threads": "inter_threads"}[arg.split("=")[0]]
+                        try:
+                            self.backend_options[option] = max(0, int(arg.split("=")[1]))
+                        except ValueError:
+                            print(f"Invalid {arg.split('=')[0]}. Using default")
+                    elif arg.startswith("http_server="):
+                        from http_server import MODES
+                        mode = arg.split("=")[1].lower()
+                        if mode in MODES:
+                            self.http_server_mode = mode
+                        else:
+                            print(f"Invalid http_server. Use one of {', '.join(MODES)}")
+                    elif arg.startswith("roi_mode="):
+                        from detectors import ROI_MODES
+                        mode = arg.split("=")[1].lower()
+                        if mode in ROI_MODES:
+                            self.roi_mode = mode
+                        else:
+                            print(f"Invalid roi_mode. Use one of {', '.join(ROI_MODES)}")
+                    elif arg.startswith("frame_policy="):
+                        from analytics_engine import FRAME_POLICIES
+                        policy = arg.split("=")[1].lower()
+                        if policy in FRAME_POLICIES:
+                            self.frame_policy = policy
+                        else:
+                            print(f"Invalid frame_policy. Use one of {', '.join(FRAME_POLICIES)}")
+                    elif arg.startswith("roi_margin="):
+                        try:
+                            self.roi_margin = max(0.0, float(arg.split("=")[1]))
+                        except ValueError:
+                            print("Invalid roi_margin. Using default")
+                    elif arg.startswith("yuv="):
+                        from yuv_converter import set_default_layout
+                        try:
+                            set_default_layout(arg.split("=")[1])
+                            print(f"YUV420 layout: {arg.split('=')[1]}")
+                        except ValueError as e:
+                            print(f"{e}. Using default layout")
                     elif arg == "debug" or arg == "--debug":
                         self.debug_mode = True
                         print("Debug mode enabled - save detection images when objects are detected")
@@ -216,31 +458,80 @@ class SampleWrapperMain:
                         else:
                             print("Debug mode disabled")
             
-            http_server_url = f"http://127.0.0.1:{self.port_num}/"
-            print(f"httpServerUrl: {http_server_url}")
             
-            # Initialize analytics engine - use same port (corresponds to C# Initialize(httpServerPort))
-            Initialize(self.port_num)
+            # Events that fail to send are spooled to disk and replayed
+            spool = None
+            if self.spool_dir.lower() not in ("", "off", "none"):
+                try:
+                    spool = EventSpool(self.spool_dir, self.spool_max_mb * 1024 * 1024)
+                    print(f"Event spool: {os.path.abspath(self.spool_dir)} (max {self.spool_max_mb} MB)")
+                except OSError as e:
+                    print(f"Event spool disabled: {e}")
+            
+            # Event POSTs reuse keep-alive connections to the analytics API
+            self.http_request_queue = HttpRequestQueue(
+                SimpleHttpClient(self.http_pool_size, self.connect_timeout, self.read_timeout),
+                self.http_workers, self.http_queue, self.http_overflow, self.http_per_url,
+                spool, self.replay_rate,
+                batch_size=self.http_batch, batch_wait=self.http_batch_wait,
+                compression=self.http_compress, multipart=self.http_multipart)
+            print(f"Event sender: {self.http_workers} workers, queue {self.http_queue}, {self.http_overflow}, "
+                  f"{self.http_per_url} per URL")
             
-            # Set a custom detector if needed
-            from analytics_engine import set_detector
-            from detectors import get_default_detector
-            set_detector(get_default_detector())
+            # JPEG encoding runs off the recognize thread
+            self.jpeg_encoder = JpegEncoderPool(self.encode_workers, self.encode_queue, self.encode_drop,
+                                                self.jpeg_fast)
+            print(f"JPEG encoder: {self.encode_workers} workers, queue {self.encode_queue}, {self.encode_drop}, "
+                  f"{'fast' if self.jpeg_fast else 'optimized'}")
+            
+            # Queue depths and sent/dropped counts, read when /Metrics is scraped
+            default_registry.add_stats("analytics_http_queue", "Event sender queue counters",
+                                       self.http_request_queue.get_stats)
+            default_registry.add_stats("analytics_jpeg_encoder", "JPEG encoder queue counters",
+                                       self.jpeg_encoder.get_stats)
+            
+            if self.detector_backend is not None:
+                from detectors import set_default_backend
+                set_default_backend(self.detector_backend, **self.backend_options)
+                print(f"Detector backend: {self.detector_backend} {self.backend_options or ''}")
+
+            # Initialize analytics engine - use same port (corresponds to C# Initialize(httpServerPort)),
+            # further channels share its detector
+            ports = self.ports or [self.port_num]
+            Initialize(ports[0], self.notify_backend, self.infer_batch, self.infer_batch_wait)
+            for port in ports[1:]:
+                add_channel(port, self.notify_backend)
+            if self.infer_batch > 1:
+                print(f"Batched inference: up to {self.infer_batch} frames, {self.infer_batch_wait * 1000:g} ms wait")
+            set_event_filter(self.event_filter)
+            if self.roi_mode is not None:
+                set_roi_mode(self.roi_mode, self.roi_margin)
+            if self.frame_policy is not None:
+                set_frame_policy(self.frame_policy)
+            if self.motion_gate is not None:
+                set_motion_gate(self.motion_gate)
+            if self.tracking is not None:
+                set_tracking(self.tracking)
+            
+            # Set a custom detector if needed (Initialize already loaded the default one)
+            # from analytics_engine import set_detector
+            # set_detector(MyDetector())
             
             # Register callback function
             registerCallback(self.callback_function)
             print("Registered callback")
             
-            # Create HTTP server - corresponds to C# constructor
-            prefixes = [http_server_url]
-            self.http_server = SimpleHttpServer(prefixes)
+            # Create HTTP servers - corresponds to C# constructor; each channel's
+            # producer configures it on its own port
+            for port in ports:
+                self.http_servers[port] = SimpleHttpServer([f"http://127.0.0.1:{port}/"], self.http_server_mode)
             
             try:
                 # Start server tasks
                 await self.start_server_tasks()
                 
-                # Start parameter monitoring task
-                monitoring_task = asyncio.create_task(self.parameter_monitoring_task())
+                # Start parameter monitoring tasks
+                monitoring_tasks = [asyncio.create_task(self.parameter_monitoring_task(port)) for port in ports]
                 
                 print("All services started. Press Ctrl+C to stop.")
                 
@@ -249,7 +540,8 @@ class SampleWrapperMain:
                     await asyncio.sleep(1)
                 
                 # Cleanup
-                monitoring_task.cancel()
+                for monitoring_task in monitoring_tasks:
+                    monitoring_task.cancel()
                 
             except KeyboardInterrupt:
                 print("\\nShutting down...")
@@ -279,9 +571,13 @@ class SampleWrapperMain:
         unregisterCallback()
         Deinitialize()
         
-        # Stop HTTP server
-        if self.http_server:
-            self.http_server.stop()
+        # Stop JPEG encoder after the recognize threads are gone
+        if self.jpeg_encoder:
+            self.jpeg_encoder.close(wait=False)
+        
+        # Stop HTTP servers
+        for http_server in self.http_servers.values():
+            http_server.stop()
         
         print("Cleanup completed")
 
@@ -0,0 +1,216 @@
+"""
+Prometheus-style metrics for the analytics pipeline
+
+Latency histograms per stage and channel, counters and gauges, rendered in
+the Prometheus text format by SimpleHttpServer's /Metrics route. Hot paths
+resolve their Histogram/Counter objects once (per channel or per thread)
+and then only call observe()/inc(): a bisect and two in-place updates under
+an uncontended lock, no label lookups or string building per frame.
+Everything that already keeps counters (queues, encoder, event filter,
+motion gate, tracker) is exposed through add_stats() and only read when
+/Metrics is scraped.
+"""
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Pipeline stages timed per channel
+STAGES = ("shm_read", "yuv_conversion", "inference", "postprocess",
+          "encode_queue_wait", "jpeg_encode", "http_queue_wait", "http_post")
+
+# Seconds, upper bounds (le); +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SHARED_CHANNEL = "shared"  # Label of work not tied to one channel, e.g. batched inference
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last slot: above every bound
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Counter:
+    """Monotonic counter"""
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Value that is set, e.g. the model load time"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Named metric families with labelled children, plus scrape-time stats collectors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families: Dict[str, Tuple[str, str, Dict[Labels, Any]]] = {}  # name -> (type, help, children)
+        self._collectors: Dict[int, Tuple[str, str, Callable[[], Any], Optional[str]]] = {}
+        self._next_collector = 0
+
+    def _child(self, kind: str, name: str, help: str, labels: Dict[str, Any], factory):
+        key = tuple(sorted((label, str(value)) for label, value in labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help, {})
+            elif family[0] != kind:
+                raise ValueError(f"Metric '{name}' is already a {family[0]}")
+            child = family[2].get(key)
+            if child is None:
+                child = family[2][key] = factory()
+            return child
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                  **labels) -> Histogram:
+        """The histogram for these labels, created on first use"""
+        return self._child("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def counter(self, name: str, help: str, **labels) -> Counter:
+        return self._child("counter", name, help, labels, Counter)
+
+    def gauge(self, name: str, help: str, **labels) -> Gauge:
+        return self._child("gauge", name, help, labels, Gauge)
+
+    def add_stats(self, prefix: str, help: str, get_stats: Callable[[], Dict[Any, Any]],
+                  label: str = None) -> int:
+        """Expose a get_stats() dict as <prefix>_<key> gauges, read at scrape time.
+
+        With label, get_stats returns {label value: stats dict}, e.g. stats per
+        channel. Non-numeric values are skipped. Returns a handle for
+        remove_stats().
+        """
+        with self._lock:
+            handle = self._next_collector
+            self._next_collector += 1
+            self._collectors[handle] = (prefix, help, get_stats, label)
+        return handle
+
+    def remove_stats(self, handle: int):
+        with self._lock:
+            self._collectors.pop(handle, None)
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            families = [(name, kind, help, list(children.items()))
+                        for name, (kind, help, children) in self._families.items()]
+            collectors = list(self._collectors.values())
+
+        lines = []
+        for name, kind, help, children in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, child in sorted(children, key=lambda item: item[0]):
+                if kind == "histogram":
+                    counts, total = child.snapshot()
+                    cumulative = 0
+                    for bound, count in zip(child.bounds + (float("inf"),), counts):
+                        cumulative += count
+                        le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(child.value)}")
+
+        samples: Dict[str, Tuple[str, List[Tuple[Labels, float]]]] = {}
+        for prefix, help, get_stats, label in collectors:
+            try:
+                stats = get_stats()
+            except Exception as e:
+                print(f"[metrics] {prefix} stats failed: {e}")
+                continue
+            groups: Iterable = stats.items() if label else [(None, stats)]
+            for label_value, values in groups:
+                labels = () if label is None else ((label, str(label_value)),)
+                for key, value in values.items():
+                    if isinstance(value, (int, float)):
+                        samples.setdefault(f"{prefix}_{key}", (help, []))[1].append((labels, value))
+        for name, (help, values) in samples.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+default_registry = MetricsRegistry()
+
+_stage_sets: Dict[Any, Dict[str, Histogram]] = {}
+_thread = threading.local()
+
+
+def stage_histograms(channel: Any = SHARED_CHANNEL) -> Dict[str, Histogram]:
+    """{stage: Histogram} of one channel in the default registry, cached per channel"""
+    stages = _stage_sets.get(channel)
+    if stages is None:
+        stages = {stage: default_registry.histogram("analytics_stage_seconds",
+                                                    "Time spent per pipeline stage and channel",
+                                                    stage=stage, channel=channel)
+                  for stage in STAGES}
+        _stage_sets[channel] = stages
+    return stages
+
+
+def set_thread_channel(channel: Any):
+    """Attribute stages timed on this thread (e.g. inside the detector) to channel"""
+    _thread.stages = stage_histograms(channel)
+
+
+def thread_stages() -> Dict[str, Histogram]:
+    """Stage histograms of the calling thread's channel, SHARED_CHANNEL if it has none"""
+    try:
+        return _thread.stages
+    except AttributeError:
+        set_thread_channel(SHARED_CHANNEL)
+        return _thread.stages
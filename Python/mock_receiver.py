@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Mock analytics event receiver - local stand-in for analytics_event_api_url
+
+Accepts what HttpRequestQueue sends: single AnalyticsResult JSON, batched
+{"events": [...]} JSON and the multipart batch layout, optionally gzip or
+deflate encoded. Keyframes are decoded and checked to be JPEG, and every
+event is counted.
+
+    python mock_receiver.py port=8080
+    python mock_receiver.py port=8080 delay_ms=200 fail_rate=0.1 save=received
+
+Point the wrapper at http://127.0.0.1:8080/event via SetParameters.
+"""
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Tuple
+
+
+class ReceiverStats:
+    """Counters shared by the handler threads"""
+
+    def __init__(self, keep_arrivals: bool = False):
+        self.requests = 0
+        self.events = 0
+        self.bad_requests = 0
+        self.failed_on_purpose = 0
+        self.body_bytes = 0
+        self.keyframe_bytes = 0
+        self.per_channel: Dict[int, int] = {}
+        self.last_events: List[dict] = []
+        self.keep_arrivals = keep_arrivals
+        self.arrivals: List[Tuple[int, int, float]] = []  # (port_num, timestamp, arrival time.time())
+        self._lock = threading.Lock()
+
+    def add(self, events: List[Tuple[dict, bytes]], body_bytes: int):
+        arrival = time.time()
+        with self._lock:
+            self.requests += 1
+            self.body_bytes += body_bytes
+            for event, jpeg in events:
+                self.events += 1
+                self.keyframe_bytes += len(jpeg)
+                port = event.get("port_num", 0)
+                self.per_channel[port] = self.per_channel.get(port, 0) + 1
+                if self.keep_arrivals:
+                    self.arrivals.append((port, event.get("timestamp", 0), arrival))
+            self.last_events = [event for event, _ in events]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "events": self.events,
+                "bad_requests": self.bad_requests,
+                "failed_on_purpose": self.failed_on_purpose,
+                "body_bytes": self.body_bytes,
+                "keyframe_bytes": self.keyframe_bytes,
+                "per_channel": dict(self.per_channel),
+            }
+
+
+def decode_events(body: bytes, content_type: str, content_encoding: str = None) -> List[Tuple[dict, bytes]]:
+    """Parse one request body into (event, jpeg bytes) pairs"""
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    elif content_encoding == "deflate":
+        body = zlib.decompress(body)
+    elif content_encoding not in (None, "", "identity"):
+        raise ValueError(f"Unsupported Content-Encoding {content_encoding}")
+
+    if content_type.startswith("multipart/"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("ascii") + body)
+        parts = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                 for part in message.iter_parts()}
+        events = json.loads(parts["events"])["events"]
+        decoded = []
+        for event in events:
+            name = event.pop("keyframe_part", None)
+            decoded.append((event, parts[name] if name else b""))
+    else:
+        data = json.loads(body)
+        events = data["events"] if "events" in data else [data]
+        decoded = []
+        for event in events:
+            keyframe = event.pop("keyframe", "")
+            decoded.append((event, base64.b64decode(keyframe) if keyframe else b""))
+
+    for _, jpeg in decoded:
+        if jpeg and not jpeg.startswith(b"\xff\xd8"):
+            raise ValueError("Keyframe is not a JPEG")
+    return decoded
+
+
+class MockReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like a typical event API
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if server.delay:
+            time.sleep(server.delay)
+        if server.fail_rate and random.random() < server.fail_rate:
+            with server.stats._lock:
+                server.stats.failed_on_purpose += 1
+            self._reply(503, b"")
+            return
+
+        try:
+            events = decode_events(body, self.headers.get("Content-Type", ""),
+                                   self.headers.get("Content-Encoding"))
+        except Exception as e:
+            with server.stats._lock:
+                server.stats.bad_requests += 1
+            print(f"[MockReceiver] Bad request: {e}")
+            self._reply(400, str(e).encode("utf-8"))
+            return
+
+        server.stats.add(events, len(body))
+        if server.save_dir:
+            for event, jpeg in events:
+                if jpeg:
+                    name = f"{event.get('port_num', 0)}_{event.get('timestamp', 0)}.jpg"
+                    with open(os.path.join(server.save_dir, name), "wb") as f:
+                        f.write(jpeg)
+        if server.verbose:
+            for event, jpeg in events:
+                print(f"[MockReceiver] port {event.get('port_num')} ts {event.get('timestamp')} "
+                      f"rois {len(event.get('rois_rects', []))} jpeg {len(jpeg)} bytes")
+        self._reply(200, b"")
+
+    def do_GET(self):
+        if self.path == "/Stats":
+            self._reply(200, json.dumps(self.server.stats.snapshot()).encode("utf-8"), "application/json")
+        else:
+            self._reply(404, b"")
+
+    def _reply(self, status: int, body: bytes, content_type: str = "text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockReceiver:
+    """Threaded mock receiver, usable from tests and benchmark scripts"""
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1", delay: float = 0.0,
+                 fail_rate: float = 0.0, save_dir: str = None, verbose: bool = False,
+                 keep_arrivals: bool = False):
+        """keep_arrivals records (port_num, timestamp, arrival time) per event for latency measurements"""
+        self.server = ThreadingHTTPServer((host, port), MockReceiverHandler)
+        self.server.daemon_threads = True
+        self.server.stats = ReceiverStats(keep_arrivals)
+        self.server.delay = delay
+        self.server.fail_rate = fail_rate
+        self.server.save_dir = save_dir
+        self.server.verbose = verbose
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+        self._thread = None
+
+    @property
+    def stats(self) -> ReceiverStats:
+        return self.server.stats
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/event"
+
+    def start(self) -> "MockReceiver":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main(args: List[str]):
+    options = dict(arg.split("=", 1) for arg in args if "=" in arg)
+    receiver = MockReceiver(
+        port=int(options.get("port", 8080)),
+        delay=float(options.get("delay_ms", 0)) / 1000,
+        fail_rate=float(options.get("fail_rate", 0)),
+        save_dir=options.get("save"),
+        verbose="quiet" not in args,
+    ).start()
+    print(f"Mock receiver listening on {receiver.url} (GET /Stats for counters)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"[MockReceiver] {receiver.stats.snapshot()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
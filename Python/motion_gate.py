@@ -0,0 +1,122 @@
+"""
+Motion-gated inference - skip the detector while the ROIs are static
+
+Fixed cameras mostly show an empty scene. MotionGatedDetector keeps a
+running background of the subsampled Y plane, read straight from the
+shared-memory frame, and only calls the wrapped detector when enough of
+the pixels inside the ROIs differ from it.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from detectors import BaseDetector
+from yuv_converter import split_planes
+
+
+class MotionGatedDetector(BaseDetector):
+    """Runs the wrapped detector only when the ROIs show motion.
+
+    A pixel of the luma plane subsampled by ``step`` is moving when it
+    differs from the background by more than pixel_threshold; the frame is
+    moving when more than motion_fraction of the pixels inside the ROI
+    rectangles (the whole frame without ROIs) are. The background follows
+    the scene with weight ``learning_rate`` per frame, so lighting drift is
+    absorbed.
+
+    The detector keeps running while its last pass found someone, since a
+    person standing still stops producing motion but is still there, and
+    at least every max_skip frames as a safety net. Skipped frames return
+    no detections. Gate state is per video stream: one instance per channel.
+    """
+
+    def __init__(self, detector: BaseDetector, motion_fraction: float = 0.003, pixel_threshold: int = 18,
+                 step: int = 4, learning_rate: float = 0.05, max_skip: int = 75):
+        self.detector = detector
+        self.motion_fraction = motion_fraction
+        self.pixel_threshold = pixel_threshold
+        self.step = max(1, step)
+        self.learning_rate = learning_rate
+        self.max_skip = max_skip
+        self.frames = 0
+        self.inferences = 0
+        self.motion_frames = 0
+        self.last_motion = 0.0  # Moving fraction of the last frame
+        self._background: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        self._mask_key = None
+        self._since_detect = 0
+        self._occupied = False
+
+    def set_confidence_threshold(self, threshold: float):
+        self.detector.set_confidence_threshold(threshold)
+
+    def reset(self):
+        self._background = None
+        self._occupied = False
+
+    def _roi_mask(self, shape: Tuple[int, int], roi_rects) -> Optional[np.ndarray]:
+        """Boolean mask of the subsampled plane covered by the ROIs, None = everything"""
+        key = (shape, tuple(roi_rects or ()))
+        if key == self._mask_key:
+            return self._mask
+        mask = None
+        if roi_rects:
+            mask = np.zeros(shape, dtype=bool)
+            step = self.step
+            for roi in roi_rects:
+                x1, x2 = sorted((roi[0], roi[2]))
+                y1, y2 = sorted((roi[1], roi[3]))
+                mask[max(0, y1) // step:max(0, y2) // step + 1, max(0, x1) // step:max(0, x2) // step + 1] = True
+        self._mask, self._mask_key = mask, key
+        return mask
+
+    def _measure_motion(self, yuv420_frame, width: int, height: int, roi_rects) -> Optional[float]:
+        """Moving fraction inside the ROIs; None on the first frame"""
+        y, _, _ = split_planes(yuv420_frame, width, height)
+        luma = y[::self.step, ::self.step].astype(np.float32)
+        background = self._background
+        if background is None or background.shape != luma.shape:
+            self._background = luma
+            return None
+
+        moving = np.abs(luma - background) > self.pixel_threshold
+        mask = self._roi_mask(luma.shape, roi_rects)
+        if mask is None:
+            fraction = float(moving.mean())
+        else:
+            inside = moving[mask]
+            fraction = float(inside.mean()) if inside.size else 0.0
+        # Running average background: background += rate * (luma - background)
+        background += self.learning_rate * (luma - background)
+        return fraction
+
+    def detect(self, yuv420_frame: bytes, width: int, height: int,
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
+        self.frames += 1
+        self._since_detect += 1
+        motion = self._measure_motion(yuv420_frame, width, height, roi_rects)
+        moving = motion is None or motion > self.motion_fraction
+        if motion is not None:
+            self.last_motion = motion
+        if moving:
+            self.motion_frames += 1
+
+        if not (moving or self._occupied or self._since_detect >= self.max_skip):
+            return []
+
+        detections = self.detector.detect(yuv420_frame, width, height, roi_rects, confidence)
+        self.inferences += 1
+        self._since_detect = 0
+        self._occupied = bool(detections)
+        return detections
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "skipped": self.frames - self.inferences,
+            "motion_frames": self.motion_frames,
+            "last_motion": round(self.last_motion, 4),
+        }
@@ -0,0 +1,160 @@
+"""
+ONNX Runtime / OpenVINO CPU backend for the human detector
+
+Runs an exported YOLOv8 ONNX graph without importing torch or Ultralytics.
+Frames go through the same direct-YUV letterbox as YOLOHumanDetector and
+the raw (N, 4 + classes, anchors) output is decoded, thresholded and
+NMS-filtered in NumPy, person class only.
+
+Export a model once on a machine with Ultralytics installed:
+
+    python -c "from onnx_detector import export_onnx; export_onnx('n')"
+"""
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from detectors import PERSON_CLASS, YOLOHumanDetector, YUVLetterbox, nms_indices
+
+BACKENDS = ("onnxruntime", "openvino")
+
+
+def int8_path(model_path: str) -> str:
+    """yolov8n.onnx -> yolov8n.int8.onnx, the file quantize.py writes"""
+    root, ext = os.path.splitext(model_path)
+    return model_path if root.endswith(".int8") else f"{root}.int8{ext or '.onnx'}"
+
+
+def export_onnx(model_size: str = "n", dynamic: bool = True, input_size: int = 640) -> Optional[str]:
+    """Export yolov8<size>.pt to ONNX next to it; returns the .onnx path, None on failure"""
+    try:
+        from ultralytics import YOLO  # type: ignore
+    except Exception:
+        print("[export_onnx] Ultralytics is needed to export a model. Install with: pip install ultralytics")
+        return None
+    try:
+        path = YOLO(f"yolov8{model_size}.pt").export(format="onnx", dynamic=dynamic, imgsz=input_size)
+        print(f"[export_onnx] Exported {path}")
+        return str(path)
+    except Exception as e:
+        print(f"[export_onnx] Export failed: {e}")
+        return None
+
+
+class _OrtSession:
+    """ONNX Runtime CPU session; batches are split when the graph has a fixed batch size"""
+
+    def __init__(self, path: str, intra_threads: int, inter_threads: int):
+        import onnxruntime as ort  # type: ignore
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_threads  # 0 = one per physical core
+        options.inter_op_num_threads = inter_threads
+        if inter_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input = self._session.get_inputs()[0]
+        self._input_name = model_input.name
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        self.input_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else None
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+class _OpenVinoSession:
+    """OpenVINO CPU compiled model (reads the ONNX file directly)"""
+
+    def __init__(self, path: str, intra_threads: int, inter_threads: int):
+        import openvino as ov  # type: ignore
+
+        core = ov.Core()
+        model = core.read_model(path)
+        shape = model.input(0).get_partial_shape()
+        self.fixed_batch = None if shape[0].is_dynamic else shape[0].get_length()
+        self.input_size = None if shape[2].is_dynamic else shape[2].get_length()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if intra_threads > 0:
+            config["INFERENCE_NUM_THREADS"] = intra_threads
+        if inter_threads > 1:
+            config["NUM_STREAMS"] = inter_threads
+        self._compiled = core.compile_model(model, "CPU", config)
+        self._output = self._compiled.output(0)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self._compiled(batch)[self._output]
+
+
+class OnnxHumanDetector(YOLOHumanDetector):
+    """YOLOv8 person detector on ONNX Runtime or OpenVINO, no torch needed.
+
+    Shares ROI cropping, batching and the direct-YUV letterbox with
+    YOLOHumanDetector; only the forward pass and the output decoding
+    differ. intra_threads is the thread count of one inference (0 = backend
+    default), inter_threads the number of operators or streams run in
+    parallel. The input size is read from the model when it is fixed.
+    int8 loads the quantized copy of model_path written by quantize.py.
+    """
+
+    def __init__(self, model_path: str = "yolov8n.onnx", backend: str = "onnxruntime",
+                 confidence_threshold: float = 0.3, iou_threshold: float = 0.45,
+                 intra_threads: int = 0, inter_threads: int = 1, input_size: int = 640,
+                 roi_mode: str = "full", roi_margin: float = 0.1, max_det: int = 300,
+                 int8: bool = False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown ONNX backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.iou_threshold = iou_threshold
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self.max_det = max_det
+        if int8:
+            model_path = int8_path(model_path)
+        self.model_path = model_path
+        super().__init__(model_path, confidence_threshold, input_size, True, roi_mode, roi_margin)
+
+    def _load_model(self, model_path):
+        if not os.path.exists(model_path):
+            hint = "quantize.py" if model_path.endswith(".int8.onnx") else "onnx_detector.export_onnx()"
+            print(f"[OnnxHumanDetector] {model_path} not found, create it with {hint}")
+            return None
+        session_class = _OrtSession if self.backend == "onnxruntime" else _OpenVinoSession
+        try:
+            session = session_class(model_path, self.intra_threads, self.inter_threads)
+        except ImportError:
+            print(f"[OnnxHumanDetector] {self.backend} not available. Install with: pip install {self.backend}")
+            return None
+        except Exception as e:
+            print(f"[OnnxHumanDetector] Failed to load {model_path} with {self.backend}: {e}")
+            return None
+        if session.input_size and session.input_size != self.input_size:
+            self.input_size = session.input_size
+            self._letterbox = YUVLetterbox(session.input_size)
+        print(f"[OnnxHumanDetector] {model_path} loaded with {self.backend} "
+              f"(threads {self.intra_threads or 'auto'}/{self.inter_threads}, input {self.input_size})")
+        return session
+
+    def _infer(self, source: np.ndarray, confidence: float) -> np.ndarray:
+        session = self._model
+        if session.fixed_batch is None or session.fixed_batch == len(source):
+            return session.run(source)
+        # Graph exported with a fixed batch size: run the frames one by one
+        return np.concatenate([session.run(source[i:i + 1]) for i in range(len(source))])
+
+    def _postprocess(self, result: np.ndarray, roi_rects: List[Tuple[int, int, int, int]],
+                     confidence: float, transform=None, width: int = 0,
+                     height: int = 0, scores: List[float] = None) -> List[Tuple[int, int, int, int]]:
+        """Decode one (4 + classes, anchors) prediction: person boxes above confidence, NMS-filtered"""
+        person = result[4 + PERSON_CLASS]
+        candidates = np.flatnonzero(person > confidence)
+        if candidates.size > self.max_det * 10:
+            # Crowded scenes: NMS cost grows quadratically, keep the strongest boxes
+            candidates = candidates[np.argpartition(-person[candidates], self.max_det * 10)[:self.max_det * 10]]
+        cx, cy, w, h = result[:4, candidates]
+        xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        box_scores = person[candidates]
+        keep = nms_indices(xyxy, box_scores, self.iou_threshold)[:self.max_det]
+        return self._boxes_to_detections(xyxy[keep], box_scores[keep], roi_rects, transform,
+                                         width, height, scores)
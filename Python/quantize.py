@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+INT8 quantization of the ONNX person detector
+
+Static post-training quantization with ONNX Runtime, calibrated on frames
+captured from the site's own shared memory so the activation ranges match
+its cameras (lighting, resolution, YUV range). Two steps:
+
+    python quantize.py capture --port 51000 --dir calib --count 200
+    python quantize.py quantize --model yolov8n.onnx --dir calib
+
+The second step writes yolov8n.int8.onnx, which main.py loads with
+"backend=onnxruntime int8" (or backend=openvino). bench_int8.py compares it
+with the FP32 detector on the captured frames.
+
+Capturing consumes frames like the analytics service does (image_status is
+set to 2), so run it while the service is stopped or accept the gaps.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from typing import List, Optional, Tuple
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from detectors import YUVLetterbox
+from onnx_detector import int8_path
+
+# Captured frame files: frame_<index>_<width>x<height>.yuv (raw I420)
+_FRAME_NAME = re.compile(r"frame_(\d+)_(\d+)x(\d+)\.yuv$")
+
+Frame = Tuple[bytes, int, int]  # (yuv420, width, height)
+
+
+def save_frame(directory: str, index: int, frame, width: int, height: int) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"frame_{index:05d}_{width}x{height}.yuv")
+    with open(path, "wb") as f:
+        f.write(frame)
+    return path
+
+
+def load_frames(directory: str, limit: int = None) -> List[Frame]:
+    """Captured frames in capture order"""
+    frames = []
+    if not os.path.isdir(directory):
+        return frames
+    for name in sorted(os.listdir(directory)):
+        match = _FRAME_NAME.match(name)
+        if not match:
+            continue
+        width, height = int(match.group(2)), int(match.group(3))
+        with open(os.path.join(directory, name), "rb") as f:
+            frames.append((f.read(), width, height))
+        if limit and len(frames) >= limit:
+            break
+    return frames
+
+
+def capture_frames(port: int, directory: str, count: int = 200, interval: float = 0.5,
+                   timeout: float = 600.0, notify_backend: str = None) -> int:
+    """Copy count frames from ChannelFrame_<port>, at least interval seconds apart.
+
+    Spacing the frames out gives the calibration a spread of scenes instead of
+    200 near-identical consecutive frames. Returns the number saved.
+    """
+    from analytics_engine import FrameLease, SharedFrameSource
+    from frame_notifier import get_default_notifier
+
+    source = SharedFrameSource(port)
+    notifier = get_default_notifier(port, notify_backend)
+    saved = 0
+    last = 0.0
+    deadline = time.monotonic() + timeout
+    try:
+        while saved < count and time.monotonic() < deadline:
+            lease = source.acquire()
+            if lease == -1:
+                return saved
+            got_frame = isinstance(lease, FrameLease)
+            notifier.on_poll(got_frame)
+            if not got_frame:
+                notifier.wait()
+                continue
+            with lease:
+                now = time.monotonic()
+                if now - last < interval or lease.size < lease.width * lease.height * 3 // 2:
+                    continue
+                save_frame(directory, saved, lease.data, lease.width, lease.height)
+                saved += 1
+                last = now
+            if saved % 20 == 0:
+                print(f"[capture] {saved}/{count} frames")
+    finally:
+        notifier.close()
+        source.close()
+    print(f"[capture] Saved {saved} frames to {directory}")
+    return saved
+
+
+def _calibration_reader(frames: List[Frame], input_name: str, input_size: int):
+    """ONNX Runtime CalibrationDataReader feeding letterboxed frames one at a time"""
+    from onnxruntime.quantization import CalibrationDataReader  # type: ignore
+
+    letterbox = YUVLetterbox(input_size)
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            tensor, _ = letterbox(*frame)
+            return {input_name: tensor[None]}
+
+    return FrameReader()
+
+
+def _head_nodes(model_path: str) -> List[str]:
+    """Nodes of the YOLOv8 detection head (model.22): box decoding loses too much in INT8"""
+    import onnx  # type: ignore
+
+    return [node.name for node in onnx.load(model_path).graph.node if node.name.startswith("/model.22/")]
+
+
+def quantize_onnx(model_path: str, frames_dir: str, output_path: str = None, max_frames: int = 300,
+                  per_channel: bool = True, exclude_head: bool = True) -> Optional[str]:
+    """Write an INT8 (QDQ) copy of model_path calibrated on captured frames; returns its path"""
+    try:
+        import onnxruntime as ort  # type: ignore
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static  # type: ignore
+        from onnxruntime.quantization.shape_inference import quant_pre_process  # type: ignore
+    except ImportError:
+        print("[quantize] onnxruntime not available. Install with: pip install onnxruntime onnx")
+        return None
+
+    frames = load_frames(frames_dir, max_frames)
+    if not frames:
+        print(f"[quantize] No captured frames in {frames_dir}")
+        return None
+    output_path = output_path or int8_path(model_path)
+
+    model_input = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0]
+    input_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else 640
+
+    # Shape inference and graph cleanup improve which nodes get quantized
+    prepared = output_path + ".prep.onnx"
+    quant_pre_process(model_path, prepared)
+    try:
+        print(f"[quantize] Calibrating on {len(frames)} frames ({input_size}x{input_size})...")
+        quantize_static(
+            prepared, output_path,
+            _calibration_reader(frames, model_input.name, input_size),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=_head_nodes(prepared) if exclude_head else [],
+        )
+    finally:
+        os.remove(prepared)
+    print(f"[quantize] Wrote {output_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    capture = commands.add_parser("capture", help="save calibration frames from shared memory")
+    capture.add_argument("--port", type=int, default=51000)
+    capture.add_argument("--dir", default="calib")
+    capture.add_argument("--count", type=int, default=200)
+    capture.add_argument("--interval", type=float, default=0.5, help="seconds between saved frames")
+    capture.add_argument("--notify", help="frame notifier backend (event/pipe/eventfd/poll)")
+    quantize = commands.add_parser("quantize", help="write the INT8 model")
+    quantize.add_argument("--model", default="yolov8n.onnx")
+    quantize.add_argument("--dir", default="calib")
+    quantize.add_argument("--output")
+    quantize.add_argument("--max-frames", type=int, default=300)
+    quantize.add_argument("--per-tensor", action="store_true", help="per-tensor instead of per-channel weights")
+    quantize.add_argument("--quantize-head", action="store_true", help="also quantize the detection head")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        capture_frames(args.port, args.dir, args.count, args.interval, notify_backend=args.notify)
+    elif quantize_onnx(args.model, args.dir, args.output, args.max_frames,
+                       not args.per_tensor, not args.quantize_head) is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
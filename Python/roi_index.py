@@ -0,0 +1,150 @@
+"""
+Polygon ROIs - point-accurate ROI matching for many ROIs per camera
+
+The 4 corner points of an ROI group usually describe a trapezoid (a floor
+area seen in perspective), not an axis-aligned rectangle. RoiSet keeps the
+real polygons, rasterizes each one once into a coarse grid and turns the
+rasters into summed-area tables, so "does this box touch that polygon" is
+four table lookups. All detections are checked against all ROIs in one
+NumPy expression instead of a Python loop per pair.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Box = Tuple[int, int, int, int]  # (x, y, w, h)
+Point = Tuple[float, float]
+
+
+def points_in_polygon(px: np.ndarray, py: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd rule test of (broadcastable) point arrays against one polygon"""
+    inside = np.zeros(np.broadcast(px, py).shape, dtype=bool)
+    xj, yj = polygon[-1]
+    for xi, yi in polygon:
+        if yi != yj:
+            crosses = (yi > py) != (yj > py)
+            x_cross = (xj - xi) * (py - yi) / (yj - yi) + xi
+            inside ^= crosses & (px < x_cross)
+        xj, yj = xi, yi
+    return inside
+
+
+def rects_overlap(boxes: np.ndarray, rects: Sequence[Tuple[int, int, int, int]]) -> np.ndarray:
+    """(D, R) overlap matrix of (x, y, w, h) boxes and corner-point rectangles"""
+    r = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    rx1, rx2 = np.minimum(r[:, 0], r[:, 2]), np.maximum(r[:, 0], r[:, 2])
+    ry1, ry2 = np.minimum(r[:, 1], r[:, 3]), np.maximum(r[:, 1], r[:, 3])
+    x1, y1 = boxes[:, 0:1], boxes[:, 1:2]
+    x2, y2 = x1 + boxes[:, 2:3], y1 + boxes[:, 3:4]
+    return (x1 < rx2) & (x2 > rx1) & (y1 < ry2) & (y2 > ry1)
+
+
+class RoiSet(list):
+    """ROI polygons with their own confidence thresholds.
+
+    Behaves as the list of the polygons' bounding rectangles (x1, y1, x2,
+    y2), so code that only needs rectangles (cropping, motion masks) keeps
+    working unchanged. overlaps() and keep() use the polygons themselves.
+
+    Polygons are rasterized into cells of ``cell`` pixels, a cell belonging
+    to a polygon when its centre is inside it; a box matches a polygon when
+    it covers at least one of its cells. confidences holds one threshold per
+    ROI (None = no threshold beyond the detector's own).
+    """
+
+    def __init__(self, polygons: Sequence[Sequence[Point]],
+                 confidences: Sequence[Optional[float]] = None, cell: int = 8):
+        self.polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polygons]
+        super().__init__((int(np.floor(p[:, 0].min())), int(np.floor(p[:, 1].min())),
+                          int(np.ceil(p[:, 0].max())), int(np.ceil(p[:, 1].max()))) for p in self.polygons)
+        if confidences is None:
+            confidences = [None] * len(self.polygons)
+        self.confidences = list(confidences)
+        self.cell = max(1, int(cell))
+        self._thresholds = np.array([-np.inf if c is None else c for c in self.confidences], dtype=np.float64)
+        self._build_tables()
+
+    def _build_tables(self):
+        cell = self.cell
+        if not self.polygons:
+            self._origin = (0.0, 0.0)
+            self._tables = np.zeros((0, 1, 1), dtype=np.int32)
+            return
+        ox = min(r[0] for r in self)
+        oy = min(r[1] for r in self)
+        grid_w = (max(r[2] for r in self) - ox) // cell + 1
+        grid_h = (max(r[3] for r in self) - oy) // cell + 1
+        self._origin = (float(ox), float(oy))
+        self._grid = (grid_w, grid_h)
+
+        # One summed-area table per polygon, zero-padded on the top/left edge
+        tables = np.zeros((len(self.polygons), grid_h + 1, grid_w + 1), dtype=np.int32)
+        centres_x = ox + (np.arange(grid_w) + 0.5) * cell
+        centres_y = oy + (np.arange(grid_h) + 0.5) * cell
+        for index, polygon in enumerate(self.polygons):
+            x1, y1, x2, y2 = self[index]
+            cx1, cx2 = (x1 - ox) // cell, (x2 - ox) // cell + 1
+            cy1, cy2 = (y1 - oy) // cell, (y2 - oy) // cell + 1
+            inside = points_in_polygon(centres_x[None, cx1:cx2], centres_y[cy1:cy2, None], polygon)
+            if not inside.any():
+                # Slivers thinner than a cell still own the cell of their centroid
+                cx, cy = polygon.mean(axis=0)
+                inside[min(int(cy - oy) // cell - cy1, inside.shape[0] - 1),
+                       min(int(cx - ox) // cell - cx1, inside.shape[1] - 1)] = True
+            mask = np.zeros((grid_h, grid_w), dtype=np.int32)
+            mask[cy1:cy2, cx1:cx2] = inside
+            tables[index, 1:, 1:] = mask.cumsum(0).cumsum(1)
+        self._tables = tables
+
+    def overlaps(self, boxes) -> np.ndarray:
+        """(D, R) bool matrix: detection d touches ROI polygon r"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if not len(self) or not len(boxes):
+            return np.zeros((len(boxes), len(self)), dtype=bool)
+        ox, oy = self._origin
+        grid_w, grid_h = self._grid
+        cell = self.cell
+        x1 = np.clip(np.floor((boxes[:, 0] - ox) / cell), 0, grid_w).astype(np.intp)
+        y1 = np.clip(np.floor((boxes[:, 1] - oy) / cell), 0, grid_h).astype(np.intp)
+        x2 = np.clip(np.ceil((boxes[:, 0] + boxes[:, 2] - ox) / cell), 0, grid_w).astype(np.intp)
+        y2 = np.clip(np.ceil((boxes[:, 1] + boxes[:, 3] - oy) / cell), 0, grid_h).astype(np.intp)
+        t = self._tables
+        covered = t[:, y2, x2] - t[:, y1, x2] - t[:, y2, x1] + t[:, y1, x1]
+        return (covered > 0).T
+
+    def keep(self, boxes, scores=None) -> np.ndarray:
+        """Per-detection bool: inside some ROI whose confidence threshold the score passes"""
+        hits = self.overlaps(boxes)
+        if scores is not None:
+            hits &= np.asarray(scores, dtype=np.float64).reshape(-1, 1) > self._thresholds[None, :]
+        return hits.any(axis=1)
+
+    def min_confidence(self) -> Optional[float]:
+        """Loosest ROI threshold: what the detector must run at to serve every ROI"""
+        valid = [c for c in self.confidences if c is not None]
+        return min(valid) if valid else None
+
+    def group(self, detections: Sequence[Box]) -> Dict[int, List[Box]]:
+        """Detections per ROI index (a detection may fall in several ROIs)"""
+        groups: Dict[int, List[Box]] = {}
+        if not detections:
+            return groups
+        for d, r in zip(*np.nonzero(self.overlaps(detections))):
+            groups.setdefault(int(r), []).append(detections[d])
+        return groups
+
+
+def filter_detections(boxes, scores, roi_rects) -> np.ndarray:
+    """Per-detection keep mask for (x, y, w, h) boxes against roi_rects.
+
+    roi_rects may be a RoiSet (polygons, per-ROI thresholds) or a plain list
+    of corner-point rectangles; None keeps everything.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if roi_rects is None:
+        return np.ones(len(boxes), dtype=bool)
+    if isinstance(roi_rects, RoiSet):
+        return roi_rects.keep(boxes, scores)
+    if not len(boxes) or not len(roi_rects):
+        return np.zeros(len(boxes), dtype=bool)
+    return rects_overlap(boxes, roi_rects).any(axis=1)
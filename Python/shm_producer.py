@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Shared-memory frame producer - local stand-in for Spark_Test_Prog.exe / ARGO
+
+Publishes YUV420 (I420) frames into ChannelFrame_<port> with the MMF_Data
+layout and handshake the wrapper expects: header 0x1234, image_status 1
+once a frame is written, the reader hands the slot back with 2, footer
+0x4321. On Linux the region is the file analytics_engine.shared_memory_path
+maps, so the wrapper and this script meet without the Windows named mapping.
+
+Frames come from a recorded raw I420 clip (looped) or a synthetic scene with
+moving blocks, at a fixed rate on any number of channels:
+
+    python shm_producer.py --ports 51000 --fps 15
+    python shm_producer.py --ports 51000 51001 51002 --clip clip.yuv --width 1920 --height 1080
+
+A frame that comes due while the reader still holds the previous one is
+dropped, like a camera feeding a busy analytics process. With --slots N the
+region uses the ring layout instead (see analytics_engine.MMF_RING_HEADER):
+frames go to any free slot and are only dropped once all N are waiting.
+
+    python shm_producer.py --ports 51000 --fps 30 --slots 4
+"""
+import argparse
+import errno
+import os
+import struct
+import sys
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import (MMF_DATA_FOOTER, MMF_DATA_HEADER, MMF_DATA_SIZE, MMF_IMAGE_OFFSET, MMF_RING_HEADER,
+                              MMF_RING_INIT, MMF_RING_VERSION, RING_MAX_SLOTS, RING_SLOT_HEADER_SIZE, open_shared_memory,
+                              ring_region_size, ring_slot_offset)
+
+MAX_IMAGE_SIZE = MMF_DATA_SIZE - MMF_IMAGE_OFFSET - 8
+
+
+class SyntheticClip:
+    """Looping scene: gradient background with blocks moving across it.
+
+    Unlike noise it has real motion for the motion gate and JPEG sizes close
+    to a camera frame's.
+    """
+
+    def __init__(self, width: int, height: int, frames: int = 60):
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 3 // 2
+        y_rows = np.linspace(40, 200, height, dtype=np.float32)[:, None]
+        y_cols = np.linspace(0, 30, width, dtype=np.float32)[None, :]
+        background = (y_rows + y_cols).astype(np.uint8)
+        block_w, block_h = max(2, width // 12), max(2, height // 4)
+        self._frames = []
+        for i in range(frames):
+            frame = np.empty(self.frame_size, dtype=np.uint8)
+            y = frame[:width * height].reshape(height, width)
+            y[:] = background
+            for lane in range(2):
+                x = int((i / frames + lane * 0.5) % 1.0 * (width - block_w))
+                top = height // 4 + lane * height // 3
+                y[top:top + block_h, x:x + block_w] = 235 - lane * 60
+            frame[width * height:] = 128  # Neutral chroma
+            self._frames.append(frame)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self._frames[index % len(self._frames)]
+
+
+class YuvClip:
+    """Raw I420 file read frame by frame through a memory map"""
+
+    def __init__(self, path: str, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 3 // 2
+        count = os.path.getsize(path) // self.frame_size
+        if count == 0:
+            raise ValueError(f"{path} holds no complete {width}x{height} I420 frame")
+        self._frames = np.memmap(path, dtype=np.uint8, mode="r", shape=(count, self.frame_size))
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self._frames[index % len(self._frames)]
+
+
+class _FifoSignal:
+    """Producer end of the PipeNotifier FIFO; silent until a reader has opened it"""
+
+    def __init__(self, port: int, directory: str = "/tmp"):
+        self.path = os.path.join(directory, f"ChannelFrame_{port}.fifo")
+        self._fd = -1
+
+    def signal(self):
+        if self._fd < 0:
+            try:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENXIO):  # No FIFO / no reader yet
+                    print(f"[FrameProducer] {self.path}: {e}")
+                return
+        try:
+            os.write(self._fd, b"\x01")
+        except BlockingIOError:
+            pass  # Pipe full, the reader is already due to wake up
+        except OSError:
+            os.close(self._fd)  # Reader went away
+            self._fd = -1
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class FrameProducer:
+    """Writes frames of one clip into one ChannelFrame_<port> region.
+
+    slots=1 is the MMF_Data layout; more slots use the ring layout, which
+    only readers that negotiate it understand.
+    """
+
+    def __init__(self, port: int, clip, fps: float = 15.0, notify: bool = True, slots: int = 1):
+        if not 1 <= slots <= RING_MAX_SLOTS:
+            raise ValueError(f"slots must be between 1 and {RING_MAX_SLOTS}")
+        if slots == 1 and clip.frame_size > MAX_IMAGE_SIZE:
+            raise ValueError(f"{clip.width}x{clip.height} does not fit the {MAX_IMAGE_SIZE} byte image buffer")
+        self.port = port
+        self.clip = clip
+        self.fps = fps
+        self.slots = slots
+        self.produced = 0
+        self.dropped = 0  # Frames due while the reader still held the previous one (every slot)
+        self._sequence = 0
+        self._next_slot = 0
+        if slots == 1:
+            self._map = open_shared_memory(f"ChannelFrame_{port}")
+            struct.pack_into("<Q", self._map, 0, MMF_DATA_HEADER)
+            struct.pack_into("<Q", self._map, MMF_DATA_SIZE - 8, MMF_DATA_FOOTER)
+            self._slot_offsets = [0]
+            self._images = [np.frombuffer(self._map, dtype=np.uint8, count=clip.frame_size,
+                                          offset=MMF_IMAGE_OFFSET)]
+        else:
+            self._open_ring(clip.frame_size)
+        self._signal = _FifoSignal(port) if notify and sys.platform != "win32" else None
+        self._index = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open_ring(self, capacity: int):
+        size = ring_region_size(self.slots, capacity)
+        # Never smaller than MMF_Data so readers can map that size before negotiating
+        self._map = open_shared_memory(f"ChannelFrame_{self.port}", max(size, MMF_DATA_SIZE))
+        struct.pack_into("<Q", self._map, 0, MMF_RING_INIT)  # Readers ignore the region while it is laid out
+        self._capacity = capacity
+        self._slot_offsets = [ring_slot_offset(i, capacity) for i in range(self.slots)]
+        self._images = []
+        for offset in self._slot_offsets:
+            struct.pack_into("<Qi", self._map, offset, 0, 0)
+            self._images.append(np.frombuffer(self._map, dtype=np.uint8, count=capacity,
+                                              offset=offset + RING_SLOT_HEADER_SIZE))
+        self._write_ring_header()
+
+    def _write_ring_header(self):
+        struct.pack_into("<IIIIQ", self._map, 8, MMF_RING_VERSION, self.slots, self._capacity, 0, self.dropped)
+        struct.pack_into("<Q", self._map, ring_region_size(self.slots, self._capacity) - 8, MMF_DATA_FOOTER)
+        struct.pack_into("<Q", self._map, 0, MMF_RING_HEADER)  # Magic last: the ring is ready
+
+    def _check_ring_header(self):
+        """Restore the ring header if a reader that does not know the ring reset it to MMF_Data"""
+        if struct.unpack_from("<Q", self._map, 0)[0] != MMF_RING_HEADER:
+            print(f"[FrameProducer] ChannelFrame_{self.port} header was overwritten, restoring the ring")
+            self._write_ring_header()
+
+    def _free_slot(self) -> int:
+        """Next slot the reader does not hold, round robin; -1 if every slot is waiting"""
+        for step in range(self.slots):
+            slot = (self._next_slot + step) % self.slots
+            if struct.unpack_from("<i", self._map, self._slot_offsets[slot] + 8)[0] != 1:
+                return slot
+        return -1
+
+    def publish(self) -> bool:
+        """Write the next clip frame; False if the reader still holds every slot"""
+        if self.slots > 1:
+            self._check_ring_header()
+        slot = self._free_slot()
+        if slot < 0:
+            self.dropped += 1
+            if self.slots > 1:
+                struct.pack_into("<Q", self._map, 24, self.dropped)  # Ring header producer_dropped
+            return False
+        offset = self._slot_offsets[slot]
+        self._images[slot][:self.clip.frame_size] = self.clip[self._index]
+        self._index += 1
+        self._sequence += 1
+        timestamp = int(time.time() * 1000)  # Milliseconds since the epoch
+        struct.pack_into("<IIIQ", self._map, offset + 12,
+                         self.clip.width, self.clip.height, self.clip.frame_size, timestamp)
+        if self.slots > 1:
+            struct.pack_into("<Q", self._map, offset, self._sequence)
+        struct.pack_into("<i", self._map, offset + 8, 1)  # Status last: the frame is complete
+        self._next_slot = (slot + 1) % self.slots
+        self.produced += 1
+        if self._signal is not None:
+            self._signal.signal()
+        return True
+
+    def run(self, seconds: float = None):
+        """Publish at self.fps until stop() or for seconds"""
+        start = time.perf_counter()
+        due = start
+        while not self._stop.is_set() and (seconds is None or due - start < seconds):
+            self.publish()
+            due += 1.0 / self.fps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                due = time.perf_counter()  # Fell behind: do not burst to catch up
+
+    def start(self) -> "FrameProducer":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name=f"FrameProducer-{self.port}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._images = []  # Release the buffer exports before closing the map
+        if self._signal is not None:
+            self._signal.close()
+        self._map.close()
+
+
+def open_clip(path: Optional[str], width: int, height: int):
+    return YuvClip(path, width, height) if path else SyntheticClip(width, height)
+
+
+def start_producers(ports: Sequence[int], clip, fps: float, notify: bool = True,
+                    slots: int = 1) -> List[FrameProducer]:
+    """One producer thread per channel, all replaying the same clip"""
+    return [FrameProducer(port, clip, fps, notify, slots).start() for port in ports]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ports", type=int, nargs="+", default=[51000])
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--clip", help="raw I420 clip to replay in a loop (default: synthetic scene)")
+    parser.add_argument("--seconds", type=float, help="stop after this long (default: until Ctrl+C)")
+    parser.add_argument("--no-notify", action="store_true", help="do not signal the reader's FIFO")
+    parser.add_argument("--slots", type=int, default=1, help="ring slots per channel (1 = MMF_Data layout)")
+    args = parser.parse_args()
+
+    clip = open_clip(args.clip, args.width, args.height)
+    producers = start_producers(args.ports, clip, args.fps, not args.no_notify, args.slots)
+    print(f"Producing {args.width}x{args.height} at {args.fps:g} fps on {len(producers)} channel(s), "
+          f"{len(clip)} frame clip, {args.slots} slot(s)")
+    start = time.monotonic()
+    try:
+        while args.seconds is None or time.monotonic() - start < args.seconds:
+            time.sleep(min(5.0, args.seconds or 5.0))
+            print("  " + ", ".join(f"{p.port}: {p.produced} sent / {p.dropped} dropped" for p in producers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for producer in producers:
+            producer.close()
+
+
+if __name__ == "__main__":
+    main()
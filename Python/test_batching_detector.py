@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for the BatchingDetector inference scheduler.
+"""
+import sys
+import os
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from detectors import BaseDetector, BatchingDetector
+
+
+class _FakeBatchDetector(BaseDetector):
+    """Answers each request with a box holding its channel number, taken from the frame"""
+
+    def __init__(self, fail: bool = False, delay: float = 0.0):
+        self.fail = fail
+        self.delay = delay
+        self.batch_sizes = []
+        self.single_calls = 0
+
+    def detect(self, yuv420_frame, width, height, roi_rects=None, confidence=None):
+        self.single_calls += 1
+        return [(yuv420_frame[0], 0, width, height)]
+
+    def detect_batch(self, requests):
+        self.batch_sizes.append(len(requests))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("inference failed")
+        return [[(frame[0], 0, width, height)] for frame, width, height, _, _ in requests]
+
+
+def _detect_concurrently(batcher, channels):
+    results, errors = {}, {}
+
+    def channel(number):
+        try:
+            results[number] = batcher.detect(bytes([number]), 4, 4)
+        except Exception as e:
+            errors[number] = e
+
+    threads = [threading.Thread(target=channel, args=(number,)) for number in channels]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    return results, errors
+
+
+def test_batches_by_size_and_routes_results():
+    fake = _FakeBatchDetector()
+    batcher = BatchingDetector(fake, max_batch_size=3, max_wait=2.0)
+    try:
+        results, errors = _detect_concurrently(batcher, range(6))
+    finally:
+        batcher.close()
+    assert fake.batch_sizes == [3, 3]  # Full batches dispatch long before max_wait
+    assert not errors
+    assert results == {number: [(number, 0, 4, 4)] for number in range(6)}
+    assert batcher.get_stats()["batches"] == 2
+
+
+def test_partial_batch_dispatches_after_max_wait():
+    fake = _FakeBatchDetector()
+    batcher = BatchingDetector(fake, max_batch_size=8, max_wait=0.05)
+    try:
+        start = time.perf_counter()
+        assert batcher.detect(bytes([5]), 4, 4) == [(5, 0, 4, 4)]
+        elapsed = time.perf_counter() - start
+    finally:
+        batcher.close()
+    assert fake.batch_sizes == [1]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_batch_error_reaches_every_waiter():
+    fake = _FakeBatchDetector(fail=True)
+    batcher = BatchingDetector(fake, max_batch_size=4, max_wait=2.0, expected_clients=4)
+    try:
+        results, errors = _detect_concurrently(batcher, range(4))
+    finally:
+        batcher.close()
+    assert not results and sorted(errors) == [0, 1, 2, 3]
+    assert all(str(error) == "inference failed" for error in errors.values())
+
+
+def test_close_never_strands_a_caller():
+    fake = _FakeBatchDetector(delay=0.001)  # Channels are still submitting when close() runs
+    batcher = BatchingDetector(fake, max_batch_size=4, max_wait=0.001)
+    answered = []
+
+    def channel(number):
+        for _ in range(50):
+            answered.append(batcher.detect(bytes([number]), 4, 4) == [(number, 0, 4, 4)])
+
+    threads = [threading.Thread(target=channel, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.01)
+    batcher.close()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(answered) == 400 and all(answered)
+    assert fake.single_calls > 0  # Calls after close() go straight to the wrapped detector
+
+
+if __name__ == "__main__":
+    test_batches_by_size_and_routes_results()
+    test_partial_batch_dispatches_after_max_wait()
+    test_batch_error_reaches_every_waiter()
+    test_close_never_strands_a_caller()
+    print("Batching detector tests completed successfully!")
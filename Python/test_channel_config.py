@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for parameter hot-reload: versioned SetParameters snapshots in
+the HTTP server and per-channel config swaps in the analytics engine.
+"""
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import AnalyticsChannel, AnalyticsEngine
+from data_structures import ROI, ROIGroup, SettingParameters
+from detectors import BaseDetector, convert_threshold_to_confidence
+from frame_notifier import PollingNotifier
+from http_server import SimpleHttpServer
+
+
+class RecordingDetector(BaseDetector):
+    """Reports one person and remembers the settings of every call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def detect(self, yuv420_frame, width, height, roi_rects=None, confidence=None):
+        self.calls.append((roi_rects, confidence))
+        return [(10, 10, 20, 40)]
+
+
+def parameters(threshold: int, x2: int) -> SettingParameters:
+    return SettingParameters(analytics_event_api_url="http://127.0.0.1:8080/api/events",
+                             image_width=640, image_height=480,
+                             rois=[ROIGroup(sensitivity=50, threshold=threshold,
+                                            rects=[ROI(0, 0), ROI(x2, 200)])])
+
+
+def test_wait_for_parameters_wakes_on_every_publish():
+    server = SimpleHttpServer(["http://127.0.0.1:0/"])
+
+    async def scenario():
+        waiter = asyncio.ensure_future(server.wait_for_parameters(0))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        # Published from another thread, like the SetParameters handler
+        await asyncio.get_running_loop().run_in_executor(None, server.publish_parameters, parameters(50, 100))
+        version, first = await asyncio.wait_for(waiter, 1.0)
+        assert version == 1 and first.rois[0].threshold == 50
+
+        server.publish_parameters(parameters(60, 100))
+        server.publish_parameters(parameters(70, 100))
+        # A waiter that fell behind gets the newest snapshot only
+        version, latest = await asyncio.wait_for(server.wait_for_parameters(version), 1.0)
+        assert version == 3 and latest.rois[0].threshold == 70
+
+    asyncio.run(scenario())
+    assert server.is_update_param()
+    assert server.get_parameters().rois[0].threshold == 70
+    assert not server.is_update_param()
+
+
+def test_channel_applies_new_config_on_next_frame():
+    detector = RecordingDetector()
+    engine = AnalyticsEngine(detector)
+    engine.register_callback(lambda *args: None)
+    channel = AnalyticsChannel(engine, 0, PollingNotifier())
+    lease = SimpleNamespace(width=640, height=480, size=640 * 480 * 3 // 2, timestamp=0)
+    frame = bytes(lease.size)
+    assert not channel.is_setting and channel.roi_rects == []
+
+    first = channel.apply_parameters(parameters(50, 100))
+    channel._process_frame(frame, lease, channel.config)
+    channel._process_frame(frame, lease, channel.config)
+    filter_stats = channel.event_filter.get_stats()
+
+    # An in-flight frame keeps the snapshot it started with
+    in_flight = channel.config
+    second = channel.apply_parameters(parameters(80, 300))
+    assert second.version > first.version and in_flight is first
+    channel._process_frame(frame, lease, channel.config)
+
+    assert detector.calls[0] == ([(0, 0, 100, 200)], convert_threshold_to_confidence(50, 50))
+    assert detector.calls[2] == ([(0, 0, 300, 200)], convert_threshold_to_confidence(80, 50))
+    assert channel.roi_rects == [(0, 0, 300, 200)] and channel.url.endswith("/api/events")
+    # The duplicate scene was suppressed under the first config; the new ROIs start fresh
+    assert filter_stats["passed"] == 1
+    assert channel.event_filter.get_stats()["passed"] == 2
+    engine.stop()
+
+
+if __name__ == "__main__":
+    test_wait_for_parameters_wakes_on_every_publish()
+    test_channel_applies_new_config_on_next_frame()
+    print("Channel config tests completed successfully!")
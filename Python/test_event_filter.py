@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for detection event suppression.
+"""
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from event_filter import EventSuppressor
+
+
+def test_still_person_reported_once_until_repeat():
+    suppressor = EventSuppressor(min_interval=1.0, repeat_interval=10.0, max_events_per_sec=0)
+    person = [(100, 100, 50, 120)]
+    jittered = [(102, 101, 50, 118)]
+
+    assert suppressor.should_emit(person, now=0.0) is True
+    assert suppressor.should_emit(jittered, now=0.1) is False
+    assert suppressor.should_emit(jittered, now=5.0) is False
+    assert suppressor.should_emit(jittered, now=10.5) is True  # Periodic repeat
+    assert suppressor.get_stats() == {"passed": 2, "suppressed_duplicate": 2, "suppressed_rate": 0}
+
+
+def test_scene_change_respects_min_interval_per_roi():
+    rois = [(0, 0, 300, 300), (400, 0, 700, 300)]
+    suppressor = EventSuppressor(min_interval=1.0, max_events_per_sec=0)
+    left = (100, 100, 50, 120)
+    right = (500, 100, 50, 120)
+
+    assert suppressor.should_emit([left], rois, now=0.0) is True
+    # Someone enters the second ROI: new scene there, no interval pending
+    assert suppressor.should_emit([left, right], rois, now=0.2) is True
+    # A second person in the first ROI, too soon after its last event
+    assert suppressor.should_emit([left, (200, 150, 40, 100), right], rois, now=0.5) is False
+    assert suppressor.should_emit([left, (200, 150, 40, 100), right], rois, now=1.1) is True
+
+
+def test_short_dropout_does_not_retrigger_and_rate_limit_applies():
+    suppressor = EventSuppressor(min_interval=0.0, clear_after=2.0, max_events_per_sec=1.0)
+    person = [(100, 100, 50, 120)]
+    assert suppressor.should_emit(person, now=0.0) is True
+    assert suppressor.should_emit([], now=0.5) is False
+    assert suppressor.should_emit(person, now=1.0) is False  # Missed one frame, same scene
+
+    # Every frame is a new scene, but the channel is capped at 1 event/s
+    emitted = sum(suppressor.should_emit([(10 * i, 0, 5, 5)], now=3.0 + i * 0.25) for i in range(8))
+    assert emitted == 2
+    assert suppressor.get_stats()["suppressed_rate"] == 6
+
+
+if __name__ == "__main__":
+    test_still_person_reported_once_until_repeat()
+    test_scene_change_respects_min_interval_per_roi()
+    test_short_dropout_does_not_retrigger_and_rate_limit_applies()
+    print("Event filter tests completed successfully!")
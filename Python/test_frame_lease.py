@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for zero-copy frame leases and the copying get_mmf()
+compatibility read.
+"""
+import sys
+import os
+import struct
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import analytics_engine
+from analytics_engine import AnalyticsChannel, AnalyticsEngine, FrameLease, SharedFrameSource, get_mmf, shared_memory_path
+from detectors import MockDetector
+from frame_notifier import PollingNotifier
+from shm_producer import FrameProducer, SyntheticClip
+
+PORT = 59876
+
+
+def _status(producer: FrameProducer) -> int:
+    return struct.unpack_from("<i", producer._map, 8)[0]
+
+
+def _cleanup():
+    if sys.platform != "win32":
+        os.remove(shared_memory_path(f"ChannelFrame_{PORT}"))
+
+
+def test_lease_holds_the_slot_until_release():
+    clip = SyntheticClip(64, 48, frames=4)
+    producer = FrameProducer(PORT, clip, notify=False)
+    source = SharedFrameSource(PORT)
+    try:
+        assert producer.publish()
+        lease = source.acquire()
+        assert isinstance(lease, FrameLease)
+        assert _status(producer) == 1  # Still the reader's while the lease is held
+        assert not producer.publish()
+
+        # The view is the mapped region itself, not a copy
+        producer._images[0][0] ^= 0xFF
+        assert lease.data[0] == producer._images[0][0]
+        lease.release()
+        assert _status(producer) == 2
+        try:
+            lease.data
+            assert False, "view still usable after release()"
+        except ValueError:
+            pass
+        lease.release()  # Idempotent
+        assert source.acquire() is None
+    finally:
+        source.close()
+        producer.close()
+        _cleanup()
+
+
+def test_get_mmf_returns_one_owned_copy():
+    clip = SyntheticClip(64, 48, frames=4)
+    producer = FrameProducer(PORT, clip, notify=False)
+    engine = AnalyticsEngine(MockDetector())
+    # Channel without its reader thread, so only get_mmf() reads the region
+    engine._channels[PORT] = AnalyticsChannel(engine, PORT, PollingNotifier())
+    analytics_engine.g_engine, analytics_engine.g_portnum = engine, PORT
+    holders = [[], [], [], [], []]
+    try:
+        assert get_mmf(*holders) == 0  # Nothing published yet
+        assert producer.publish()
+        assert get_mmf(*holders) == 1
+        frame, width, height, size, _ = (holder[0] for holder in holders)
+        assert type(frame) is bytes and frame == clip[0].tobytes()
+        assert (width, height, size) == (64, 48, clip.frame_size)
+        assert _status(producer) == 2  # Handed back before get_mmf returned
+
+        assert producer.publish()
+        assert frame == clip[0].tobytes()  # The copy does not follow the shared memory
+    finally:
+        analytics_engine.g_engine = None
+        engine.stop()
+        producer.close()
+        _cleanup()
+    assert get_mmf(*holders) == -1  # No engine
+
+
+if __name__ == "__main__":
+    test_lease_holds_the_slot_until_release()
+    test_get_mmf_returns_one_owned_copy()
+    print("Frame lease tests completed successfully!")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for the frame notification backends.
+"""
+import sys
+import os
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from frame_notifier import AdaptiveBackoff, EventFdNotifier, PollingNotifier, get_default_notifier
+
+
+def test_backoff_grows_and_resets():
+    """Idle polls back off up to max_interval, a frame resets the interval."""
+    backoff = AdaptiveBackoff(min_interval=0.001, max_interval=0.008)
+    for _ in range(10):
+        backoff.on_poll(False)
+    assert backoff.next_timeout() == 0.008
+
+    backoff.on_poll(True)
+    assert backoff.next_timeout() == 0.001
+
+
+def test_signal_wakes_waiter():
+    """A signalled backend wakes the reader well before the backoff expires."""
+    notifier = EventFdNotifier(AdaptiveBackoff(min_interval=1.0, max_interval=1.0))
+    try:
+        timer = threading.Timer(0.01, notifier.signal)
+        start = time.monotonic()
+        timer.start()
+        assert notifier.wait() is True
+        assert time.monotonic() - start < 0.5
+    finally:
+        notifier.close()
+
+
+def test_polling_pickup_latency_at_fixed_cadence():
+    """Once the cadence is known, frames are picked up well under 1 ms after they land."""
+    period, frames = 0.02, 40
+    notifier = PollingNotifier()
+    published = []  # Publish time of the frame waiting in the "shared memory"
+    done = threading.Event()
+    latencies = []
+
+    def producer():
+        next_frame = time.perf_counter()
+        for _ in range(frames):
+            next_frame += period
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+            published.append(time.perf_counter())
+        done.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    while not done.is_set() or published:
+        got_frame = bool(published)
+        if got_frame:
+            latencies.append(time.perf_counter() - published.pop())
+        notifier.on_poll(got_frame)
+        if not got_frame:
+            notifier.wait()
+    thread.join()
+
+    # Skip the frames spent learning the cadence
+    latencies = sorted(latencies[5:])
+    assert len(latencies) >= frames - 10
+    assert latencies[len(latencies) // 2] < 0.001, f"median pickup {latencies[len(latencies) // 2] * 1000:.2f} ms"
+
+
+def test_unsignalled_frame_drops_back_to_polling():
+    """A frame found after a timed-out wait means the producer stopped signalling."""
+    notifier = EventFdNotifier(AdaptiveBackoff(min_interval=0.001, max_interval=0.001))
+    notifier.signalled_timeout = 0.01
+    try:
+        notifier.signal()
+        assert notifier.wait() is True
+        notifier.on_poll(True)
+        assert notifier.wait() is False  # Producer went quiet, safety-net timeout
+        assert notifier._producer_signals
+        notifier.on_poll(True)  # ... but its frames keep coming
+        assert not notifier._producer_signals
+
+        start = time.monotonic()
+        assert notifier.wait() is False
+        assert time.monotonic() - start < notifier.signalled_timeout
+    finally:
+        notifier.close()
+
+
+def test_unknown_backend_falls_back_to_polling():
+    notifier = get_default_notifier(51000, "nonexistent")
+    assert isinstance(notifier, PollingNotifier)
+    assert notifier.wait() is False
+
+
+if __name__ == "__main__":
+    test_backoff_grows_and_resets()
+    test_signal_wakes_waiter()
+    test_polling_pickup_latency_at_fixed_cadence()
+    test_unsignalled_frame_drops_back_to_polling()
+    test_unknown_backend_falls_back_to_polling()
+    print("Frame notifier tests completed successfully!")
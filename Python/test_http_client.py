@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Test script for the keep-alive HTTP client.
+"""
+import sys
+import os
+import asyncio
+import base64
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_structures import AnalyticsResult
+from http_client import EventSpool, HttpRequestQueue, SimpleHttpClient
+from mock_receiver import MockReceiver
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _RejectingHandler(_KeepAliveHandler):
+    """Answers 400 for events with timestamp 13, 200 for the rest"""
+    received = []
+
+    def do_POST(self):
+        event = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        status = 400 if event["timestamp"] == 13 else 200
+        if status == 200:
+            self.received.append(event["timestamp"])
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def _serve(handler=_KeepAliveHandler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/event"
+
+
+def test_connection_is_reused():
+    server, url = _serve()
+    client = SimpleHttpClient(pool_size=2)
+    try:
+        for _ in range(5):
+            assert client.post_analytics_result_sync(url, AnalyticsResult(keyframe=b"QUJD")) == ""
+        stats = client.pool.get_stats()
+        assert stats["created"] == 1
+        assert stats["reused"] == 4
+    finally:
+        client.pool.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_stale_connection_reconnects():
+    """A pooled socket closed by the server is replaced transparently."""
+    server, url = _serve()
+    client = SimpleHttpClient()
+    try:
+        client.post_analytics_result_sync(url, AnalyticsResult())
+        # Close the server side of every idle connection
+        for connections in client.pool._idle.values():
+            for conn, _ in connections:
+                conn.sock.shutdown(2)
+        client.post_analytics_result_sync(url, AnalyticsResult())
+        assert client.pool.get_stats()["created"] == 2
+    finally:
+        client.pool.close()
+        server.shutdown()
+        server.server_close()
+
+
+class _FakeClient:
+    """Stand-in client: URLs containing "slow" never answer"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def post_analytics_result_async(self, url, result):
+        if "slow" in url:
+            await asyncio.sleep(3600)
+        self.sent.append((url, result.port_num, result.timestamp))
+        return "ok"
+
+    async def close(self):
+        pass
+
+
+def test_queue_coalesces_per_channel():
+    async def run():
+        client = _FakeClient()
+        queue = HttpRequestQueue(client, workers=1, max_queue=2, overflow=HttpRequestQueue.COALESCE)
+        await queue.start()  # Workers only run once the test sleeps
+        await queue.enqueue("http://a/", AnalyticsResult(port_num=2, timestamp=9))
+        for timestamp in range(5):
+            await queue.enqueue("http://a/", AnalyticsResult(port_num=1, timestamp=timestamp))
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return client.sent, queue.get_stats()
+
+    sent, stats = asyncio.run(run())
+    assert sent == [("http://a/", 2, 9), ("http://a/", 1, 4)]
+    assert stats["coalesced"] == 4
+    assert stats["sent"] == 2
+
+
+def test_slow_url_does_not_block_others():
+    async def run():
+        client = _FakeClient()
+        queue = HttpRequestQueue(client, workers=4, per_url_limit=1)
+        await queue.start()
+        for _ in range(3):
+            await queue.enqueue("http://slow/", AnalyticsResult())
+        await queue.enqueue("http://fast/", AnalyticsResult(port_num=7))
+        await asyncio.sleep(0.05)
+        stats = queue.get_stats()
+        await queue.stop()
+        return client.sent, stats
+
+    sent, stats = asyncio.run(run())
+    assert sent == [("http://fast/", 7, 0)]
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 2
+
+
+def test_spool_survives_restart():
+    """Spooled events replay in order after reopening; raw JPEG round-trips to base64."""
+    with tempfile.TemporaryDirectory() as directory:
+        spool = EventSpool(directory, segment_bytes=64)
+        for timestamp in range(3):
+            spool.append("http://a/", AnalyticsResult(port_num=1, keyframe="/9j/4A==", timestamp=timestamp))
+        token, _, first = spool.peek()
+        spool.ack(token)
+        spool.close()
+
+        # Torn tail from a crash mid-write
+        with open(os.path.join(directory, "spool-00000002.seg"), "ab") as f:
+            f.write(b"EVT1\x05")
+
+        spool = EventSpool(directory)
+        replayed = []
+        item = spool.peek()
+        while item is not None:
+            token, url, result = item
+            replayed.append((url, result.timestamp, result.keyframe))
+            spool.ack(token)
+            item = spool.peek()
+        spool.close()
+
+    assert first.timestamp == 0
+    assert replayed == [("http://a/", 1, b"/9j/4A=="), ("http://a/", 2, b"/9j/4A==")]
+
+
+def test_rejected_events_do_not_block_the_spool():
+    """A 400 is neither spooled live nor retried forever on replay."""
+    server, url = _serve(_RejectingHandler)
+    _RejectingHandler.received = []
+
+    async def run(directory):
+        spool = EventSpool(directory)
+        for timestamp in (13, 1, 2):  # The oldest spooled event is the one the receiver refuses
+            spool.append(url, AnalyticsResult(port_num=1, keyframe="/9j/4A==", timestamp=timestamp))
+        queue = HttpRequestQueue(SimpleHttpClient(), workers=1, spool=spool, replay_rate=0,
+                                 replay_backoff=(0.01, 0.01))
+        await queue.start()
+        await queue.enqueue(url, AnalyticsResult(port_num=1, timestamp=13))
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if len(_RejectingHandler.received) == 2:
+                break
+        stats = queue.get_stats()
+        await queue.stop()
+        return stats
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            stats = asyncio.run(run(directory))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert _RejectingHandler.received == [1, 2]
+    assert stats["rejected"] == 1 and stats["spool_spooled"] == 3  # The live 400 was not spooled
+    assert stats["spool_discarded"] == 1 and stats["spool_replayed"] == 2
+
+
+def test_batches_reach_receiver_in_every_layout():
+    """JSON/multipart, plain/gzip/deflate batches decode to the same events."""
+    jpeg = b"\xff\xd8\xff\xe0" + bytes(range(64))
+    keyframe = base64.b64encode(jpeg)
+    receiver = MockReceiver().start()
+    client = SimpleHttpClient()
+    try:
+        layouts = [(None, False), ("gzip", False), ("deflate", True), (None, True)]
+        for compression, multipart in layouts:
+            results = [AnalyticsResult(port_num=port, keyframe=keyframe, timestamp=5, rois_rects=[[{"x": 1, "y": 1}]])
+                       for port in (1, 2, 3)]
+            client.post_analytics_batch_sync(receiver.url, results, compression, multipart)
+        stats = receiver.stats.snapshot()
+    finally:
+        client.pool.close()
+        receiver.stop()
+
+    assert stats["requests"] == 4
+    assert stats["events"] == 12
+    assert stats["bad_requests"] == 0
+    assert stats["keyframe_bytes"] == 12 * len(jpeg)
+    assert stats["per_channel"] == {1: 4, 2: 4, 3: 4}
+
+
+def test_queue_sends_batches():
+    async def run():
+        receiver = MockReceiver().start()
+        queue = HttpRequestQueue(SimpleHttpClient(), workers=1, batch_size=4, batch_wait=0.2)
+        await queue.start()
+        for timestamp in range(8):
+            await queue.enqueue(receiver.url, AnalyticsResult(port_num=timestamp % 2, timestamp=timestamp))
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if queue.get_stats()["sent"] == 8:
+                break
+        stats = queue.get_stats()
+        await queue.stop()
+        receiver.stop()
+        return stats, receiver.stats.snapshot()
+
+    stats, received = asyncio.run(run())
+    assert stats["sent"] == 8
+    assert stats["batches"] == 2
+    assert received["requests"] == 2
+    assert received["events"] == 8
+
+
+def test_batching_worker_does_not_swallow_wakeups():
+    """An event for another URL is picked up at once while a worker collects a batch."""
+    async def run():
+        client = _FakeClient()
+        queue = HttpRequestQueue(client, workers=2, per_url_limit=1, batch_size=8, batch_wait=0.5)
+        await queue.start()
+        await asyncio.sleep(0)
+        await queue.enqueue("http://a/", AnalyticsResult(port_num=1))
+        await asyncio.sleep(0.01)  # First worker is collecting a batch for a
+        await queue.enqueue("http://a/", AnalyticsResult(port_num=1, timestamp=1))
+        await asyncio.sleep(0.01)
+        await queue.enqueue("http://b/", AnalyticsResult(port_num=2))
+        await asyncio.sleep(0.05)  # Well inside a's batch window
+        stats = queue.get_stats()
+        await queue.stop()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["queue_depth"] == 0  # The idle worker took b's event
+    assert stats["in_flight"] == 2
+
+
+if __name__ == "__main__":
+    test_connection_is_reused()
+    test_stale_connection_reconnects()
+    test_queue_coalesces_per_channel()
+    test_slow_url_does_not_block_others()
+    test_spool_survives_restart()
+    test_rejected_events_do_not_block_the_spool()
+    test_batches_reach_receiver_in_every_layout()
+    test_queue_sends_batches()
+    test_batching_worker_does_not_swallow_wakeups()
+    print("HTTP client tests completed successfully!")
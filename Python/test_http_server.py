@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the control server: keep-alive, size limits and /Alive
+while a slow /SetParameters body is still arriving.
+"""
+import sys
+import os
+import http.client
+import json
+import socket
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_http_server import parameters_body, serve_in_thread
+
+
+def test_keep_alive_and_routes():
+    for mode in ("asyncio", "threaded"):
+        server = serve_in_thread(mode)
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+            connection.request("POST", "/SetParameters", parameters_body(2),
+                               {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            assert response.status == 200
+            assert json.loads(response.read()) == {"message": "Parameters set successfully"}
+            sock = connection.sock
+            connection.request("GET", "/Alive")
+            response = connection.getresponse()
+            assert response.status == 200 and response.read() == b""
+            connection.request("GET", "/Missing")
+            response = connection.getresponse()
+            assert response.status == 404 and response.read() == b"Not Found"
+            assert connection.sock is sock  # All three requests on one connection
+            connection.close()
+
+            assert server.is_update_param()
+            parameters = server.get_parameters()
+            assert len(parameters.rois) == 2 and parameters.image_width == 1920
+            assert not server.is_update_param()
+        finally:
+            server.stop()
+
+
+def test_request_limits():
+    server = serve_in_thread("asyncio", max_body_bytes=1000, max_header_bytes=512)
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("POST", "/SetParameters", b"x" * 1001)
+        assert connection.getresponse().status == 413
+        connection.close()
+
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("GET", "/Alive", headers={"X-Padding": "x" * 1000})
+        assert connection.getresponse().status == 431
+        connection.close()
+
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("POST", "/SetParameters", b"{not json")
+        assert connection.getresponse().status == 400
+        connection.close()
+    finally:
+        server.stop()
+
+
+def test_alive_during_slow_body():
+    server = serve_in_thread("asyncio")
+    try:
+        body = parameters_body(10)
+        slow = socket.create_connection(("127.0.0.1", server.port), timeout=5)
+        slow.sendall(f"POST /SetParameters HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("ascii")
+                     + body[:100])
+
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        start = time.perf_counter()
+        connection.request("GET", "/Alive")
+        assert connection.getresponse().status == 200
+        assert time.perf_counter() - start < 0.5
+        connection.close()
+
+        slow.sendall(body[100:])
+        assert slow.recv(4096).startswith(b"HTTP/1.1 200")
+        slow.close()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_keep_alive_and_routes()
+    test_request_limits()
+    test_alive_during_slow_body()
+    print("HTTP server tests completed successfully!")
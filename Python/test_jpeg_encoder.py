@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the fast JPEG keyframe path.
+"""
+import sys
+import os
+import base64
+import io
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_structures import AnalyticsResult
+from http_client import SimpleHttpClient
+from image_processor import FastJpegEncoder, JpegEncoderPool
+from yuv_converter import yuv420_to_rgb
+
+
+def test_fast_yuv_path_matches_rgb_conversion():
+    """Encoding from the YUV planes decodes close to the RGB conversion."""
+    width, height = 64, 48
+    y = np.repeat(np.linspace(16, 235, width, dtype=np.uint8)[None, :], height, axis=0)
+    u = np.repeat(np.linspace(90, 170, width // 2, dtype=np.uint8)[None, :], height // 2, axis=0)
+    v = np.repeat(np.linspace(170, 90, height // 2, dtype=np.uint8)[:, None], width // 2, axis=1)
+    frame = y.tobytes() + u.tobytes() + v.tobytes()
+
+    encoder = FastJpegEncoder()
+    payload = encoder.encode_base64(95, None, frame, width, height)
+    assert isinstance(payload, bytes)
+    # The per-thread buffer is reused (and resized) by the next encode
+    assert encoder.encode_base64(95, [(2, 2, 40, 30)], frame, width, height) != payload
+    assert encoder.encode_base64(95, None, frame, width, height) == payload
+
+    decoded = np.asarray(Image.open(io.BytesIO(base64.b64decode(payload))).convert('RGB'), dtype=np.int16)
+    expected = yuv420_to_rgb(frame, width, height).astype(np.int16)
+    assert np.abs(decoded - expected).mean() < 4
+
+
+def test_bytes_keyframe_is_spliced_into_json():
+    result = AnalyticsResult(port_num=51000, keyframe=b"QUJD", timestamp=7, rois_rects=[[{"x": 1, "y": 2}]])
+    body = json.loads(SimpleHttpClient()._encode_analytics_result(result))
+    assert body["keyframe"] == "QUJD"
+    assert body["timestamp"] == 7
+    assert body["rois_rects"] == [[{"x": 1, "y": 2}]]
+
+
+class _SlowEncoder:
+    """Stands in for FastJpegEncoder: 20 ms per keyframe"""
+
+    def encode_base64(self, quality, detections, yuv, width, height, rgb):
+        time.sleep(0.02)
+        return b"QUJD"
+
+
+class _SlowFrame:
+    """Frame whose snapshot copy takes a while, widening the window between check and enqueue"""
+
+    def __bytes__(self):
+        time.sleep(0.005)
+        return b"\x80" * 24
+
+
+class _DepthDeque(deque):
+    """Queue that remembers the deepest it has been"""
+    peak = 0
+
+    def append(self, item):
+        super().append(item)
+        self.peak = max(self.peak, len(self))
+
+
+def _drive_pool(policy: str):
+    pool = JpegEncoderPool(workers=1, max_queue=2, drop_policy=policy)
+    pool.fast_encoder = _SlowEncoder()
+    pool._queue = _DepthDeque()
+    done = []
+
+    def submitter():
+        for _ in range(5):
+            pool.submit(_SlowFrame(), 4, 4, 50, [], done.append)
+
+    threads = [threading.Thread(target=submitter) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    return pool, done
+
+
+def test_concurrent_submitters_respect_max_queue():
+    """Six channel threads against one slow worker never queue more than max_queue keyframes."""
+    pool, done = _drive_pool(JpegEncoderPool.BLOCK)
+    stats = pool.get_stats()
+    assert pool._queue.peak <= 2
+    assert stats["submitted"] == stats["encoded"] == len(done) == 30 and stats["dropped"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["encode_p50_ms"] >= 15 and stats["queue_wait_p95_ms"] >= stats["queue_wait_p50_ms"] > 0
+
+    pool, done = _drive_pool(JpegEncoderPool.DROP_NEWEST)
+    stats = pool.get_stats()
+    assert pool._queue.peak <= 2
+    assert stats["dropped"] > 0 and stats["submitted"] + stats["dropped"] == 30
+    assert stats["encoded"] == len(done) == stats["submitted"]
+
+    pool, done = _drive_pool(JpegEncoderPool.DROP_OLDEST)
+    stats = pool.get_stats()
+    assert pool._queue.peak <= 2
+    assert stats["dropped"] > 0 and stats["submitted"] == 30
+    assert stats["encoded"] == len(done) == 30 - stats["dropped"]
+
+
+if __name__ == "__main__":
+    test_fast_yuv_path_matches_rgb_conversion()
+    test_bytes_keyframe_is_spliced_into_json()
+    test_concurrent_submitters_respect_max_queue()
+    print("JPEG encoder tests completed successfully!")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics registry and the /Metrics route.
+"""
+import sys
+import os
+import http.client
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_http_server import serve_in_thread
+from metrics import Histogram, MetricsRegistry, stage_histograms, thread_stages
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage time", (0.01, 0.1), stage="inference", channel=1)
+    assert registry.histogram("stage_seconds", "Stage time", stage="inference", channel="1") is histogram
+    for seconds in (0.005, 0.01, 0.05, 3.0):
+        histogram.observe(seconds)
+
+    text = registry.render()
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{channel="1",stage="inference",le="0.01"} 2' in text
+    assert 'stage_seconds_bucket{channel="1",stage="inference",le="0.1"} 3' in text
+    assert 'stage_seconds_bucket{channel="1",stage="inference",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{channel="1",stage="inference"} 4' in text
+    assert Histogram((1.0,)).counts == [0, 0]
+
+
+def test_counters_gauges_and_stats():
+    registry = MetricsRegistry()
+    registry.counter("frames_seen_total", "Frames", channel=7).inc(3)
+    registry.gauge("model_load_seconds", "Load time", detector="YOLO").set(1.5)
+    handle = registry.add_stats("events", "Event counters", lambda: {7: {"passed": 2, "mode": "x"}}, "channel")
+    registry.add_stats("queue", "Queue", lambda: {"queue_depth": 4})
+
+    text = registry.render()
+    assert 'frames_seen_total{channel="7"} 3' in text
+    assert 'model_load_seconds{detector="YOLO"} 1.5' in text
+    assert 'events_passed{channel="7"} 2' in text and "events_mode" not in text
+    assert "queue_queue_depth 4" in text
+    registry.remove_stats(handle)
+    assert "events_passed" not in registry.render()
+
+
+def test_metrics_route():
+    stage_histograms("route-test")["http_post"].observe(0.02)
+    assert thread_stages() is stage_histograms("shared")
+    server = serve_in_thread("asyncio")
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("GET", "/Metrics")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+        body = response.read().decode("utf-8")
+        assert 'analytics_stage_seconds_count{channel="route-test",stage="http_post"} 1' in body
+        connection.close()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_histogram_buckets_are_cumulative()
+    test_counters_gauges_and_stats()
+    test_metrics_route()
+    print("Metrics tests completed successfully!")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for motion-gated inference.
+"""
+import sys
+import os
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from detectors import BaseDetector
+from motion_gate import MotionGatedDetector
+
+WIDTH, HEIGHT = 320, 240
+
+
+class CountingDetector(BaseDetector):
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result or []
+
+    def detect(self, yuv420_frame, width, height, roi_rects=None, confidence=None):
+        self.calls += 1
+        return list(self.result)
+
+
+def frame_with_square(x=None, y=None):
+    luma = np.full((HEIGHT, WIDTH), 90, dtype=np.uint8)
+    if x is not None:
+        luma[y:y + 40, x:x + 40] = 230
+    return luma.tobytes() + np.full(WIDTH * HEIGHT // 2, 128, dtype=np.uint8).tobytes()
+
+
+def test_static_scene_skips_inference():
+    inner = CountingDetector()
+    gate = MotionGatedDetector(inner, max_skip=1000)
+    static = frame_with_square()
+    for _ in range(20):
+        assert gate.detect(static, WIDTH, HEIGHT) == []
+    assert inner.calls == 1  # Only the first frame, to seed the background
+    assert gate.get_stats()["skipped"] == 19
+
+    gate.detect(frame_with_square(100, 100), WIDTH, HEIGHT)
+    assert inner.calls == 2
+
+
+def test_motion_outside_roi_is_ignored_and_occupancy_keeps_detector_running():
+    inner = CountingDetector()
+    gate = MotionGatedDetector(inner, max_skip=1000)
+    roi = [(0, 0, 100, 100)]
+    gate.detect(frame_with_square(), WIDTH, HEIGHT, roi)
+    gate.detect(frame_with_square(250, 180), WIDTH, HEIGHT, roi)
+    assert inner.calls == 1
+
+    # Someone walks into the ROI and then stands still
+    inner.result = [(20, 20, 40, 40)]
+    for _ in range(5):
+        assert gate.detect(frame_with_square(20, 20), WIDTH, HEIGHT, roi) == [(20, 20, 40, 40)]
+    assert inner.calls == 6
+
+
+if __name__ == "__main__":
+    test_static_scene_skips_inference()
+    test_motion_outside_roi_is_ignored_and_occupancy_keeps_detector_running()
+    print("Motion gate tests completed successfully!")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for several channels in one process: the compatibility API
+main.py uses for ports=, one shared (batched) detector and per-channel
+ROI/confidence settings and results.
+"""
+import sys
+import os
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import analytics_engine
+from analytics_engine import (Deinitialize, Initialize, SettingParameters, add_channel, registerCallback,
+                              set_detector, shared_memory_path)
+from data_structures import ROI, ROIGroup, SettingParameters as Parameters
+from detectors import BaseDetector, BatchingDetector, convert_threshold_to_confidence
+from shm_producer import FrameProducer, SyntheticClip
+
+PORTS = (59874, 59875)
+
+
+class RoiEchoDetector(BaseDetector):
+    """Reports one box at the corner of the first ROI and remembers every call's settings"""
+
+    def __init__(self):
+        self.calls = []
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def detect(self, yuv420_frame, width, height, roi_rects=None, confidence=None):
+        with self._lock:
+            self.calls.append((tuple(roi_rects or ()), confidence))
+        x, y = roi_rects[0][:2] if roi_rects else (0, 0)
+        return [(x, y, 4, 4)]
+
+    def detect_batch(self, requests):
+        with self._lock:
+            self.batch_sizes.append(len(requests))
+        return super().detect_batch(requests)
+
+
+def parameters(threshold: int, x1: int) -> Parameters:
+    return Parameters(analytics_event_api_url="http://127.0.0.1:8080/api/events",
+                      image_width=64, image_height=48,
+                      rois=[ROIGroup(sensitivity=50, threshold=threshold, rects=[ROI(x1, 8), ROI(x1 + 20, 40)])])
+
+
+def test_channels_share_one_detector_with_their_own_settings():
+    clip = SyntheticClip(64, 48, frames=4)
+    producers = [FrameProducer(port, clip, notify=False) for port in PORTS]
+    detector = RoiEchoDetector()
+    events = {}
+    try:
+        Initialize(PORTS[0], "poll", batch_size=2, batch_wait=0.05)
+        add_channel(PORTS[1], "poll")
+        set_detector(detector)
+        registerCallback(lambda port, w, h, frame, size, ts, rois, rows, cols, detections:
+                         events.setdefault(port, detections))
+        SettingParameters(parameters(20, 2), PORTS[0])
+        SettingParameters(parameters(90, 30), PORTS[1])
+
+        engine = analytics_engine.g_engine
+        assert sorted(engine.channels) == list(PORTS)
+        assert isinstance(engine.detector, BatchingDetector) and engine.detector.detector is detector
+
+        for _ in range(100):
+            for producer in producers:
+                producer.publish()
+            if len(events) == 2:
+                break
+            time.sleep(0.02)
+    finally:
+        Deinitialize()
+        for producer in producers:
+            producer.close()
+            if sys.platform != "win32":
+                os.remove(shared_memory_path(f"ChannelFrame_{producer.port}"))
+
+    # Each channel got the box of its own ROI back
+    assert events == {PORTS[0]: [(2, 8, 4, 4)], PORTS[1]: [(30, 8, 4, 4)]}
+    # One model saw both channels' settings, some frames in the same batch
+    assert (((2, 8, 22, 40),), convert_threshold_to_confidence(20, 50)) in detector.calls
+    assert (((30, 8, 50, 40),), convert_threshold_to_confidence(90, 50)) in detector.calls
+    assert max(detector.batch_sizes) == 2
+
+
+if __name__ == "__main__":
+    test_channels_share_one_detector_with_their_own_settings()
+    print("Multi-channel tests completed successfully!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for detector output decoding, ONNX and Ultralytics (no model file needed).
+"""
+import sys
+import os
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from detectors import YOLOHumanDetector
+from onnx_detector import OnnxHumanDetector
+
+WIDTH, HEIGHT = 1280, 720
+
+
+class FixedBatchSession:
+    """Stands in for an ONNX session exported with batch size 1"""
+    fixed_batch = 1
+    input_size = 640
+
+    def __init__(self, prediction):
+        self.prediction = prediction
+        self.calls = 0
+
+    def run(self, batch):
+        assert batch.shape == (1, 3, 640, 640)
+        self.calls += 1
+        return self.prediction[None]
+
+
+def _prediction(boxes):
+    """(84, anchors) YOLOv8 output from (cx, cy, w, h, class, score) rows"""
+    prediction = np.zeros((84, len(boxes)), dtype=np.float32)
+    for anchor, (cx, cy, w, h, cls, score) in enumerate(boxes):
+        prediction[:4, anchor] = (cx, cy, w, h)
+        prediction[4 + cls, anchor] = score
+    return prediction
+
+
+def test_decode_filters_class_threshold_and_overlaps():
+    detector = OnnxHumanDetector(model_path="missing.onnx")
+    assert detector._model is None
+    prediction = _prediction([
+        (100, 200, 40, 100, 0, 0.9),
+        (102, 201, 40, 100, 0, 0.8),   # Duplicate of the first
+        (400, 300, 40, 100, 0, 0.2),   # Below threshold
+        (500, 300, 40, 100, 2, 0.95),  # A car
+    ])
+    scores = []
+    # 1280x720 letterboxed into 640: scale 0.5, 140 px padding on top and bottom
+    detections = detector._postprocess(prediction, None, 0.3, (0.5, 0, 140), WIDTH, HEIGHT, scores)
+    assert detections == [(160, 20, 80, 200)]
+    assert scores == [np.float32(0.9)]
+
+    # ROI filtering happens on frame coordinates
+    assert detector._postprocess(prediction, [(600, 0, 900, 300)], 0.3, (0.5, 0, 140), WIDTH, HEIGHT) == []
+
+
+def test_fixed_batch_graph_runs_frames_one_by_one():
+    detector = OnnxHumanDetector(model_path="missing.onnx")
+    detector._model = FixedBatchSession(_prediction([(320, 320, 64, 128, 0, 0.7)]))
+    frame = np.full(WIDTH * HEIGHT * 3 // 2, 128, dtype=np.uint8).tobytes()
+
+    results = detector.detect_batch([(frame, WIDTH, HEIGHT, None, None)] * 3)
+    assert detector._model.calls == 3
+    assert results == [[(576, 232, 128, 256)]] * 3
+
+
+class _Tensor:
+    """The .cpu().numpy() end of an Ultralytics Boxes tensor"""
+
+    def __init__(self, array):
+        self.array = np.asarray(array, dtype=np.float32).reshape(-1, 6)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def __len__(self):
+        return len(self.array)
+
+
+class _Results:
+    def __init__(self, rows):
+        self.boxes = _Tensor(rows)
+        self.boxes.data = self.boxes
+
+
+def test_ultralytics_postprocess_on_whole_arrays():
+    detector = YOLOHumanDetector.__new__(YOLOHumanDetector)
+    rows = [
+        (200, 240, 240, 340, 0.9, 0),   # Person
+        (300, 240, 340, 340, 0.2, 0),   # Below this frame's threshold
+        (400, 240, 480, 300, 0.95, 2),  # A car
+        (10, 150, 50, 250, 0.6, 0),     # Person outside the ROI
+    ]
+    scores = []
+    detections = detector._postprocess(_Results(rows), [(300, 0, 700, 720)], 0.3, (0.5, 0, 140),
+                                       WIDTH, HEIGHT, scores)
+    assert detections == [(400, 200, 80, 200)]
+    assert scores == [np.float32(0.9)]
+    assert detector._postprocess(_Results([]), None, 0.3) == []
+
+
+if __name__ == "__main__":
+    test_decode_filters_class_threshold_and_overlaps()
+    test_fixed_batch_graph_runs_frames_one_by_one()
+    test_ultralytics_postprocess_on_whole_arrays()
+    print("Detector decoding tests completed successfully!")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test script for the INT8 calibration helpers and the evaluation matching.
+"""
+import sys
+import os
+import tempfile
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_int8 import match_count
+from onnx_detector import OnnxHumanDetector, int8_path
+from quantize import load_frames, save_frame
+
+
+def test_int8_model_path():
+    assert int8_path("models/yolov8n.onnx") == "models/yolov8n.int8.onnx"
+    assert int8_path("yolov8n.int8.onnx") == "yolov8n.int8.onnx"
+    detector = OnnxHumanDetector("missing.onnx", int8=True)
+    assert detector.model_path == "missing.int8.onnx" and detector._model is None
+
+
+def test_captured_frames_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        save_frame(directory, 1, memoryview(b"\x02" * 24), 4, 4)
+        save_frame(directory, 0, b"\x01" * 96, 8, 8)
+        open(os.path.join(directory, "notes.txt"), "w").close()
+        assert load_frames(directory) == [(b"\x01" * 96, 8, 8), (b"\x02" * 24, 4, 4)]
+        assert len(load_frames(directory, limit=1)) == 1
+
+
+def test_match_count_is_one_to_one():
+    reference = [(100, 100, 50, 100), (300, 100, 50, 100)]
+    # Two candidates on the first person, one shifted too far from the second
+    candidate = [(102, 101, 50, 100), (98, 99, 50, 100), (340, 100, 50, 100)]
+    assert match_count(reference, candidate, 0.5) == 1
+    assert match_count(reference, [], 0.5) == 0
+
+
+if __name__ == "__main__":
+    test_int8_model_path()
+    test_captured_frames_round_trip()
+    test_match_count_is_one_to_one()
+    print("Quantization tests completed successfully!")
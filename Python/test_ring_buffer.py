@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the multi-slot shared-memory ring layout and its frame
+policies, and for falling back to the single-slot MMF_Data layout.
+"""
+import sys
+import os
+import struct
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import (MMF_DATA_FOOTER, MMF_DATA_HEADER, MMF_DATA_SIZE, MMF_RING_HEADER, MMF_RING_INIT,
+                              FrameLease, SharedFrameSource, shared_memory_path)
+from shm_producer import FrameProducer, SyntheticClip
+
+PORT = 59872
+
+
+def _cleanup():
+    if sys.platform != "win32":
+        os.remove(shared_memory_path(f"ChannelFrame_{PORT}"))
+
+
+def test_newest_policy_skips_stale_frames():
+    clip = SyntheticClip(64, 48, frames=8)
+    producer = FrameProducer(PORT, clip, notify=False, slots=4)
+    source = SharedFrameSource(PORT)
+    try:
+        assert source.acquire() is None
+        for _ in range(3):
+            assert producer.publish()
+        with source.acquire() as lease:
+            assert lease.sequence == 3 and lease.copy() == clip[2].tobytes()
+            # The reader holds one slot, the producer keeps filling the others
+            for _ in range(3):
+                assert producer.publish()
+            assert not producer.publish()
+        assert source.skipped == 2
+        with source.acquire() as lease:
+            assert lease.sequence == 6
+        assert source.get_stats() == {"slots": 4, "skipped": 4, "producer_dropped": 1}
+    finally:
+        source.close()
+        producer.close()
+        _cleanup()
+
+
+def test_every_policy_reads_in_order():
+    clip = SyntheticClip(64, 48, frames=8)
+    producer = FrameProducer(PORT, clip, notify=False, slots=3)
+    source = SharedFrameSource(PORT, "every")
+    try:
+        for _ in range(3):
+            assert producer.publish()
+        assert not producer.publish()
+        for sequence in (1, 2, 3):
+            with source.acquire() as lease:
+                assert isinstance(lease, FrameLease)
+                assert lease.sequence == sequence and lease.copy() == clip[sequence - 1].tobytes()
+        assert source.acquire() is None and source.skipped == 0
+        assert producer.publish()
+        with source.acquire("newest") as lease:  # Per-read override
+            assert lease.sequence == 4
+    finally:
+        source.close()
+        producer.close()
+        _cleanup()
+
+
+def test_single_slot_layout_still_negotiated():
+    clip = SyntheticClip(64, 48, frames=4)
+    source = SharedFrameSource(PORT)
+    ring = FrameProducer(PORT, clip, notify=False, slots=2)
+    try:
+        assert ring.publish()
+        with source.acquire() as lease:
+            assert lease.sequence == 1
+        ring.close()
+
+        # Same region, the producer is back on MMF_Data
+        legacy = FrameProducer(PORT, clip, notify=False)
+        assert legacy.publish() and not legacy.publish()
+        with source.acquire() as lease:
+            assert lease.sequence is None and lease.copy() == clip[0].tobytes()
+        assert source.get_stats()["slots"] == 1
+        legacy.close()
+    finally:
+        source.close()
+        ring.close()
+        _cleanup()
+
+
+def test_reader_reset_cannot_hide_the_ring():
+    """A reader polling while the ring is laid out must not leave it looking like MMF_Data."""
+    clip = SyntheticClip(64, 48, frames=4)
+    source = SharedFrameSource(PORT)
+    producer = FrameProducer(PORT, clip, notify=False, slots=2)
+    try:
+        # Producer mid-layout: the reader leaves the initializing header alone
+        struct.pack_into("<Q", producer._map, 0, MMF_RING_INIT)
+        assert source.acquire() is None
+        assert struct.unpack_from("<Q", producer._map, 0)[0] == MMF_RING_INIT
+        producer._write_ring_header()
+
+        # A reset that lands after the ring magic was stored (e.g. a reader
+        # without ring support) is undone by the producer's next frame
+        struct.pack_into("<Q", producer._map, 0, MMF_DATA_HEADER)
+        struct.pack_into("<Q", producer._map, MMF_DATA_SIZE - 8, MMF_DATA_FOOTER)
+        assert source.acquire() is None  # Ring version 2 reads as image_status 2
+        assert producer.publish()
+        assert struct.unpack_from("<Q", producer._map, 0)[0] == MMF_RING_HEADER
+        with source.acquire() as lease:
+            assert lease.sequence == 1 and lease.copy() == clip[0].tobytes()
+    finally:
+        source.close()
+        producer.close()
+        _cleanup()
+
+
+if __name__ == "__main__":
+    test_newest_policy_skips_stale_frames()
+    test_every_policy_reads_in_order()
+    test_single_slot_layout_still_negotiated()
+    test_reader_reset_cannot_hide_the_ring()
+    print("Ring buffer tests completed successfully!")
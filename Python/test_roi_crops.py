@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for ROI-cropped inference planning.
+"""
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from detectors import YUVLetterbox, nms_xywh, plan_roi_crops
+
+WIDTH, HEIGHT = 640, 480
+
+
+def _i420(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> bytes:
+    return y.tobytes() + u.tobytes() + v.tobytes()
+
+
+def test_plan_union_tiles_and_full_frame_fallback():
+    rois = [(101, 51, 201, 151), (401, 301, 301, 201)]  # Corners in any order
+    assert plan_roi_crops(rois, WIDTH, HEIGHT, "full") == [None]
+    assert plan_roi_crops(None, WIDTH, HEIGHT, "tiles") == [None]
+
+    union = plan_roi_crops(rois, WIDTH, HEIGHT, "union", margin=0.0)
+    assert union == [(100, 50, 402, 302)]
+    tiles = plan_roi_crops(rois, WIDTH, HEIGHT, "tiles", margin=0.1)
+    assert len(tiles) == 2
+    for x1, y1, x2, y2 in tiles:
+        assert x1 % 2 == 0 and y1 % 2 == 0 and x2 % 2 == 0 and y2 % 2 == 0
+    assert tiles[0][0] <= 91 and tiles[0][2] >= 211
+
+    # An ROI covering most of the frame gains nothing from cropping
+    assert plan_roi_crops([(0, 0, 600, 400)], WIDTH, HEIGHT, "union") == [None]
+
+
+def test_cropped_letterbox_matches_letterbox_of_cropped_frame():
+    rng = np.random.default_rng(3)
+    y = rng.integers(16, 236, (HEIGHT, WIDTH), dtype=np.uint8)
+    u = rng.integers(16, 240, (HEIGHT // 2, WIDTH // 2), dtype=np.uint8)
+    v = rng.integers(16, 240, (HEIGHT // 2, WIDTH // 2), dtype=np.uint8)
+    x1, y1, x2, y2 = 120, 60, 280, 180
+    letterbox = YUVLetterbox(320)
+
+    cropped, transform = letterbox(_i420(y, u, v), WIDTH, HEIGHT, crop=(x1, y1, x2, y2))
+    sub = _i420(np.ascontiguousarray(y[y1:y2, x1:x2]), np.ascontiguousarray(u[y1 // 2:y2 // 2, x1 // 2:x2 // 2]),
+                np.ascontiguousarray(v[y1 // 2:y2 // 2, x1 // 2:x2 // 2]))
+    expected, _ = letterbox(sub, x2 - x1, y2 - y1)
+    assert np.array_equal(cropped, expected)
+
+    # 160x120 crop upscaled 2x into 320x320; boxes map back into frame coordinates
+    assert transform[0] == 2.0 and transform[3:] == (x1, y1)
+    box = YUVLetterbox.map_boxes([(0, 40, 320, 280)], transform, WIDTH, HEIGHT)[0]
+    assert np.allclose(box, (x1, y1, x2, y2))
+
+
+def test_nms_merges_duplicates_from_overlapping_tiles():
+    boxes = [(100, 100, 50, 100), (102, 101, 50, 98), (300, 100, 50, 100)]
+    assert nms_xywh(boxes, [0.6, 0.9, 0.5]) == [boxes[1], boxes[2]]
+
+
+if __name__ == "__main__":
+    test_plan_union_tiles_and_full_frame_fallback()
+    test_cropped_letterbox_matches_letterbox_of_cropped_frame()
+    test_nms_merges_duplicates_from_overlapping_tiles()
+    print("ROI crop tests completed successfully!")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for polygon ROI matching.
+"""
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from analytics_engine import parse_roi_settings
+from data_structures import ROI, ROIGroup, SettingParameters
+from detectors import convert_threshold_to_confidence
+from roi_index import RoiSet, filter_detections
+
+# Floor area seen in perspective: narrow at the top, wide at the bottom
+TRAPEZOID = [(400, 200), (600, 200), (900, 700), (100, 700)]
+
+
+def test_trapezoid_rejects_boxes_in_bounding_box_corners():
+    rois = RoiSet([TRAPEZOID])
+    assert rois == [(100, 200, 900, 700)]
+    inside = (450, 400, 60, 150)
+    top_left_corner = (110, 210, 60, 100)  # Inside the bounding box, outside the polygon
+    keep = rois.keep([inside, top_left_corner])
+    assert keep.tolist() == [True, False]
+    # Plain rectangles still use the old bounding-box test
+    assert filter_detections([inside, top_left_corner], None, list(rois)).tolist() == [True, True]
+
+
+def test_each_roi_applies_its_own_confidence():
+    rois = RoiSet([[(0, 0), (100, 0), (100, 100), (0, 100)],
+                   [(200, 0), (300, 0), (300, 100), (200, 100)]], confidences=[0.2, 0.6])
+    boxes = [(10, 10, 20, 40), (210, 10, 20, 40), (220, 20, 20, 40)]
+    assert rois.keep(boxes, [0.3, 0.3, 0.7]).tolist() == [True, False, True]
+    assert rois.min_confidence() == 0.2
+    assert rois.group(boxes) == {0: [boxes[0]], 1: [boxes[1], boxes[2]]}
+
+
+def test_matches_per_pair_loop_for_many_rois():
+    rng = np.random.default_rng(7)
+    polygons = []
+    for _ in range(40):
+        # Corners on the raster grid, so the cell approximation is exact
+        x, y = 4 * int(rng.integers(0, 450)), 4 * int(rng.integers(0, 250))
+        polygons.append([(x, y), (x + 80, y), (x + 80, y + 60), (x, y + 60)])
+    rois = RoiSet(polygons, cell=4)
+    boxes = [(int(x), int(y), 40, 90) for x, y in zip(rng.integers(0, 1880, 200), rng.integers(0, 990, 200))]
+
+    expected = [[bx < p[1][0] and bx + 40 > p[0][0] and by < p[2][1] and by + 90 > p[0][1] for p in polygons]
+                for bx, by, _, _ in boxes]
+    assert np.array_equal(rois.overlaps(boxes), np.array(expected))
+
+
+def test_parse_roi_settings_keeps_polygons_and_group_thresholds():
+    parameters = SettingParameters(rois=[
+        ROIGroup(sensitivity=50, threshold=80, rects=[ROI(x, y) for x, y in TRAPEZOID]),
+        ROIGroup(sensitivity=90, threshold=20, rects=[ROI(0, 0), ROI(50, 50)]),
+        ROIGroup(sensitivity=0, threshold=0, rects=[ROI(60, 60), ROI(90, 90), ROI(-1, -1), ROI(-1, -1)]),
+    ])
+    roi_rects, threshold, sensitivity = parse_roi_settings(parameters)
+    assert (threshold, sensitivity) == (80, 50)
+    assert list(roi_rects) == [(100, 200, 900, 700), (0, 0, 50, 50), (60, 60, 90, 90)]
+    first = convert_threshold_to_confidence(80, 50)
+    assert roi_rects.confidences == [first, convert_threshold_to_confidence(20, 90), first]
+
+
+if __name__ == "__main__":
+    test_trapezoid_rejects_boxes_in_bounding_box_corners()
+    test_each_roi_applies_its_own_confidence()
+    test_matches_per_pair_loop_for_many_rois()
+    test_parse_roi_settings_keeps_polygons_and_group_thresholds()
+    print("ROI index tests completed successfully!")
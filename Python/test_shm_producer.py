@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared-memory frame producer and the file-backed
+reader path on Linux.
+"""
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import FrameLease, SharedFrameSource, shared_memory_path
+from shm_producer import FrameProducer, SyntheticClip, YuvClip
+
+PORT = 59871
+
+
+def test_producer_reader_handshake():
+    clip = SyntheticClip(64, 48, frames=4)
+    producer = FrameProducer(PORT, clip, notify=False)
+    source = SharedFrameSource(PORT)
+    try:
+        assert source.acquire() is None  # Nothing published yet
+        assert producer.publish()
+        assert not producer.publish()  # Reader has not released the first frame
+        assert (producer.produced, producer.dropped) == (1, 1)
+
+        lease = source.acquire()
+        assert isinstance(lease, FrameLease)
+        assert (lease.width, lease.height, lease.size) == (64, 48, clip.frame_size)
+        assert lease.copy() == clip[0].tobytes()
+        lease.release()
+        assert source.acquire() is None
+
+        assert producer.publish()
+        with source.acquire() as lease:
+            assert lease.copy() == clip[1].tobytes()
+    finally:
+        source.close()
+        producer.close()
+        if sys.platform != "win32":
+            os.remove(shared_memory_path(f"ChannelFrame_{PORT}"))
+
+
+def test_clips():
+    synthetic = SyntheticClip(64, 48, frames=4)
+    assert synthetic[0].size == 64 * 48 * 3 // 2 and synthetic[4] is synthetic[0]
+    assert not np.array_equal(synthetic[0], synthetic[1])  # The blocks move
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clip.yuv")
+        frames = np.arange(3 * 24, dtype=np.uint8).reshape(3, 24)
+        with open(path, "wb") as f:
+            f.write(frames.tobytes() + b"\x00" * 5)  # Trailing partial frame is ignored
+        clip = YuvClip(path, 4, 4)
+        assert len(clip) == 3 and bytes(clip[4]) == frames[1].tobytes()
+        del clip
+
+
+if __name__ == "__main__":
+    test_producer_reader_handshake()
+    test_clips()
+    print("Shared memory producer tests completed successfully!")
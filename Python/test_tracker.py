@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script for skip-frame tracking.
+"""
+import sys
+import os
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from detectors import BaseDetector
+from tracker import TrackingDetector
+
+WIDTH, HEIGHT = 320, 240
+
+
+class WalkingPersonDetector(BaseDetector):
+    """Reports one person moving 4 px to the right per frame"""
+
+    def __init__(self):
+        self.frame = 0
+        self.calls = 0
+
+    def box(self, frame):
+        return (20 + 4 * frame, 60, 40, 100)
+
+    def detect(self, yuv420_frame, width, height, roi_rects=None, confidence=None):
+        self.calls += 1
+        return [self.box(self.frame)]
+
+
+def gray_frame(square_at=None):
+    y = np.full((HEIGHT, WIDTH), 80, dtype=np.uint8)
+    if square_at is not None:
+        x, top = square_at
+        y[top:top + 40, x:x + 40] = 220
+    chroma = np.full(WIDTH * HEIGHT // 2, 128, dtype=np.uint8)
+    return y.tobytes() + chroma.tobytes()
+
+
+def test_detector_skipped_and_ids_stable():
+    inner = WalkingPersonDetector()
+    tracking = TrackingDetector(inner, detect_every=3, motion_fraction=0)
+    frame = gray_frame()
+
+    ids = set()
+    for index in range(12):
+        inner.frame = index
+        boxes = tracking.detect(frame, WIDTH, HEIGHT)
+        assert len(boxes) == 1
+        ids.add(boxes[0].track_id)
+        # Propagated boxes stay close to where the person really is
+        assert abs(boxes[0][0] - inner.box(index)[0]) <= 8
+
+    assert inner.calls == 4
+    assert ids == {1}
+    assert tracking.get_stats()["skipped"] == 8
+
+
+def test_new_motion_outside_tracks_runs_detector():
+    inner = WalkingPersonDetector()
+    tracking = TrackingDetector(inner, detect_every=100)
+    tracking.detect(gray_frame(), WIDTH, HEIGHT)
+    tracking.detect(gray_frame(), WIDTH, HEIGHT)
+    assert inner.calls == 1
+
+    # Something appears far from the tracked person
+    tracking.detect(gray_frame(square_at=(250, 150)), WIDTH, HEIGHT)
+    assert inner.calls == 2
+    assert tracking.get_stats()["motion_triggers"] == 1
+
+
+if __name__ == "__main__":
+    test_detector_skipped_and_ids_stable()
+    test_new_motion_outside_tracks_runs_detector()
+    print("Tracker tests completed successfully!")
@@ -154,14 +154,9 @@ def rgb_to_yuv420(rgb_image):
     u_sub = u[::2, ::2]
     v_sub = v[::2, ::2]
     
-    # Interleave U and V (NV12 format)
-    uv_interleaved = np.empty((u_sub.shape[0], u_sub.shape[1] * 2), dtype=np.uint8)
-    uv_interleaved[:, 0::2] = u_sub
-    uv_interleaved[:, 1::2] = v_sub
-    
-    # Combine Y, U, V
+    # Planar U then V (I420 format, the default layout of yuv_converter)
     y_flat = y.flatten()
-    uv_flat = uv_interleaved.flatten()
+    uv_flat = np.concatenate([u_sub.flatten(), v_sub.flatten()])
     
     return bytes(y_flat) + bytes(uv_flat)
 
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared YUV420 to RGB converter.
+"""
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from yuv_converter import RGBFrameCache, yuv420_to_rgb
+
+
+def _reference_i420(frame: bytes, width: int, height: int) -> np.ndarray:
+    """Per-pixel formula from ConvertYUV420ToBitmap in the C# sample"""
+    data = np.frombuffer(frame, dtype=np.uint8).astype(np.int32)
+    y_size = width * height
+    c_size = y_size // 4
+    y = data[:y_size].reshape((height, width))
+    u = data[y_size:y_size + c_size].reshape((height // 2, width // 2)).repeat(2, 0).repeat(2, 1)
+    v = data[y_size + c_size:].reshape((height // 2, width // 2)).repeat(2, 0).repeat(2, 1)
+    c, d, e = y - 16, u - 128, v - 128
+    r = (298 * c + 409 * e + 128) >> 8
+    g = (298 * c - 100 * d - 208 * e + 128) >> 8
+    b = (298 * c + 516 * d + 128) >> 8
+    return np.clip(np.stack([r, g, b], axis=-1), 0, 255).astype(np.uint8)
+
+
+def _random_frame(width: int, height: int) -> bytes:
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 256, width * height * 3 // 2, dtype=np.uint8).tobytes()
+
+
+def test_i420_matches_csharp_formula():
+    width, height = 64, 48
+    frame = _random_frame(width, height)
+    assert np.array_equal(yuv420_to_rgb(frame, width, height, "i420"), _reference_i420(frame, width, height))
+
+
+def test_nv12_matches_i420():
+    """The same chroma samples give the same image in either layout."""
+    width, height = 32, 16
+    frame = _random_frame(width, height)
+    y_size = width * height
+    c_size = y_size // 4
+    u = np.frombuffer(frame, dtype=np.uint8, count=c_size, offset=y_size)
+    v = np.frombuffer(frame, dtype=np.uint8, count=c_size, offset=y_size + c_size)
+    nv12 = frame[:y_size] + np.stack([u, v], axis=-1).tobytes()
+    assert np.array_equal(yuv420_to_rgb(nv12, width, height, "nv12"), yuv420_to_rgb(frame, width, height, "i420"))
+
+
+def test_cache_converts_once_and_recycles():
+    width, height = 16, 16
+    cache = RGBFrameCache()
+    frame = memoryview(_random_frame(width, height))
+    first = cache.get(frame, width, height)
+    assert cache.lookup(frame, width, height) is first
+    cache.release(frame)
+    assert cache.lookup(frame, width, height) is None
+
+    # The released buffer is reused for the next frame of the same size
+    assert cache.get(memoryview(_random_frame(width, height)), width, height) is first
+
+
+if __name__ == "__main__":
+    test_i420_matches_csharp_formula()
+    test_nv12_matches_i420()
+    test_cache_converts_once_and_recycles()
+    print("YUV converter tests completed successfully!")
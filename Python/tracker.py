@@ -0,0 +1,269 @@
+"""
+Multi-object tracking for skip-frame inference
+
+SORT-style tracker: one constant-velocity Kalman filter per person box,
+greedy IoU association, stable track IDs. TrackingDetector wraps any
+BaseDetector and only runs it every Nth frame (or when the picture moves);
+on the frames in between the tracked boxes are propagated by the Kalman
+filters, which costs microseconds instead of a forward pass.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from detectors import BaseDetector
+from yuv_converter import split_planes
+
+Box = Tuple[int, int, int, int]  # (x, y, w, h)
+
+
+class TrackedBox(tuple):
+    """(x, y, w, h) box that also carries its track ID.
+
+    Unpacks like a plain detection tuple, so existing callbacks keep working.
+    """
+
+    def __new__(cls, box: Box, track_id: int):
+        instance = super().__new__(cls, box)
+        instance.track_id = track_id
+        return instance
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Pairs (row, col) taken in order of decreasing IoU, each at most once"""
+    if iou.size == 0:
+        return []
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows, used_cols, pairs = set(), set(), []
+    for index in order:
+        row, col = int(rows[index]), int(cols[index])
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+    return pairs
+
+
+class KalmanBoxTrack:
+    """Constant-velocity Kalman filter over (cx, cy, area, aspect) as in SORT"""
+
+    # State: cx, cy, s (area), r (aspect ratio), vx, vy, vs
+    _F = np.eye(7)
+    _F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+    _H = np.eye(4, 7)
+    _R = np.diag([1.0, 1.0, 10.0, 10.0])
+    _Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+
+    def __init__(self, xyxy: np.ndarray, track_id: int):
+        self.track_id = track_id
+        self.x = np.zeros(7)
+        self.x[:4] = self._to_z(xyxy)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.hits = 1
+        self.age = 0
+        self.since_update = 0
+
+    @staticmethod
+    def _to_z(xyxy: np.ndarray) -> np.ndarray:
+        w = xyxy[2] - xyxy[0]
+        h = xyxy[3] - xyxy[1]
+        return np.array([xyxy[0] + w / 2, xyxy[1] + h / 2, w * h, w / max(h, 1e-6)])
+
+    def xyxy(self) -> np.ndarray:
+        cx, cy, s, r = self.x[:4]
+        w = np.sqrt(max(s * r, 0.0))
+        h = s / w if w > 0 else 0.0
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+    def predict(self):
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0  # Never shrink to a negative area
+        self.x = self._F @ self.x
+        self.P = self._F @ self.P @ self._F.T + self._Q
+        self.age += 1
+        self.since_update += 1
+
+    def update(self, xyxy: np.ndarray):
+        y = self._to_z(xyxy) - self._H @ self.x
+        S = self._H @ self.P @ self._H.T + self._R
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self._H) @ self.P
+        self.hits += 1
+        self.since_update = 0
+
+
+class SortTracker:
+    """Associates detections with tracks and keeps track IDs stable.
+
+    A track is reported once it has been matched min_hits times and dropped
+    after max_age frames without a matching detection; a person missed by
+    one detector pass keeps the same ID when matched again.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 15, min_hits: int = 1):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks: List[KalmanBoxTrack] = []
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks = []
+
+    def predict(self):
+        for track in self.tracks:
+            track.predict()
+        self.tracks = [t for t in self.tracks if t.since_update <= self.max_age]
+
+    def update(self, detections: List[Box]):
+        """Correct the (already predicted) tracks with a fresh set of detections"""
+        boxes = np.array([(x, y, x + w, y + h) for (x, y, w, h) in detections], dtype=np.float64).reshape(-1, 4)
+        predicted = np.array([t.xyxy() for t in self.tracks]).reshape(-1, 4)
+        pairs = greedy_match(iou_matrix(predicted, boxes), self.iou_threshold)
+
+        matched = set()
+        for track_index, det_index in pairs:
+            self.tracks[track_index].update(boxes[det_index])
+            matched.add(det_index)
+        for det_index in range(len(boxes)):
+            if det_index not in matched:
+                self.tracks.append(KalmanBoxTrack(boxes[det_index], self._next_id))
+                self._next_id += 1
+
+    def boxes(self, width: int, height: int, max_since_update: int = 0) -> List[TrackedBox]:
+        """Confirmed tracks matched within the last max_since_update frames,
+        as (x, y, w, h) boxes clipped to the frame"""
+        result = []
+        for track in self.tracks:
+            if track.hits < self.min_hits or track.since_update > max_since_update:
+                continue
+            x1, y1, x2, y2 = track.xyxy()
+            x1, x2 = max(0, int(x1)), min(width, int(x2))
+            y1, y2 = max(0, int(y1)), min(height, int(y2))
+            if x2 > x1 and y2 > y1:
+                result.append(TrackedBox((x1, y1, x2 - x1, y2 - y1), track.track_id))
+        return result
+
+
+class TrackingDetector(BaseDetector):
+    """Runs the wrapped detector every detect_every frames and tracks in between.
+
+    Between detector passes only tracks that matched at the last pass are
+    reported, at their Kalman-predicted positions. The detector also runs
+    early when something moves outside the tracked boxes: on a luma plane
+    subsampled by motion_step, more than motion_fraction of the pixels
+    differ by more than pixel_threshold from the last detected frame
+    (motion_fraction 0 disables the check). That way a person entering a
+    static scene is picked up without waiting for the next scheduled pass.
+    Returned boxes are TrackedBox tuples carrying stable track IDs.
+
+    Tracker state is per video stream: use one instance per channel.
+    """
+
+    def __init__(self, detector: BaseDetector, detect_every: int = 3, motion_fraction: float = 0.002,
+                 pixel_threshold: int = 20, motion_step: int = 8, tracker: SortTracker = None):
+        self.detector = detector
+        self.detect_every = max(1, detect_every)
+        self.motion_fraction = motion_fraction
+        self.pixel_threshold = pixel_threshold
+        self.motion_step = max(1, motion_step)
+        self.tracker = tracker or SortTracker()
+        self.frames = 0
+        self.inferences = 0
+        self.motion_triggers = 0
+        self._since_detect = 0
+        self._reference: Optional[np.ndarray] = None
+        self._last_setup = None
+
+    def set_confidence_threshold(self, threshold: float):
+        self.detector.set_confidence_threshold(threshold)
+
+    def reset(self):
+        """Drop tracks and force a detector pass on the next frame"""
+        self.tracker.reset()
+        self._since_detect = 0
+        self._reference = None
+
+    def _thumbnail(self, yuv420_frame, width: int, height: int) -> np.ndarray:
+        y, _, _ = split_planes(yuv420_frame, width, height)
+        return y[::self.motion_step, ::self.motion_step].astype(np.int16)
+
+    def _untracked_motion(self, thumbnail: np.ndarray, width: int, height: int) -> bool:
+        changed = np.abs(thumbnail - self._reference) > self.pixel_threshold
+        step = self.motion_step
+        for x, y, w, h in self.tracker.boxes(width, height, self._since_detect):
+            # Tracked people moving is the tracker's job
+            changed[y // step:(y + h) // step + 1, x // step:(x + w) // step + 1] = False
+        return changed.mean() > self.motion_fraction
+
+    def _needs_detection(self, thumbnail: Optional[np.ndarray], width: int, height: int) -> bool:
+        if self._reference is None or self._since_detect >= self.detect_every:
+            return True
+        if thumbnail is None:
+            return False
+        if self._untracked_motion(thumbnail, width, height):
+            self.motion_triggers += 1
+            return True
+        return False
+
+    def detect(self, yuv420_frame: bytes, width: int, height: int,
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
+        setup = (width, height, tuple(roi_rects or ()), confidence)
+        if setup != self._last_setup:
+            # New resolution, ROIs or threshold: tracks no longer comparable
+            self.reset()
+            self._last_setup = setup
+
+        self.frames += 1
+        self._since_detect += 1
+        self.tracker.predict()
+        thumbnail = self._thumbnail(yuv420_frame, width, height) if self.motion_fraction > 0 else None
+
+        if self._needs_detection(thumbnail, width, height):
+            detections = self.detector.detect(yuv420_frame, width, height, roi_rects, confidence)
+            self.inferences += 1
+            self._since_detect = 0
+            self._reference = thumbnail if thumbnail is not None else np.zeros(0, dtype=np.int16)
+            self.tracker.update(detections)
+        return self.tracker.boxes(width, height, self._since_detect)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "skipped": self.frames - self.inferences,
+            "motion_triggers": self.motion_triggers,
+            "tracks": len(self.tracker.tracks),
+        }
+
+
+class EngineDetector(BaseDetector):
+    """BaseDetector view of a detect callable, e.g. AnalyticsEngine.detect.
+
+    Lets a per-channel TrackingDetector wrap the engine's shared (locked or
+    batched) detector.
+    """
+
+    def __init__(self, detect: Callable):
+        self._detect = detect
+
+    def detect(self, yuv420_frame: bytes, width: int, height: int,
+               roi_rects: List[Tuple[int, int, int, int]] = None,
+               confidence: float = None) -> List[Tuple[int, int, int, int]]:
+        return self._detect(yuv420_frame, width, height, roi_rects, confidence)
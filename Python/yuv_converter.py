@@ -0,0 +1,243 @@
+"""
+YUV420 to RGB conversion shared by the detector and the JPEG encoder
+
+Fixed-point BT.601 math with integer coefficients. Chroma terms are computed
+once per 2x2 block and broadcast onto the luma plane, and every temporary
+lives in per-thread scratch buffers that are reused across frames.
+
+Layouts:
+    i420 - Y plane, then U plane, then V plane (what the C# sample decodes)
+    nv12 - Y plane, then interleaved UVUV... plane
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+LAYOUT_I420 = "i420"
+LAYOUT_NV12 = "nv12"
+LAYOUTS = (LAYOUT_I420, LAYOUT_NV12)
+
+# Matches ConvertYUV420ToBitmap in the C# sample (I420, limited range)
+DEFAULT_LAYOUT = LAYOUT_I420
+DEFAULT_FULL_RANGE = False
+
+
+def set_default_layout(layout: str, full_range: bool = None):
+    """Change the layout (and optionally range) assumed for shared-memory frames"""
+    global DEFAULT_LAYOUT, DEFAULT_FULL_RANGE
+    layout = layout.lower()
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown YUV420 layout '{layout}', expected one of {LAYOUTS}")
+    DEFAULT_LAYOUT = layout
+    if full_range is not None:
+        DEFAULT_FULL_RANGE = full_range
+
+
+def frame_size(width: int, height: int) -> int:
+    """Bytes in one YUV420 frame"""
+    return width * height + 2 * ((width // 2) * (height // 2))
+
+
+def split_planes(yuv420_frame, width: int, height: int, layout: str = None):
+    """Return (y, u, v) views into the frame without copying.
+
+    y is (height, width); u and v are (height // 2, width // 2), strided
+    views into the interleaved plane for NV12.
+    """
+    layout = layout or DEFAULT_LAYOUT
+    y_size = width * height
+    cw, ch = width // 2, height // 2
+    c_size = cw * ch
+    needed = y_size + 2 * c_size
+    if len(yuv420_frame) < needed:
+        raise ValueError(f"Invalid YUV420 data size. Expected {needed}, got {len(yuv420_frame)}")
+
+    data = np.frombuffer(yuv420_frame, dtype=np.uint8, count=needed)
+    y = data[:y_size].reshape((height, width))
+    if layout == LAYOUT_NV12:
+        uv = data[y_size:needed].reshape((ch, cw, 2))
+        return y, uv[:, :, 0], uv[:, :, 1]
+    if layout == LAYOUT_I420:
+        u = data[y_size:y_size + c_size].reshape((ch, cw))
+        v = data[y_size + c_size:needed].reshape((ch, cw))
+        return y, u, v
+    raise ValueError(f"Unknown YUV420 layout '{layout}', expected one of {LAYOUTS}")
+
+
+# Fixed-point coefficients scaled by 256 (8 fractional bits):
+# (luma gain, luma bias, R from V', G from U', G from V', B from U')
+_COEFFS = {
+    # Studio swing, same integers as the C# sample
+    False: (298, 128 - 16 * 298, 409, -100, -208, 516),
+    # JFIF: R = Y + 1.402 V', G = Y - 0.344 U' - 0.714 V', B = Y + 1.772 U'
+    True: (256, 128, 359, -88, -183, 454),
+}
+
+
+class _Scratch:
+    """Integer temporaries for one frame size, reused across frames"""
+
+    def __init__(self, width: int, height: int):
+        ch, cw = height // 2, width // 2
+        self.luma = np.empty((height, width), dtype=np.int32)
+        self.acc = np.empty((height, width), dtype=np.int32)
+        self.d = np.empty((ch, cw), dtype=np.int32)
+        self.e = np.empty((ch, cw), dtype=np.int32)
+        self.chroma = [np.empty((ch, cw), dtype=np.int32) for _ in range(3)]
+        self.tmp = np.empty((ch, cw), dtype=np.int32)
+        # One chroma row pair upsampled horizontally to full width
+        self.wide = np.empty((ch, width), dtype=np.int32)
+
+
+_local = threading.local()
+
+
+def _scratch(width: int, height: int) -> _Scratch:
+    cache = getattr(_local, "scratch", None)
+    if cache is None:
+        cache = _local.scratch = {}
+    key = (width, height)
+    scratch = cache.get(key)
+    if scratch is None:
+        if len(cache) >= 4:
+            cache.clear()  # Resolution changed, drop the old buffers
+        scratch = cache[key] = _Scratch(width, height)
+    return scratch
+
+
+def yuv420_to_rgb(yuv420_frame, width: int, height: int, layout: str = None,
+                  full_range: bool = None, out: np.ndarray = None) -> np.ndarray:
+    """Convert one YUV420 frame to an (height, width, 3) uint8 RGB array.
+
+    Writes into ``out`` when given, otherwise allocates only the result.
+    """
+    if width % 2 or height % 2:
+        raise ValueError(f"YUV420 frames need even dimensions, got {width}x{height}")
+    if full_range is None:
+        full_range = DEFAULT_FULL_RANGE
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+
+    y, u, v = split_planes(yuv420_frame, width, height, layout)
+    ky, bias, rv, gu, gv, bu = _COEFFS[full_range]
+    s = _scratch(width, height)
+
+    # Luma once at full resolution
+    np.multiply(y, ky, out=s.luma, dtype=np.int32)
+    np.add(s.luma, bias, out=s.luma)
+
+    # Chroma terms once per 2x2 block
+    np.subtract(u, 128, out=s.d, dtype=np.int32)
+    np.subtract(v, 128, out=s.e, dtype=np.int32)
+    r_c, g_c, b_c = s.chroma
+    np.multiply(s.e, rv, out=r_c)
+    np.multiply(s.d, gu, out=g_c)
+    np.multiply(s.e, gv, out=s.tmp)
+    np.add(g_c, s.tmp, out=g_c)
+    np.multiply(s.d, bu, out=b_c)
+
+    # Rows come in pairs sharing one chroma row: view luma as (h/2, 2, w)
+    ch, cw = height // 2, width // 2
+    luma3 = s.luma.reshape((ch, 2, width))
+    acc3 = s.acc.reshape((ch, 2, width))
+    wide_pairs = s.wide.reshape((ch, cw, 2))
+    for channel, chroma in enumerate((r_c, g_c, b_c)):
+        np.copyto(wide_pairs[:, :, 0], chroma)
+        np.copyto(wide_pairs[:, :, 1], chroma)
+        np.add(luma3, s.wide[:, None, :], out=acc3)
+        np.right_shift(s.acc, 8, out=s.acc)
+        np.clip(s.acc, 0, 255, out=s.acc)
+        np.copyto(out[:, :, channel], s.acc, casting="unsafe")
+    return out
+
+
+def yuv444_to_rgb_chw(y: np.ndarray, u: np.ndarray, v: np.ndarray, out: np.ndarray,
+                      full_range: bool = None, scale: float = 1.0 / 255.0) -> np.ndarray:
+    """Convert equally sized Y/U/V planes into a (3, h, w) float array.
+
+    Used on already resampled planes, e.g. the letterboxed model input, so
+    the result is written as normalized CHW without an HWC intermediate.
+    An int32 ``y`` is taken to be in 1/256 units (e.g. bilinear output).
+    """
+    if full_range is None:
+        full_range = DEFAULT_FULL_RANGE
+    ky, bias, rv, gu, gv, bu = _COEFFS[full_range]
+
+    if y.dtype == np.int32:
+        # Luma already in 1/256 units
+        luma = (y * ky) >> 8
+    else:
+        luma = y.astype(np.int32) * ky
+    luma += bias
+    d = u.astype(np.int32) - 128
+    e = v.astype(np.int32) - 128
+
+    for channel, chroma in enumerate((e * rv, d * gu + e * gv, d * bu)):
+        chroma += luma
+        chroma >>= 8
+        np.clip(chroma, 0, 255, out=chroma)
+        np.multiply(chroma, scale, out=out[channel], casting="unsafe")
+    return out
+
+
+class RGBFrameCache:
+    """Converts each frame at most once and shares the result.
+
+    Entries are keyed by the identity of the frame buffer object (the
+    shared-memory memoryview or bytes of one frame), so the detector and the
+    JPEG path that receive the same object reuse one conversion. The frame
+    owner calls release() when it is done with the frame, which returns the
+    RGB buffer to a pool for the next frame of the same size.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[object, Tuple, np.ndarray]]" = OrderedDict()
+        self._pool: Dict[Tuple[int, int], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, frame, width: int, height: int):
+        """Cached RGB for this frame, or None"""
+        with self._lock:
+            entry = self._entries.get(id(frame))
+            if entry is not None and entry[0] is frame and entry[1] == (width, height):
+                return entry[2]
+        return None
+
+    def get(self, frame, width: int, height: int, layout: str = None,
+            full_range: bool = None) -> np.ndarray:
+        """RGB for this frame, converting and caching it on first use.
+
+        The returned array is owned by the cache until release(frame).
+        """
+        rgb = self.lookup(frame, width, height)
+        if rgb is not None:
+            return rgb
+
+        with self._lock:
+            pooled = self._pool.get((width, height))
+            out = pooled.pop() if pooled else None
+        rgb = yuv420_to_rgb(frame, width, height, layout, full_range, out)
+
+        with self._lock:
+            self._entries[id(frame)] = (frame, (width, height), rgb)
+            while len(self._entries) > self.max_entries:
+                # Never pool an evicted buffer: its owner may still be using it
+                self._entries.popitem(last=False)
+        return rgb
+
+    def release(self, frame):
+        """Forget the frame and recycle its RGB buffer"""
+        with self._lock:
+            entry = self._entries.pop(id(frame), None)
+            if entry is None or entry[0] is not frame:
+                return
+            pool = self._pool.setdefault(entry[1], [])
+            if len(pool) < self.max_entries:
+                pool.append(entry[2])
+
+
+# Process-wide cache used by the detectors and ImageProcessor
+shared_rgb_cache = RGBFrameCache()